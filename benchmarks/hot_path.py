@@ -0,0 +1,205 @@
+"""
+Measures the overhead the base bot adds around a model: an app built with `create_app` around a FakePredictor
+with a fixed latency and output size, driven in-process through Quart's test client and over a real socket
+through Hypercorn, at each combination of concurrency and payload size.
+
+    python -m benchmarks.hot_path --concurrency 1 8 32 --payload-sizes 100 10000 --latency-ms 1
+
+Prints throughput and p50/p95/p99 latency per run as JSON. `overhead_p50_ms` is p50 minus the predictor latency.
+Client and server share one event loop, so the socket numbers include the client's cost.
+"""
+
+import argparse
+import asyncio
+import contextlib
+import json
+import logging
+import math
+import platform
+import socket
+import sys
+import time
+from typing import Any, Awaitable, Callable
+
+from taranis_base_bot import create_app
+from taranis_base_bot.config import CommonSettings
+from taranis_base_bot.misc import create_request_parser
+
+
+class FakePredictor:
+    """Predictor that waits `latency_ms` and returns a text of `output_size` characters"""
+
+    model_name = "fake/benchmark"
+
+    def __init__(self, latency_ms: float = 0.0, output_size: int = 100) -> None:
+        self._latency = latency_ms / 1000
+        self._output = "x" * output_size
+
+    async def predict(self, text: str) -> dict[str, Any]:
+        if self._latency:
+            await asyncio.sleep(self._latency)
+        return {"text": self._output, "length": len(text)}
+
+
+class BenchmarkSettings(CommonSettings):
+    MODEL: str = "benchmark"
+
+
+# passed explicitly, so that an API_KEY from the environment does not turn every request into a 401
+# every request sends the same payload, so neither the cache nor coalescing may answer it without running the predictor
+DEFAULT_SETTINGS: dict[str, Any] = {"API_KEY": "", "PACKAGE_NAME": "benchmark_bot", "CACHE_TYPE": "NullCache", "COALESCE_REQUESTS": False}
+PAYLOAD_SCHEMA = {"text": {"type": "str", "required": True}}
+
+
+def build_app(predictor: FakePredictor, **settings: Any):
+    config = BenchmarkSettings(**{**DEFAULT_SETTINGS, **settings})
+    # the parser is compiled here rather than from config.PAYLOAD_SCHEMA, which merges with a PAYLOAD_SCHEMA from the environment
+    return create_app(
+        name="benchmark",
+        config=config,
+        predict_fn=predictor.predict,
+        modelinfo_fn=lambda: predictor.model_name,
+        request_parser=create_request_parser(PAYLOAD_SCHEMA),
+    )
+
+
+def percentile(sorted_values: list[float], q: float) -> float:
+    """Nearest-rank percentile of already sorted values"""
+    index = max(0, min(len(sorted_values) - 1, math.ceil(q / 100 * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+async def drive(send: Callable[[], Awaitable[int]], requests: int, concurrency: int) -> dict[str, Any]:
+    """Runs `requests` calls of `send` from `concurrency` workers and summarizes their latencies"""
+    latencies: list[float] = []
+    errors = 0
+    remaining = iter(range(requests))
+
+    async def worker() -> None:
+        nonlocal errors
+        for _ in remaining:
+            started = time.perf_counter()
+            status = await send()
+            latencies.append(time.perf_counter() - started)
+            if status != 200:
+                errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        "requests": requests,
+        "errors": errors,
+        "throughput_rps": round(requests / elapsed, 1),
+        "p50_ms": round(percentile(latencies, 50) * 1000, 3),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 3),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 3),
+    }
+
+
+async def run_in_process(app, payload: dict[str, Any], requests: int, concurrency: int) -> dict[str, Any]:
+    async with app.test_app():
+        client = app.test_client()
+
+        async def send() -> int:
+            return (await client.post("/", json=payload)).status_code
+
+        await drive(send, min(requests, 50), concurrency)
+        return await drive(send, requests, concurrency)
+
+
+async def run_over_socket(app, payload: dict[str, Any], requests: int, concurrency: int) -> dict[str, Any]:
+    import httpx
+    from hypercorn.asyncio import serve
+    from hypercorn.config import Config
+
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind(("127.0.0.1", 0))
+    port = sock.getsockname()[1]
+    sock.close()
+
+    config = Config()
+    config.bind = [f"127.0.0.1:{port}"]
+    config.accesslog = None
+    config.errorlog = logging.getLogger("benchmark.hypercorn")
+    shutdown = asyncio.Event()
+    server = asyncio.ensure_future(serve(app, config, shutdown_trigger=shutdown.wait))
+
+    body = json.dumps(payload).encode()
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    try:
+        async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", limits=limits) as client:
+            for _ in range(100):
+                try:
+                    await client.get("/health")
+                    break
+                except httpx.TransportError:
+                    await asyncio.sleep(0.05)
+
+            async def send() -> int:
+                return (await client.post("/", content=body, headers={"Content-Type": "application/json"})).status_code
+
+            await drive(send, min(requests, 50), concurrency)
+            return await drive(send, requests, concurrency)
+    finally:
+        shutdown.set()
+        await server
+
+
+DRIVERS = {"inprocess": run_in_process, "socket": run_over_socket}
+
+
+async def run(
+    drivers: list[str],
+    concurrency: list[int],
+    payload_sizes: list[int],
+    requests: int,
+    latency_ms: float,
+    output_size: int,
+) -> dict[str, Any]:
+    results = []
+    for driver in drivers:
+        for payload_size in payload_sizes:
+            payload = {"text": "x" * payload_size}
+            for level in concurrency:
+                app = build_app(FakePredictor(latency_ms=latency_ms, output_size=output_size))
+                result = await DRIVERS[driver](app, payload, requests, level)
+                result.update(driver=driver, concurrency=level, payload_size=payload_size)
+                result["overhead_p50_ms"] = round(result["p50_ms"] - latency_ms, 3)
+                results.append(result)
+    return {
+        "python": platform.python_version(),
+        "latency_ms": latency_ms,
+        "output_size": output_size,
+        "results": results,
+    }
+
+
+def main(argv: list[str] | None = None) -> dict[str, Any]:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--drivers", nargs="+", choices=sorted(DRIVERS), default=sorted(DRIVERS))
+    parser.add_argument("--concurrency", nargs="+", type=int, default=[1, 8, 32])
+    parser.add_argument("--payload-sizes", nargs="+", type=int, default=[100, 10_000])
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    parser.add_argument("--output-size", type=int, default=100)
+    parser.add_argument("--output", help="write the JSON report to this file instead of stdout")
+    args = parser.parse_args(argv)
+
+    # the bot logs to stdout, keep it free for the report
+    with contextlib.redirect_stdout(sys.stderr):
+        report = asyncio.run(run(args.drivers, args.concurrency, args.payload_sizes, args.requests, args.latency_ms, args.output_size))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+    return report
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,40 @@
+"""
+Compares the JSON provider installed by `setup()` with Quart's default provider.
+
+    python -m benchmarks.json_codec
+
+Prints encode and decode cost per document in microseconds as JSON.
+"""
+
+import json
+import random
+import timeit
+
+from quart import Quart
+from quart.json.provider import DefaultJSONProvider
+
+from taranis_base_bot.codec import FastJSONProvider
+
+DOCUMENTS = {
+    "scores": {f"label_{i}": random.random() for i in range(64)},
+    "embedding": {"embedding": [random.random() for _ in range(768)]},
+    "article": {"title": "title " * 10, "content": "lorem ipsum dolor sit amet " * 400},
+}
+
+
+def main(number: int = 2_000) -> dict[str, dict[str, float]]:
+    app = Quart(__name__)
+    providers = {"default": DefaultJSONProvider(app), "fast": FastJSONProvider(app)}
+    results: dict[str, dict[str, float]] = {}
+    for doc_name, doc in DOCUMENTS.items():
+        encoded = json.dumps(doc)
+        for name, provider in providers.items():
+            encode = min(timeit.repeat(lambda: provider.dumps(doc), number=number, repeat=3))
+            decode = min(timeit.repeat(lambda: provider.loads(encoded), number=number, repeat=3))
+            results.setdefault(doc_name, {})[f"{name}_encode_us"] = round(encode / number * 1e6, 2)
+            results[doc_name][f"{name}_decode_us"] = round(decode / number * 1e6, 2)
+    return results
+
+
+if __name__ == "__main__":
+    print(json.dumps(main(), indent=2))
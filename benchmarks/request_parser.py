@@ -0,0 +1,42 @@
+"""
+Microbenchmark for the request parser compiled from PAYLOAD_SCHEMA.
+
+    python -m benchmarks.request_parser
+
+Prints the parse cost per request in microseconds as JSON.
+"""
+
+import json
+import timeit
+
+from taranis_base_bot.misc import create_request_parser
+
+CASES = {
+    "flat": (
+        {"text": {"type": "str"}, "lang": {"type": "str", "required": False}},
+        {"text": "lorem ipsum " * 100, "lang": "en"},
+    ),
+    "nested": (
+        {
+            "article": {
+                "type": "dict",
+                "properties": {"title": {"type": "str", "max_length": 512}, "content": {"type": "str", "max_length": 100_000}},
+            },
+            "labels": {"type": "list", "max_length": 64, "items": {"type": "str"}},
+        },
+        {"article": {"title": "title", "content": "lorem ipsum " * 1000}, "labels": [f"label{i}" for i in range(32)]},
+    ),
+}
+
+
+def main(number: int = 100_000) -> dict[str, float]:
+    results = {}
+    for name, (schema, payload) in CASES.items():
+        parser = create_request_parser(schema)
+        seconds = min(timeit.repeat(lambda: parser(payload), number=number, repeat=3))
+        results[f"{name}_us_per_request"] = round(seconds / number * 1e6, 3)
+    return results
+
+
+if __name__ == "__main__":
+    print(json.dumps(main(), indent=2))
@@ -1,6 +1,9 @@
-from typing import Any, Callable
+import time
+from typing import TYPE_CHECKING, Any, Callable
 
-from quart import Quart
+if TYPE_CHECKING:
+    # Quart is only imported with setup, so that importing the package stays cheap
+    from quart import Quart
 
 
 def create_app(
@@ -11,10 +14,12 @@ def create_app(
     modelinfo_fn: Callable[[], Any] | None = None,
     request_parser: Callable[[Any], dict[str, Any]] | None = None,
     method_decorators: list[Callable] | None = None,
-) -> Quart:
+) -> "Quart":
+    started = time.perf_counter()
     from taranis_base_bot.setup import setup
 
-    return setup(
+    imports = time.perf_counter() - started
+    app = setup(
         name=name,
         config=config,
         url_prefix=url_prefix,
@@ -24,6 +29,12 @@ def create_app(
         method_decorators=method_decorators,
     )
 
+    slot = app.extensions["model_slot"]
+    slot.started = started
+    slot.phases = {"imports": imports, **slot.phases}
+    slot.log_phases("Created app")
+    return app
+
 
 if __name__ == "__main__":
     raise SystemExit("Cannot run taranis-base-bot directly. Use 'from taranis-base-bot import create_app' instead.")
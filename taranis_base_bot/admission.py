@@ -0,0 +1,95 @@
+import asyncio
+import math
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import AsyncIterator
+
+
+class Overloaded(Exception):
+    """Raised by AdmissionController.acquire when the wait queue is full"""
+
+    def __init__(self, retry_after: int) -> None:
+        super().__init__(f"Too many requests, retry after {retry_after}s")
+        self.retry_after = retry_after
+
+
+class AdmissionController:
+    """
+    Caps the number of predictions in flight at `max_inflight` (0 means unlimited).
+    Further requests wait in a FIFO queue of at most `max_queue` entries; beyond that `acquire` raises Overloaded
+    with a Retry-After hint derived from the moving average of the observed service time.
+    """
+
+    def __init__(self, max_inflight: int = 0, max_queue: int = 64, smoothing: float = 0.2) -> None:
+        self.max_inflight = max_inflight
+        self.max_queue = max(max_queue, 0)
+        self.inflight = 0
+        self.rejected = 0
+        self._smoothing = smoothing
+        self._service_time: float | None = None
+        self._waiters: deque[asyncio.Future] = deque()
+
+    @property
+    def queued(self) -> int:
+        return len(self._waiters)
+
+    @property
+    def saturated(self) -> bool:
+        return self.max_inflight > 0 and self.inflight >= self.max_inflight and self.queued >= self.max_queue
+
+    def retry_after(self) -> int:
+        """Seconds until the queue ahead of a new request has likely drained"""
+        service_time = self._service_time or 1.0
+        return max(1, math.ceil((self.queued + 1) * service_time / max(self.max_inflight, 1)))
+
+    async def acquire(self) -> float:
+        """Waits for a free slot and returns its start time, to be passed to `release`"""
+        if self.max_inflight <= 0 or (self.inflight < self.max_inflight and not self._waiters):
+            self.inflight += 1
+            return time.monotonic()
+        if self.queued >= self.max_queue:
+            self.rejected += 1
+            raise Overloaded(self.retry_after())
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            await waiter
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                # the slot was handed over right before the cancellation, pass it on
+                self._release_slot()
+            raise
+        finally:
+            if waiter in self._waiters:
+                self._waiters.remove(waiter)
+        return time.monotonic()
+
+    def release(self, started: float) -> None:
+        elapsed = time.monotonic() - started
+        if self._service_time is None:
+            self._service_time = elapsed
+        else:
+            self._service_time += self._smoothing * (elapsed - self._service_time)
+        self._release_slot()
+
+    def _release_slot(self) -> None:
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                # the slot goes straight to the next waiter, inflight stays the same
+                waiter.set_result(None)
+                return
+        self.inflight -= 1
+
+    @asynccontextmanager
+    async def slot(self) -> AsyncIterator[None]:
+        started = await self.acquire()
+        try:
+            yield
+        finally:
+            self.release(started)
+
+    def stats(self) -> dict[str, int]:
+        return {"inflight": self.inflight, "queued": self.queued, "rejected": self.rejected}
@@ -0,0 +1,77 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Sequence
+
+from taranis_base_bot.log import logger
+
+
+class MicroBatcher:
+    """
+    Collects concurrent `predict` calls and forwards them as one `predict_batch` call.
+
+    A batch is flushed as soon as `max_size` calls are pending or `max_wait_ms`
+    after the first call of the batch arrived, whichever comes first.
+    Each caller receives the result at its own position in the returned list.
+    A result that is an Exception instance is raised for that caller only.
+    """
+
+    def __init__(
+        self,
+        predict_batch_fn: Callable[[list[dict[str, Any]]], Awaitable[Sequence[Any]]],
+        max_size: int,
+        max_wait_ms: float,
+    ) -> None:
+        if max_size < 1:
+            raise ValueError("max_size must be at least 1")
+        self._predict_batch = predict_batch_fn
+        self._max_size = max_size
+        self._max_wait = max(max_wait_ms, 0) / 1000
+        self._pending: list[tuple[dict[str, Any], asyncio.Future]] = []
+        self._timer: asyncio.TimerHandle | None = None
+        self._tasks: set[asyncio.Task] = set()
+
+    async def __call__(self, **kwargs: Any) -> Any:
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((kwargs, future))
+
+        if len(self._pending) >= self._max_size:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self._max_wait, self._flush)
+
+        return await future
+
+    def _flush(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+        batch, self._pending = self._pending, []
+        # callers that gave up while waiting (cancelled) are not sent to the model
+        batch = [(kwargs, future) for kwargs, future in batch if not future.done()]
+        if not batch:
+            return
+
+        task = asyncio.ensure_future(self._run(batch))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, batch: list[tuple[dict[str, Any], asyncio.Future]]) -> None:
+        try:
+            results = await self._predict_batch([kwargs for kwargs, _ in batch])
+            if len(results) != len(batch):
+                raise ValueError(f"predict_batch returned {len(results)} results for {len(batch)} inputs")
+        except Exception as e:
+            logger.error(f"Batch prediction of size {len(batch)} failed with error: {e}")
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        for (_, future), result in zip(batch, results):
+            if future.done():
+                continue
+            if isinstance(result, Exception):
+                future.set_exception(result)
+            else:
+                future.set_result(result)
@@ -1,67 +1,601 @@
+import asyncio
+import hashlib
 import inspect
-import json
-from typing import Any, Callable, Dict, List, Awaitable
+import time
+from collections.abc import AsyncIterator
+from functools import partial
+from typing import TYPE_CHECKING, Any, Callable, Dict, Iterable, List, Awaitable
 
-from quart import Blueprint, jsonify, request
+from quart import Blueprint, Response, current_app, g, jsonify, request
 from quart.views import MethodView
 
+from taranis_base_bot.admission import AdmissionController, Overloaded
+from taranis_base_bot.cache import ResultCache, cache_key
+from taranis_base_bot.codec import (
+    CBOR,
+    JSON,
+    MSGPACK,
+    PayloadTooLarge,
+    UnsupportedEncoding,
+    body_decoder,
+    body_encoder,
+    compress,
+    compress_stream,
+    json_encoder,
+    negotiate_coding,
+    negotiate_media_type,
+)
+from taranis_base_bot.coalesce import SingleFlight
+from taranis_base_bot.deadlines import CancellationStats, DeadlineExceeded, request_deadline
+from taranis_base_bot.decorators import api_key_required
+from taranis_base_bot.lifecycle import ModelNotReady, ModelSlot
 from taranis_base_bot.log import logger
+from taranis_base_bot.metrics import CONTENT_TYPE, BotMetrics
+from taranis_base_bot.payload import read_items, read_payload
+from taranis_base_bot.registry import UnknownModel
+
+if TYPE_CHECKING:
+    from taranis_base_bot.profiling import RequestProfiler
+
+
+async def call_predict(predict_fn: Callable[..., Any], kwargs: Dict[str, Any]) -> Any:
+    """Calls `predict_fn`, returning its awaited result or, for async generator predictors, the async iterator of partial results"""
+    result = predict_fn(**kwargs)
+    if inspect.isawaitable(result):
+        result = await result
+    return result
+
+
+def overloaded_response(error: Overloaded, status: int):
+    return jsonify({"error": "Bot is overloaded, retry later."}), status, {"Retry-After": str(error.retry_after)}
+
+
+def deadline_exceeded_response():
+    return jsonify({"error": "Prediction deadline exceeded."}), 504
+
+
+def not_ready_response(error: ModelNotReady):
+    return jsonify({"error": f"{error}, retry later."}), 503, {"Retry-After": "5"}
+
+
+def unknown_model_response(error: UnknownModel):
+    return jsonify({"error": str(error)}), 404
+
+
+# responses larger than this are compressed in a thread, so that the event loop keeps serving other requests
+COMPRESS_IN_THREAD_BYTES = 1024 * 1024
+# bulk results in binary formats are sent as a sequence of objects without separators
+BULK_MIMETYPES = {JSON: "application/x-ndjson", MSGPACK: MSGPACK, CBOR: "application/cbor-seq"}
+
+
+def stream_response(chunks: AsyncIterator[bytes], mimetype: str, headers: dict[str, str], compress_responses: bool) -> Response:
+    """Response streaming `chunks`, compressed with the coding the client accepts if `compress_responses` is set"""
+    coding = negotiate_coding(request.accept_encodings) if compress_responses else None
+    if coding is not None:
+        chunks = compress_stream(chunks, coding)
+        headers = {**headers, "Content-Encoding": coding, "Vary": "Accept-Encoding"}
+    return Response(chunks, mimetype=mimetype, headers=headers)
+
+
+def result_namespace(result_cache: ResultCache | None, model_version: Callable[[], str] | None, media_type: str) -> str:
+    """Namespace for the `cache_key` of a result, so that results are cached and shared per model version and body format"""
+    namespace = result_cache.namespace if result_cache is not None else ""
+    if model_version is not None:
+        namespace = f"{namespace}|{model_version()}"
+    return namespace if media_type == JSON else f"{namespace}|{media_type}"
+
+
+def undecodable_payload_response(error: ValueError):
+    if isinstance(error, UnsupportedEncoding):
+        return jsonify({"error": str(error)}), 415
+    if isinstance(error, PayloadTooLarge):
+        return jsonify({"error": str(error)}), 413
+    return jsonify({"error": f"Could not decode payload: {error}"}), 400
 
 
 class InferenceView(MethodView):
     """
     Generic POST endpoint that:
-    - parses request JSON via `request_parser`
-    - calls `predict_fn(**kwargs)`
-    - returns JSON
+    - decodes the request body with `read_payload`, answering 413 once it exceeds `max_body_bytes` (0 means no limit),
+      and parses it via `request_parser`, adding the URL variables of the route to the kwargs
+    - looks up the result in `result_cache`, unless the request sends `Cache-Control: no-cache` or `no-store`
+    - with a `coalescer`, attaches requests with the same kwargs as one in flight to its prediction (`X-Coalesced: 1`)
+    - keys cached and shared results by `model_version()` as well, so that the results of a replaced model are not served
+    - calls `predict_fn(**kwargs)` once `admission` grants a slot, or answers `reject_status` with Retry-After
+    - cancels the prediction once the request deadline passes (504) or the client disconnects, counting both in `cancellations`
+    - returns JSON, or MessagePack or CBOR if the client accepts them, or streams partial results if `predict_fn` is an async generator
+    - with `compress_responses`, compresses streams with a coding from Accept-Encoding (other responses are compressed by the blueprint)
     """
 
     def __init__(
         self,
-        predict_fn: Callable[..., Awaitable[Any]],
+        predict_fn: Callable[..., Awaitable[Any] | AsyncIterator[Any]],
         request_parser: Callable[[Any], Dict[str, Any]],
+        result_cache: ResultCache | None = None,
+        admission: AdmissionController | None = None,
+        reject_status: int = 503,
+        default_timeout: float = 0,
+        cancellations: CancellationStats | None = None,
+        metrics: BotMetrics | None = None,
+        coalescer: SingleFlight | None = None,
+        compress_responses: bool = False,
+        max_body_bytes: int = 0,
+        model_version: Callable[[], str] | None = None,
     ) -> None:
         super().__init__()
         self._predict_fn = predict_fn
         self._parse = request_parser
+        self._cache = result_cache
+        self._coalescer = coalescer
+        self._model_version = model_version
+        self._compress = compress_responses
+        self._max_body_bytes = max_body_bytes
+        self._admission = admission or AdmissionController()
+        self._reject_status = reject_status
+        self._default_timeout = default_timeout
+        self._cancellations = cancellations or CancellationStats()
+        self._metrics = metrics or BotMetrics()
 
-    async def post(self):
-        data = await request.get_json()
-        sanitized_payload = json.dumps(data).replace("\r", "").replace("\n", "")
-        logger.debug(f"Payload: {sanitized_payload}")
+    async def post(self, **route_kwargs: Any):
+        try:
+            deadline = request_deadline(request.headers, self._default_timeout)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+
+        stage = time.perf_counter()
+        try:
+            data = await read_payload(self._max_body_bytes)
+        except ValueError as e:
+            return undecodable_payload_response(e)
+        stage = self._metrics.observe_stage("decode", stage)
+        logger.debug("Payload: %s", logger.truncate(data))
 
         if not isinstance(data, dict):
             return jsonify({"error": "Payload must be a dict!"}), 400
         try:
-            kwargs = self._parse(data)
+            kwargs = self._parse(data) | route_kwargs
         except Exception as e:
             logger.error(f"Parsing payload failed with error: {e}")
             return jsonify({"error": "Could not parse payload. Check bot logs for more details."}), 400
+        self._metrics.observe_stage("parse", stage)
+
+        media_type = negotiate_media_type(request.accept_mimetypes)
+        mimetype = current_app.json.mimetype if media_type == JSON else media_type
+        encode = body_encoder(media_type)
+        headers = {}
+        key = None
+        if self._cache is not None or self._coalescer is not None:
+            key = cache_key(kwargs, result_namespace(self._cache, self._model_version, media_type))
+        if self._cache is not None and key is not None:
+            if request.cache_control.no_cache or request.cache_control.no_store:
+                headers["X-Cache"] = "BYPASS"
+            else:
+                body = await self._cache.get(key)
+                if body is not None:
+                    return Response(body, mimetype=mimetype, headers={"X-Cache": "HIT"})
+                headers["X-Cache"] = "MISS"
 
         try:
-            result = await self._predict_fn(**kwargs)
-            logger.debug(f"Bot output: {result}")
-            return jsonify(result)
+            if self._coalescer is None or key is None:
+                outcome = await self._run(kwargs, deadline, encode)
+            else:
+                # the shared prediction has no deadline of its own, each request waits for it until its own deadline
+                shared = partial(self._run, kwargs, None, encode, shared=True)
+                outcome, leader = await self._coalescer.run(key, shared, deadline, self._cancellations)
+                if not leader:
+                    if isinstance(outcome, Response):
+                        # a stream can only be sent to one client, so this request runs its own prediction
+                        outcome = await self._run(kwargs, deadline, encode)
+                    else:
+                        headers["X-Coalesced"] = "1"
+        except Overloaded as e:
+            logger.warning(f"Rejecting request, {self._admission.queued} requests are already waiting")
+            return overloaded_response(e, self._reject_status)
+        except DeadlineExceeded:
+            return deadline_exceeded_response()
+        except ModelNotReady as e:
+            return not_ready_response(e)
+        except UnknownModel as e:
+            return unknown_model_response(e)
         except Exception as e:
             logger.error(f"Bot failed with error: {e}")
             return jsonify({"error": "Bot execution failed. Check bot logs for more details."}), 400
+        if isinstance(outcome, Response):
+            return outcome
+
+        if self._cache is not None and key is not None and not request.cache_control.no_store:
+            await self._cache.set(key, outcome)
+        return Response(outcome, mimetype=mimetype, headers=headers)
+
+    async def _run(
+        self, kwargs: Dict[str, Any], deadline: float | None, encode: Callable[[Any], bytes], shared: bool = False
+    ) -> bytes | Response:
+        """
+        Runs the prediction once `admission` grants a slot and returns the result serialized with `encode`, or the response streaming it.
+        Raises DeadlineExceeded when the deadline passes first, counting that and disconnects in `cancellations`,
+        except for a `shared` prediction, which the coalescer cancels and counts once all its requests have gone away.
+        """
+        try:
+            async with asyncio.timeout_at(deadline):
+                started = await self._admission.acquire()
+        except TimeoutError:
+            self._cancellations.expired += 1
+            raise DeadlineExceeded("Deadline passed while waiting for a slot") from None
+        except asyncio.CancelledError:
+            if not shared:
+                self._cancellations.disconnected += 1
+            raise
+
+        if deadline is not None and deadline <= asyncio.get_running_loop().time():
+            # expired while queued, skip the prediction
+            self._admission.release(started)
+            self._cancellations.expired += 1
+            raise DeadlineExceeded("Deadline passed while waiting for a slot")
+
+        release = True
+        timeout = asyncio.timeout_at(deadline)
+        try:
+            async with timeout:
+                stage = time.perf_counter()
+                result = await call_predict(self._predict_fn, kwargs)
+                if isinstance(result, AsyncIterator):
+                    response = await self._stream(result, on_close=lambda: self._admission.release(started))
+                    # the stream holds the slot until it is closed, predict time is the time to the first part
+                    self._metrics.observe_stage("predict", stage)
+                    release = False
+                    return response
+            stage = self._metrics.observe_stage("predict", stage)
+            logger.debug("Bot output: %s", logger.truncate(result))
+            body = encode(result)
+            self._metrics.observe_stage("serialize", stage)
+            return body
+        except TimeoutError:
+            if not timeout.expired():
+                raise
+            logger.warning("Cancelled prediction after the request deadline passed")
+            self._cancellations.deadline += 1
+            raise DeadlineExceeded("Deadline passed during the prediction") from None
+        except asyncio.CancelledError:
+            if shared:
+                logger.warning("Cancelled shared prediction after all its requests have gone away")
+            else:
+                logger.warning("Cancelled prediction after the client disconnected")
+                self._cancellations.disconnected += 1
+            raise
+        finally:
+            if release:
+                self._admission.release(started)
+
+    async def _stream(self, parts: AsyncIterator[Any], on_close: Callable[[], None]) -> Response:
+        """
+        Streams partial results as JSON, in Server-Sent Events if the client asks for `text/event-stream`, as NDJSON otherwise.
+        The first part is awaited before the response starts, so a predictor failing right away still gets a 400.
+        """
+        try:
+            first = [await anext(parts)]
+        except StopAsyncIteration:
+            first = []
+
+        event_stream = request.accept_mimetypes.best_match(["application/x-ndjson", "text/event-stream"]) == "text/event-stream"
+        encode = json_encoder()
+
+        def frame(part: Any, event: bytes = b"") -> bytes:
+            return event + b"data: " + encode(part) + b"\n\n" if event_stream else encode(part) + b"\n"
+
+        async def generate() -> AsyncIterator[bytes]:
+            try:
+                for part in first:
+                    yield frame(part)
+                async for part in parts:
+                    yield frame(part)
+            except Exception as e:
+                logger.error(f"Bot failed while streaming with error: {e}")
+                yield frame({"error": "Bot execution failed. Check bot logs for more details."}, event=b"event: error\n")
+            finally:
+                aclose = getattr(parts, "aclose", None)
+                try:
+                    if aclose is not None:
+                        await aclose()
+                finally:
+                    on_close()
+
+        return stream_response(
+            generate(),
+            mimetype="text/event-stream" if event_stream else "application/x-ndjson",
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+            compress_responses=self._compress,
+        )
+
+
+class BulkInferenceView(MethodView):
+    """
+    POST endpoint for a list of payloads that:
+    - runs every item through `request_parser` and `predict_fn(**kwargs)`, adding the URL variables of the route to the kwargs
+    - keeps at most `max_concurrency` items in flight, each also taking a slot from `admission`
+    - streams one NDJSON line per item as soon as it finishes, or one MessagePack object or CBOR item if the client accepts them
+    - looks up and stores the result of each item in `result_cache` under the same key as InferenceView does for it,
+      unless the request sends `Cache-Control: no-cache` (no lookup) or `no-store` (neither)
+    Lines are `{"index": i, "result": ...}` or `{"index": i, "error": ...}`, in completion order.
+    The request body is decoded like the one of InferenceView, a JSON array item by item while it arrives,
+    and rejected with 413 once it exceeds `max_body_bytes` (0 means no limit). `compress_responses` compresses the stream.
+    """
+
+    def __init__(
+        self,
+        predict_fn: Callable[..., Awaitable[Any]],
+        request_parser: Callable[[Any], Dict[str, Any]],
+        max_concurrency: int = 8,
+        max_items: int = 1000,
+        admission: AdmissionController | None = None,
+        reject_status: int = 503,
+        compress_responses: bool = False,
+        max_body_bytes: int = 0,
+        result_cache: ResultCache | None = None,
+        model_version: Callable[[], str] | None = None,
+    ) -> None:
+        super().__init__()
+        self._predict_fn = predict_fn
+        self._parse = request_parser
+        self._cache = result_cache
+        self._model_version = model_version
+        self._admission = admission or AdmissionController()
+        self._reject_status = reject_status
+        self._max_concurrency = max(max_concurrency, 1)
+        self._max_items = max_items
+        self._compress = compress_responses
+        self._max_body_bytes = max_body_bytes
+
+    async def post(self, **route_kwargs: Any):
+        try:
+            data = await read_items(self._max_body_bytes, self._max_items)
+        except ValueError as e:
+            return undecodable_payload_response(e)
+        if data is None:
+            return jsonify({"error": "Payload must be a list!"}), 400
+        if len(data) > self._max_items:
+            return jsonify({"error": f"Payload must not contain more than {self._max_items} items!"}), 400
+        if self._admission.saturated:
+            return overloaded_response(Overloaded(self._admission.retry_after()), self._reject_status)
+        logger.debug("Bulk payload with %d items", len(data))
+
+        media_type = negotiate_media_type(request.accept_mimetypes)
+        separator = b"\n" if media_type == JSON else b""
+        encode = body_encoder(media_type)
+        predict_item = partial(self._predict_item, route_kwargs=route_kwargs)
+        if self._cache is not None and not request.cache_control.no_store:
+            predict_item = partial(
+                predict_item,
+                namespace=result_namespace(self._cache, self._model_version, media_type),
+                encode=encode,
+                decode=None if request.cache_control.no_cache else body_decoder(media_type),
+            )
+        chunks = self._stream(data, encode, separator, predict_item)
+        return stream_response(chunks, mimetype=BULK_MIMETYPES[media_type], headers={}, compress_responses=self._compress)
+
+    async def _predict_item(
+        self,
+        index: int,
+        item: Any,
+        route_kwargs: dict[str, Any],
+        namespace: str | None = None,
+        encode: Callable[[Any], bytes] | None = None,
+        decode: Callable[[bytes], Any] | None = None,
+    ) -> dict[str, Any]:
+        """
+        Line of a payload item. With a `namespace`, its result is stored in `result_cache` serialized with `encode`,
+        and with `decode` as well, a stored result is returned without predicting.
+        """
+        if not isinstance(item, dict):
+            return {"index": index, "error": "Payload must be a dict!"}
+        try:
+            kwargs = self._parse(item) | route_kwargs
+        except Exception as e:
+            logger.error(f"Parsing payload item {index} failed with error: {e}")
+            return {"index": index, "error": "Could not parse payload. Check bot logs for more details."}
+
+        key = None
+        if namespace is not None:
+            key = cache_key(kwargs, namespace)
+            body = await self._cache.get(key) if key is not None and decode is not None else None  # type: ignore[union-attr]
+            if body is not None:
+                return {"index": index, "result": decode(body)}  # type: ignore[misc]
+
+        try:
+            async with self._admission.slot():
+                result = await call_predict(self._predict_fn, kwargs)
+                if isinstance(result, AsyncIterator):
+                    # "/" streams these, so there is no result of it to share
+                    key = None
+                    result = [part async for part in result]
+        except Overloaded:
+            return {"index": index, "error": "Bot is overloaded, retry later."}
+        except ModelNotReady as e:
+            return {"index": index, "error": f"{e}, retry later."}
+        except UnknownModel as e:
+            return {"index": index, "error": str(e)}
+        except Exception as e:
+            logger.error(f"Bot failed on payload item {index} with error: {e}")
+            return {"index": index, "error": "Bot execution failed. Check bot logs for more details."}
+
+        if key is not None:
+            try:
+                body = encode(result)  # type: ignore[misc]
+            except Exception:
+                # serializing the line fails as well and reports the error
+                return {"index": index, "result": result}
+            await self._cache.set(key, body)  # type: ignore[union-attr]
+        return {"index": index, "result": result}
+
+    async def _stream(
+        self,
+        items: Iterable[Any],
+        dumps: Callable[[Any], bytes],
+        separator: bytes,
+        predict_item: Callable[[int, Any], Awaitable[dict[str, Any]]],
+    ) -> AsyncIterator[bytes]:
+        results: asyncio.Queue[dict[str, Any] | None] = asyncio.Queue()
+        indexed_items = enumerate(items)
+
+        async def worker() -> None:
+            # all workers pull from the same iterator, so at most `max_concurrency` items are in flight
+            for index, item in indexed_items:
+                await results.put(await predict_item(index, item))
+
+        workers = [asyncio.ensure_future(worker()) for _ in range(self._max_concurrency)]
+        for w in workers:
+            w.add_done_callback(lambda _: results.put_nowait(None))
+
+        try:
+            remaining = len(workers)
+            while remaining:
+                entry = await results.get()
+                if entry is None:
+                    remaining -= 1
+                    continue
+                try:
+                    line = dumps(entry)
+                except Exception as e:
+                    logger.error(f"Serializing result of payload item {entry['index']} failed with error: {e}")
+                    line = dumps({"index": entry["index"], "error": "Bot output could not be serialized."})
+                yield line + separator
+        finally:
+            for w in workers:
+                w.cancel()
 
 
 class HealthView(MethodView):
+    """GET endpoint reporting the number of predictions in flight and waiting for a slot, and how many were cancelled"""
+
+    def __init__(self, admission: AdmissionController, cancellations: CancellationStats) -> None:
+        super().__init__()
+        self._admission = admission
+        self._cancellations = cancellations
+
+    async def get(self):
+        return jsonify(
+            {
+                "status": "ok",
+                "inflight": self._admission.inflight,
+                "queued": self._admission.queued,
+                "cancelled": self._cancellations.stats(),
+            }
+        )
+
+
+class ReadyView(MethodView):
+    """GET endpoint answering 200 once `model_slot` is loaded and warmed up, 503 before, with the startup phase durations"""
+
+    def __init__(self, model_slot: ModelSlot | None = None) -> None:
+        super().__init__()
+        self._slot = model_slot
+
+    async def get(self):
+        if self._slot is None:
+            return jsonify({"status": "ready"})
+        return jsonify(self._slot.status()), 200 if self._slot.ready else 503
+
+
+class ReloadView(MethodView):
+    """
+    POST endpoint starting `reload_fn`, a reload of the model in `model_slot` without downtime.
+    Answers 202 right away, or with `?wait=true` once the new model serves requests (200) or the reload failed (500).
+    """
+
+    def __init__(self, model_slot: ModelSlot, reload_fn: Callable[[], "asyncio.Task"]) -> None:
+        super().__init__()
+        self._slot = model_slot
+        self._reload = reload_fn
+
+    async def post(self):
+        task = self._reload()
+        logger.info(f"Model reload requested by {request.remote_addr}")
+        if request.args.get("wait", "").lower() not in ("1", "true", "yes"):
+            return jsonify(self._slot.status()), 202
+        # the reload carries on if the client goes away
+        await asyncio.shield(task)
+        return jsonify(self._slot.status()), 500 if self._slot.reload_error else 200
+
+
+class MetricsView(MethodView):
+    """GET endpoint exposing `metrics` in the Prometheus text format"""
+
+    def __init__(self, metrics: BotMetrics) -> None:
+        super().__init__()
+        self._metrics = metrics
+
+    async def get(self):
+        return Response(self._metrics.render(), content_type=CONTENT_TYPE)
+
+
+class ProfileView(MethodView):
+    """
+    GET endpoint profiling the process for `?seconds=` (at most `max_seconds`) and returning
+    the CPU profile, as collapsed stacks of all threads (`?format=collapsed`) or a cProfile report of the event loop (`?format=pstats`),
+    and the top `?top=` source lines by memory allocated in that time
+    """
+
+    def __init__(self, max_seconds: float = 60) -> None:
+        super().__init__()
+        self._max_seconds = max_seconds
+
+    async def get(self):
+        try:
+            seconds = float(request.args.get("seconds", 5))
+            top = int(request.args.get("top", 20))
+        except ValueError:
+            return jsonify({"error": "seconds and top must be numbers"}), 400
+        profile_format = request.args.get("format", "collapsed")
+        if profile_format not in ("collapsed", "pstats"):
+            return jsonify({"error": "format must be collapsed or pstats"}), 400
+        if not 0 < seconds <= self._max_seconds:
+            return jsonify({"error": f"seconds must be between 0 and {self._max_seconds}"}), 400
+
+        from taranis_base_bot.profiling import allocation_diff, profile_event_loop, sample_stacks
+
+        logger.info(f"Profiling for {seconds}s as requested by {request.remote_addr}")
+        cpu = sample_stacks(seconds) if profile_format == "collapsed" else profile_event_loop(seconds, top=top)
+        try:
+            cpu_profile, allocations = await asyncio.gather(cpu, allocation_diff(seconds, top=top))
+        except RuntimeError as e:
+            return jsonify({"error": str(e)}), 409
+        return jsonify({"seconds": seconds, "format": profile_format, "cpu": cpu_profile, "allocations": allocations})
+
+
+class RequestProfilesView(MethodView):
+    """GET endpoint returning the latest per-request profiles of `profiler`"""
+
+    def __init__(self, profiler: "RequestProfiler") -> None:
+        super().__init__()
+        self._profiler = profiler
+
     async def get(self):
-        return jsonify({"status": "ok"})
+        return jsonify({"sample_rate": self._profiler.sample_rate, "profiles": list(self._profiler.reports)})
 
 
 class ModelInfoView(MethodView):
-    def __init__(self, modelinfo_fn: Callable[[], Any]) -> None:
+    """
+    GET endpoint returning `modelinfo_fn()` as JSON,
+    with an ETag for conditional requests and `Cache-Control: max-age=max_age`
+    """
+
+    def __init__(self, modelinfo_fn: Callable[[], Any], max_age: int = 0) -> None:
         super().__init__()
         self._modelinfo = modelinfo_fn
+        self._max_age = max_age
 
     async def get(self):
-        result = self._modelinfo()
-        if inspect.isawaitable(result):
-            result = await result
-        return jsonify(result)
+        try:
+            result = self._modelinfo()
+            if inspect.isawaitable(result):
+                result = await result
+        except ModelNotReady as e:
+            return not_ready_response(e)
+
+        response = jsonify(result)
+        response.set_etag(hashlib.sha1(await response.get_data(), usedforsecurity=False).hexdigest())
+        response.cache_control.public = True
+        response.cache_control.max_age = self._max_age
+        return await response.make_conditional(request)
 
 
 def create_service_blueprint(
@@ -72,35 +606,164 @@ def create_service_blueprint(
     modelinfo_fn: Callable[[], Any] | Callable[[], Awaitable[Any]],
     request_parser: Callable[[Any], Dict[str, Any]],
     method_decorators: List[Callable] | None = None,
+    result_cache: ResultCache | None = None,
+    modelinfo_max_age: int = 0,
+    bulk_max_concurrency: int = 8,
+    bulk_max_items: int = 1000,
+    admission: AdmissionController | None = None,
+    admission_reject_status: int = 503,
+    predict_timeout: float = 0,
+    cancellations: CancellationStats | None = None,
+    metrics: BotMetrics | None = None,
+    profile_route: bool = False,
+    profile_max_seconds: float = 60,
+    request_profiler: "RequestProfiler | None" = None,
+    model_slot: ModelSlot | None = None,
+    model_selector: str | None = None,
+    reload_fn: Callable[[], "asyncio.Task"] | None = None,
+    coalescer: SingleFlight | None = None,
+    compress_min_bytes: int | None = None,
+    max_body_bytes: int = 0,
+    bulk_max_body_bytes: int = 0,
 ):
     """
-    Returns a Blueprint with three routes:
+    Returns a Blueprint with six routes:
       POST   "/"         -> InferenceView
+      POST   "/batch"    -> BulkInferenceView
       GET    "/health"   -> HealthView
+      GET    "/ready"    -> ReadyView
+      GET    "/metrics"  -> MetricsView
       GET    "/modelinfo"-> ModelInfoView
 
-    - `method_decorators` are applied to the POST method
+    - `method_decorators` are applied to the POST methods
+    - `result_cache` is consulted by the "/" route and for each item of "/batch" before calling `predict_fn`
+    - `admission` bounds the predictions in flight and queued across both POST routes
+    - `coalescer` lets requests to "/" with the same kwargs as one in flight share its prediction
+    - "/ready" reports the state of `model_slot`, or always ready without one, cached results are kept per version of its model
+    - with a `reload_fn` and `model_slot`, POST "/admin/reload" is added behind `api_key_required` and reloads the model
+    - with a `model_selector`, POST "/models/<name>" and "/models/<name>/batch" pass the name as that kwarg to `predict_fn`
+    - `metrics` records request counts, latencies and payload sizes of all routes
+    - request bodies of "/" and "/batch" are rejected with 413 once larger than `max_body_bytes` and `bulk_max_body_bytes`
+      (0 means no limit), checked while they arrive
+    - with `compress_min_bytes`, streams and responses of at least that size are compressed with a coding from Accept-Encoding
+    - the "/" route cancels predictions after `predict_timeout` seconds (0 means none) or the request's own deadline
+    - with `profile_route`, GET "/debug/profile" and "/debug/profile/requests" are added behind `api_key_required`;
+      `request_profiler` profiles a sample of the "/" requests
     """
     bp = Blueprint(name, __name__, url_prefix=url_prefix)
+    if admission is None:
+        admission = AdmissionController()
+    if cancellations is None:
+        cancellations = CancellationStats()
+    if metrics is None:
+        metrics = BotMetrics(admission=admission, cancellations=cancellations, result_cache=result_cache, coalescer=coalescer)
 
     inference_view = InferenceView.as_view(
         f"{name}_predict",
         predict_fn=predict_fn,
         request_parser=request_parser,
+        result_cache=result_cache,
+        admission=admission,
+        reject_status=admission_reject_status,
+        default_timeout=predict_timeout,
+        cancellations=cancellations,
+        metrics=metrics,
+        coalescer=coalescer,
+        compress_responses=compress_min_bytes is not None,
+        max_body_bytes=max_body_bytes,
+        model_version=(lambda: model_slot.model_version) if model_slot is not None else None,
+    )
+
+    bulk_inference_view = BulkInferenceView.as_view(
+        f"{name}_predict_bulk",
+        predict_fn=predict_fn,
+        request_parser=request_parser,
+        max_concurrency=bulk_max_concurrency,
+        max_items=bulk_max_items,
+        admission=admission,
+        reject_status=admission_reject_status,
+        compress_responses=compress_min_bytes is not None,
+        max_body_bytes=bulk_max_body_bytes,
+        result_cache=result_cache,
+        model_version=(lambda: model_slot.model_version) if model_slot is not None else None,
     )
 
+    if request_profiler is not None:
+        inference_view = request_profiler(inference_view)
+
     if method_decorators:
         for dec in reversed(method_decorators):
             inference_view = dec(inference_view)
+            bulk_inference_view = dec(bulk_inference_view)
 
-    health_view = HealthView.as_view(f"{name}_health")
+    health_view = HealthView.as_view(f"{name}_health", admission=admission, cancellations=cancellations)
+    ready_view = ReadyView.as_view(f"{name}_ready", model_slot=model_slot)
+    metrics_view = MetricsView.as_view(f"{name}_metrics", metrics=metrics)
     modelinfo_view = ModelInfoView.as_view(
         f"{name}_modelinfo",
         modelinfo_fn=modelinfo_fn,
+        max_age=modelinfo_max_age,
     )
 
     bp.add_url_rule("/", view_func=inference_view, methods=["POST"])
+    bp.add_url_rule("/batch", view_func=bulk_inference_view, methods=["POST"])
     bp.add_url_rule("/health", view_func=health_view, methods=["GET"])
+    bp.add_url_rule("/ready", view_func=ready_view, methods=["GET"])
+    bp.add_url_rule("/metrics", view_func=metrics_view, methods=["GET"])
     bp.add_url_rule("/modelinfo", view_func=modelinfo_view, methods=["GET"])
+    if model_selector:
+        bp.add_url_rule(f"/models/<{model_selector}>", view_func=inference_view, methods=["POST"])
+        bp.add_url_rule(f"/models/<{model_selector}>/batch", view_func=bulk_inference_view, methods=["POST"])
+
+    if reload_fn is not None and model_slot is not None:
+        reload_view = api_key_required(ReloadView.as_view(f"{name}_reload", model_slot=model_slot, reload_fn=reload_fn))
+        bp.add_url_rule("/admin/reload", view_func=reload_view, methods=["POST"])
+
+    if profile_route:
+        profile_view = api_key_required(ProfileView.as_view(f"{name}_profile", max_seconds=profile_max_seconds))
+        bp.add_url_rule("/debug/profile", view_func=profile_view, methods=["GET"])
+        if request_profiler is not None:
+            request_profiles_view = api_key_required(RequestProfilesView.as_view(f"{name}_request_profiles", profiler=request_profiler))
+            bp.add_url_rule("/debug/profile/requests", view_func=request_profiles_view, methods=["GET"])
+
+    @bp.before_request
+    async def start_timer():
+        g.metrics_started = time.perf_counter()
+
+    @bp.after_request
+    async def record_request(response):
+        endpoint = request.endpoint or ""
+        metrics.requests.inc(endpoint, str(response.status_code))
+        if request.method == "POST":
+            # without a Content-Length header (chunked uploads) the bytes the view has read, the body is not read again here
+            size = request.content_length
+            metrics.payload_bytes.observe(size if size is not None else g.get("request_bytes", 0), "request")
+        if response.content_length is not None:
+            metrics.payload_bytes.observe(response.content_length, "response")
+        started = g.get("metrics_started")
+        if started is not None:
+            metrics.request_seconds.observe(time.perf_counter() - started, endpoint)
+        return response
+
+    if compress_min_bytes is not None:
+
+        @bp.after_request
+        async def compress_response(response):
+            # registered after record_request, so this runs first and the compressed size is recorded
+            size = response.content_length
+            if size is None or size < compress_min_bytes or "Content-Encoding" in response.headers or response.status_code in (204, 304):
+                return response
+            coding = negotiate_coding(request.accept_encodings)
+            if coding is None:
+                return response
+            body = await response.get_data()
+            if size > COMPRESS_IN_THREAD_BYTES:
+                body = await asyncio.to_thread(compress, body, coding)
+            else:
+                body = compress(body, coding)
+            response.set_data(body)
+            response.headers["Content-Encoding"] = coding
+            response.vary.add("Accept-Encoding")
+            return response
 
     return bp
@@ -0,0 +1,286 @@
+import asyncio
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Mapping, Protocol
+
+from taranis_base_bot.codec import _default
+
+
+def _tagged(o: Any) -> Any:
+    """Lossless stand-in for a value json cannot encode, tagged with its type so that e.g. an array and a list differ"""
+    kind = f"{type(o).__module__}.{type(o).__qualname__}"
+    dtype = getattr(o, "dtype", None)
+    if dtype is not None and not getattr(dtype, "hasobject", True) and hasattr(o, "tobytes"):
+        # numpy arrays and scalars by their raw data, which is quicker than listing the values
+        return {"__type__": kind, "dtype": dtype.str, "shape": list(o.shape), "sha256": hashlib.sha256(o.tobytes()).hexdigest()}
+    return {"__type__": kind, "value": _default(o)}
+
+
+def cache_key(kwargs: Mapping[str, Any], namespace: str = "") -> str | None:
+    """
+    Canonical hash of the parsed payload, independent of key order and whitespace.
+    None if the payload holds values that cannot be encoded without loss, such payloads are neither cached nor shared.
+    """
+    try:
+        canonical = json.dumps(kwargs, sort_keys=True, separators=(",", ":"), ensure_ascii=False, default=_tagged)
+    except (TypeError, ValueError):
+        return None
+    return hashlib.sha256(f"{namespace}\x00{canonical}".encode()).hexdigest()
+
+
+class ResultCache(Protocol):
+    """Stores serialized prediction results by `cache_key`"""
+
+    namespace: str
+
+    async def get(self, key: str) -> bytes | None: ...
+
+    async def set(self, key: str, value: bytes) -> None: ...
+
+    async def clear(self) -> None: ...
+
+    def stats(self) -> dict[str, int]: ...
+
+
+class SimpleCache:
+    """
+    In-process result cache.
+    Entries expire after `default_timeout` seconds; the least recently used entries are evicted
+    once there are more than `threshold` entries or more than `max_bytes` of stored results.
+    """
+
+    def __init__(self, default_timeout: int = 300, threshold: int = 500, max_bytes: int = 64 * 1024 * 1024, namespace: str = "") -> None:
+        self.namespace = namespace
+        self._timeout = default_timeout
+        self._threshold = threshold
+        self._max_bytes = max_bytes
+        self._entries: OrderedDict[str, tuple[float, bytes]] = OrderedDict()
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    async def get(self, key: str) -> bytes | None:
+        entry = self._entries.get(key)
+        if entry is None or (self._timeout > 0 and entry[0] < time.monotonic()):
+            if entry is not None:
+                self._remove(key)
+            self.misses += 1
+            return None
+
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry[1]
+
+    async def set(self, key: str, value: bytes) -> None:
+        self.put(key, value)
+
+    def put(self, key: str, value: bytes, timeout: float | None = None) -> None:
+        if len(value) > self._max_bytes:
+            return
+        if key in self._entries:
+            self._remove(key)
+
+        expires = time.monotonic() + (self._timeout if timeout is None else timeout)
+        self._entries[key] = (expires, value)
+        self._bytes += len(value)
+
+        while len(self._entries) > self._threshold or self._bytes > self._max_bytes:
+            self._remove(next(iter(self._entries)))
+
+    async def clear(self) -> None:
+        self._entries.clear()
+        self._bytes = 0
+
+    def stats(self) -> dict[str, int]:
+        return {"hits": self.hits, "misses": self.misses, "entries": len(self._entries), "bytes": self._bytes}
+
+    def _remove(self, key: str) -> None:
+        _, value = self._entries.pop(key)
+        self._bytes -= len(value)
+
+
+class SQLiteCache:
+    """
+    Result cache in a SQLite file under `cache_dir`, shared by all workers on a node and kept across restarts.
+    Entries expire after `default_timeout` seconds; once the file holds more than `disk_max_bytes` of results,
+    the least recently used entries are deleted.
+    The most frequently hit `warm_keys` entries are loaded into an in-process SimpleCache on first use,
+    which also serves as a front cache for repeated lookups in the same worker.
+    Each process opens its own connection on first use, as SQLite connections must not be used across fork().
+    """
+
+    _EVICT_EVERY = 100
+
+    def __init__(
+        self,
+        cache_dir: str,
+        default_timeout: int = 300,
+        threshold: int = 500,
+        max_bytes: int = 64 * 1024 * 1024,
+        disk_max_bytes: int = 1024 * 1024 * 1024,
+        warm_keys: int = 100,
+        namespace: str = "",
+    ) -> None:
+        self.namespace = namespace
+        self._timeout = default_timeout
+        self._disk_max_bytes = disk_max_bytes
+        self._front = SimpleCache(default_timeout=default_timeout, threshold=threshold, max_bytes=max_bytes)
+        self._lock = threading.Lock()
+        self._sets = 0
+        self.hits = 0
+        self.misses = 0
+
+        os.makedirs(cache_dir, exist_ok=True)
+        self._path = os.path.join(cache_dir, "results.sqlite3")
+        self._warm_keys = warm_keys
+        self._db: Any = None
+        self._pid: int | None = None
+        # connections inherited from the parent process, kept so that closing them does not touch the parent's locks
+        self._inherited: list[Any] = []
+        # entries and bytes in the file, counted when connecting and at each eviction, kept up to date by the writes in between
+        self._entries = 0
+        self._bytes = 0
+
+    def _connect(self) -> list[tuple[str, bytes, float]]:
+        """Opens the connection of this process unless it has one, returns the entries to warm load if it opened it. Needs the lock."""
+        if self._pid == os.getpid():
+            return []
+        import sqlite3
+
+        if self._db is not None:
+            self._inherited.append(self._db)
+        self._db = sqlite3.connect(self._path, timeout=10, check_same_thread=False, isolation_level=None)
+        self._pid = os.getpid()
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS results "
+            "(key TEXT PRIMARY KEY, value BLOB NOT NULL, size INTEGER NOT NULL, expires REAL NOT NULL, last_access REAL NOT NULL, "
+            "hits INTEGER NOT NULL DEFAULT 0)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS results_last_access ON results (last_access)")
+        self._entries, self._bytes = self._db.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM results").fetchone()
+        if self._warm_keys <= 0:
+            return []
+        return self._db.execute(
+            "SELECT key, value, expires FROM results WHERE expires > ? ORDER BY hits DESC LIMIT ?", (time.time(), self._warm_keys)
+        ).fetchall()
+
+    def _open(self) -> list[tuple[str, bytes, float]]:
+        with self._lock:
+            return self._connect()
+
+    async def _ensure_open(self) -> None:
+        if self._pid == os.getpid():
+            return
+        rows = await asyncio.to_thread(self._open)
+        now = time.time()
+        for key, value, expires in reversed(rows):
+            self._front.put(key, value, timeout=expires - now)
+
+    async def get(self, key: str) -> bytes | None:
+        await self._ensure_open()
+        value = await self._front.get(key)
+        if value is None:
+            value = await asyncio.to_thread(self._get, key)
+            if value is not None:
+                await self._front.set(key, value)
+
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return value
+
+    async def set(self, key: str, value: bytes) -> None:
+        await self._ensure_open()
+        await self._front.set(key, value)
+        await asyncio.to_thread(self._set, key, value)
+
+    def _get(self, key: str) -> bytes | None:
+        now = time.time()
+        with self._lock:
+            self._connect()
+            row = self._db.execute("SELECT value FROM results WHERE key = ? AND expires > ?", (key, now)).fetchone()
+            if row is None:
+                return None
+            self._db.execute("UPDATE results SET last_access = ?, hits = hits + 1 WHERE key = ?", (now, key))
+        return row[0]
+
+    def _set(self, key: str, value: bytes) -> None:
+        now = time.time()
+        expires = now + self._timeout if self._timeout > 0 else float("inf")
+        with self._lock:
+            self._connect()
+            replaced = self._db.execute("SELECT size FROM results WHERE key = ?", (key,)).fetchone()
+            self._db.execute(
+                "INSERT OR REPLACE INTO results (key, value, size, expires, last_access, hits) VALUES (?, ?, ?, ?, ?, 0)",
+                (key, value, len(value), expires, now),
+            )
+            if replaced is None:
+                self._entries += 1
+            self._bytes += len(value) - (replaced[0] if replaced else 0)
+            self._sets += 1
+            if self._sets % self._EVICT_EVERY == 0:
+                self._evict(now)
+
+    def _evict(self, now: float) -> None:
+        self._db.execute("DELETE FROM results WHERE expires <= ?", (now,))
+        # also picks up the writes of other workers
+        self._entries, self._bytes = self._db.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM results").fetchone()
+        if self._bytes <= self._disk_max_bytes:
+            return
+        # walk from the least recently used entry until enough bytes are freed
+        excess = self._bytes - self._disk_max_bytes
+        freed, keys = 0, []
+        for key, size in self._db.execute("SELECT key, size FROM results ORDER BY last_access"):
+            keys.append(key)
+            freed += size
+            if freed >= excess:
+                break
+        self._db.executemany("DELETE FROM results WHERE key = ?", ((key,) for key in keys))
+        self._entries -= len(keys)
+        self._bytes -= freed
+
+    async def clear(self) -> None:
+        await self._front.clear()
+        await asyncio.to_thread(self._clear)
+
+    def _clear(self) -> None:
+        with self._lock:
+            self._connect()
+            self._db.execute("DELETE FROM results")
+            self._entries = self._bytes = 0
+
+    def stats(self) -> dict[str, int]:
+        # no query here, this runs on the event loop for every scrape of /metrics
+        return {"hits": self.hits, "misses": self.misses, "entries": self._entries, "bytes": self._bytes}
+
+
+def create_result_cache(config) -> ResultCache | None:
+    """Returns the result cache selected by CACHE_TYPE, or None for NullCache"""
+    namespace = f"{config.PACKAGE_NAME}.{config.MODEL}"
+    if config.CACHE_TYPE in ("", "NullCache"):
+        return None
+    if config.CACHE_TYPE == "SimpleCache":
+        return SimpleCache(
+            default_timeout=config.CACHE_DEFAULT_TIMEOUT,
+            threshold=config.CACHE_THRESHOLD,
+            max_bytes=config.CACHE_MAX_BYTES,
+            namespace=namespace,
+        )
+    if config.CACHE_TYPE == "SQLiteCache":
+        return SQLiteCache(
+            config.CACHE_DIR,
+            default_timeout=config.CACHE_DEFAULT_TIMEOUT,
+            threshold=config.CACHE_THRESHOLD,
+            max_bytes=config.CACHE_MAX_BYTES,
+            disk_max_bytes=config.CACHE_DISK_MAX_BYTES,
+            warm_keys=config.CACHE_WARM_KEYS,
+            namespace=namespace,
+        )
+    raise ValueError(f"Unknown CACHE_TYPE {config.CACHE_TYPE}. Use one of SimpleCache, SQLiteCache, NullCache")
@@ -0,0 +1,201 @@
+import asyncio
+import numbers
+from collections.abc import AsyncIterator, Iterator
+from importlib import import_module
+from typing import Any, Awaitable, Callable, Protocol
+
+from taranis_base_bot.log import logger
+
+_WHITESPACE = " \n\t"
+
+
+def _rfind_whitespace(text: str, start: int, end: int) -> int:
+    return max(text.rfind(char, start, end) for char in _WHITESPACE)
+
+
+def _find_whitespace(text: str, start: int, end: int) -> int:
+    found = [index for index in (text.find(char, start, end) for char in _WHITESPACE) if index >= 0]
+    return min(found, default=-1)
+
+
+def split_text(text: str, size: int, overlap: int = 0) -> Iterator[str]:
+    """
+    Yields chunks of `text` of at most `size` characters, each one repeating about the last `overlap` characters of the one before.
+    Chunks end and start at whitespace where there is some nearby, so that words are not cut.
+    The chunks are sliced off as they are consumed, so only those in use are held next to `text`.
+    """
+    start = 0
+    while True:
+        end = start + size
+        if end >= len(text):
+            yield text[start:]
+            return
+        # end at the last whitespace in the second half of the chunk
+        cut = _rfind_whitespace(text, start + size // 2, end)
+        if cut > start:
+            end = cut
+        yield text[start:end]
+
+        next_start = max(end - overlap, start + 1)
+        if overlap:
+            # begin after the first whitespace of the overlap
+            space = _find_whitespace(text, next_start, end)
+            if space >= 0:
+                next_start = space + 1
+        start = next_start
+
+
+class Reducer(Protocol):
+    """Merges the results of the chunks of one text, `add` is called in completion order with the index of each chunk"""
+
+    def add(self, index: int, result: Any) -> None: ...
+
+    def result(self) -> Any: ...
+
+
+def _is_array(value: Any) -> bool:
+    return hasattr(value, "__array__") and not isinstance(value, numbers.Number)
+
+
+def _combine(a: Any, b: Any, fn: Callable[[Any, Any], Any], all_keys: bool) -> Any:
+    """
+    Applies `fn` to the numbers and arrays at the same place in two results of the same structure.
+    With `all_keys`, dict keys present in only one result keep their value, otherwise the keys must match.
+    """
+    if isinstance(a, numbers.Number) and isinstance(b, numbers.Number) or _is_array(a) and _is_array(b):
+        return fn(a, b)
+    if isinstance(a, dict) and isinstance(b, dict):
+        if not all_keys and a.keys() != b.keys():
+            raise ValueError(f"Chunk results have different keys: {sorted(a)} and {sorted(b)}")
+        return {key: _combine(a[key], b[key], fn, all_keys) if key in a and key in b else a.get(key, b.get(key)) for key in a | b}
+    if isinstance(a, (list, tuple)) and isinstance(b, (list, tuple)):
+        if len(a) != len(b):
+            raise ValueError(f"Chunk results have different lengths: {len(a)} and {len(b)}")
+        return [_combine(x, y, fn, all_keys) for x, y in zip(a, b)]
+    if a == b:
+        return a
+    raise ValueError(f"Chunk results cannot be merged: {type(a).__name__} {a!r} and {type(b).__name__} {b!r}")
+
+
+def _map(value: Any, fn: Callable[[Any], Any]) -> Any:
+    if isinstance(value, numbers.Number) or _is_array(value):
+        return fn(value)
+    if isinstance(value, dict):
+        return {key: _map(item, fn) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_map(item, fn) for item in value]
+    return value
+
+
+class MeanReducer:
+    """Element-wise mean of the numbers, lists, dicts and numpy arrays in results of the same structure"""
+
+    def __init__(self) -> None:
+        self._sum: Any = None
+        self._count = 0
+
+    def add(self, index: int, result: Any) -> None:
+        self._sum = result if not self._count else _combine(self._sum, result, lambda a, b: a + b, all_keys=False)
+        self._count += 1
+
+    def result(self) -> Any:
+        return _map(self._sum, lambda value: value / self._count)
+
+
+def _maximum(a: Any, b: Any) -> Any:
+    if _is_array(a):
+        return import_module("numpy").maximum(a, b)
+    return max(a, b)
+
+
+class MaxReducer:
+    """Element-wise maximum of the numbers, lists, dicts and numpy arrays in the results, dict keys of any chunk are kept"""
+
+    def __init__(self) -> None:
+        self._max: Any = None
+        self._empty = True
+
+    def add(self, index: int, result: Any) -> None:
+        self._max = result if self._empty else _combine(self._max, result, _maximum, all_keys=True)
+        self._empty = False
+
+    def result(self) -> Any:
+        return self._max
+
+
+class ConcatReducer:
+    """Results in chunk order, list results are concatenated into one list, e.g. the entities found in each chunk"""
+
+    def __init__(self) -> None:
+        self._results: dict[int, Any] = {}
+
+    def add(self, index: int, result: Any) -> None:
+        self._results[index] = result
+
+    def result(self) -> Any:
+        results = [self._results[index] for index in sorted(self._results)]
+        if all(isinstance(result, list) for result in results):
+            return [item for result in results for item in result]
+        return results
+
+
+# reducers selectable by CHUNK_REDUCER, bots can add their own before creating the app
+REDUCERS: dict[str, Callable[[], Reducer]] = {"mean": MeanReducer, "max": MaxReducer, "concat": ConcatReducer}
+
+
+class ChunkedPredictor:
+    """
+    Wraps `predict_fn` for texts longer than the model takes: the `field` kwarg is split into chunks of `size` characters
+    overlapping by `overlap`, `predict_fn` runs on each chunk with the other kwargs unchanged, and the chunk results are merged
+    by a reducer from REDUCERS. At most `concurrency` chunks are predicted at once, so that a MicroBatcher in front of a
+    `predict_batch` model gets them as one batch. Texts that fit into one chunk, and calls without the field, go to `predict_fn` as they are.
+    Chunks are split off as they are needed and mean and max merge each result as it arrives,
+    so memory stays bounded by `concurrency` chunks however long the text is.
+    """
+
+    def __init__(
+        self,
+        predict_fn: Callable[..., Awaitable[Any]],
+        field: str,
+        size: int,
+        overlap: int = 0,
+        reducer: str = "mean",
+        concurrency: int = 4,
+    ) -> None:
+        if size < 1:
+            raise ValueError("The chunk size must be at least 1")
+        if not 0 <= overlap < size:
+            raise ValueError("The chunk overlap must be at least 0 and smaller than the chunk size")
+        if reducer not in REDUCERS:
+            raise ValueError(f"Unknown chunk reducer {reducer!r}, use one of {', '.join(REDUCERS)}")
+        self._predict_fn = predict_fn
+        self._field = field
+        self._size = size
+        self._overlap = overlap
+        self._reducer = REDUCERS[reducer]
+        self._concurrency = max(concurrency, 1)
+
+    async def __call__(self, **kwargs: Any) -> Any:
+        text = kwargs.get(self._field)
+        if not isinstance(text, str) or len(text) <= self._size:
+            return await self._predict_fn(**kwargs)
+
+        reducer = self._reducer()
+        chunks = enumerate(split_text(text, self._size, self._overlap))
+
+        async def worker() -> None:
+            # all workers pull from the same iterator, so at most `concurrency` chunks are in flight
+            for index, chunk in chunks:
+                result = await self._predict_fn(**(kwargs | {self._field: chunk}))
+                if isinstance(result, AsyncIterator):
+                    result = [part async for part in result]
+                reducer.add(index, result)
+
+        workers = [asyncio.ensure_future(worker()) for _ in range(self._concurrency)]
+        try:
+            await asyncio.gather(*workers)
+        finally:
+            for w in workers:
+                w.cancel()
+        logger.debug("Merged the results of a text of %d characters split into chunks", len(text))
+        return reducer.result()
@@ -0,0 +1,79 @@
+import asyncio
+from typing import Any, Awaitable, Callable
+
+from taranis_base_bot.deadlines import CancellationStats, DeadlineExceeded
+
+
+class _Call:
+    def __init__(self, task: asyncio.Task) -> None:
+        self.task = task
+        self.waiters = 0
+
+
+class SingleFlight:
+    """
+    Runs one call per key at a time: callers arriving with the key of a call in flight wait for its result instead of calling `fn` again.
+    The call runs in its own task, started in the context of the first caller, and is cancelled once every caller has gone away.
+    Each caller waits until its own `deadline`, so an impatient first caller does not fail the others.
+    Counts the calls started, the callers that joined one, and those whose `deadline` passed while waiting for one.
+    """
+
+    def __init__(self) -> None:
+        self._calls: dict[str, _Call] = {}
+        self.calls = 0
+        self.coalesced = 0
+        self.expired = 0
+
+    @property
+    def inflight(self) -> int:
+        return len(self._calls)
+
+    async def run(
+        self,
+        key: str,
+        fn: Callable[[], Awaitable[Any]],
+        deadline: float | None = None,
+        cancellations: CancellationStats | None = None,
+    ) -> tuple[Any, bool]:
+        """
+        Returns the result of `fn()`, or of the call in flight for `key`, and whether this caller started the call.
+        Raises DeadlineExceeded once `deadline` (event loop time) passes, the call itself carries on while other callers wait for it.
+        The caller whose leaving cancels the call counts that in `cancellations`, as a deadline or a disconnect.
+        """
+        call = self._calls.get(key)
+        leader = call is None
+        if call is None:
+            call = self._calls[key] = _Call(asyncio.ensure_future(fn()))
+            call.task.add_done_callback(lambda _: self._forget(key, call))
+            self.calls += 1
+        else:
+            self.coalesced += 1
+
+        call.waiters += 1
+        expired = False
+        try:
+            async with asyncio.timeout_at(deadline):
+                return await asyncio.shield(call.task), leader
+        except TimeoutError:
+            if call.task.done():
+                # the call itself failed with a TimeoutError
+                raise
+            self.expired += 1
+            expired = True
+            raise DeadlineExceeded("Deadline passed while waiting for the shared prediction") from None
+        finally:
+            call.waiters -= 1
+            if not call.waiters and not call.task.done():
+                call.task.cancel()
+                if cancellations is not None:
+                    if expired:
+                        cancellations.deadline += 1
+                    else:
+                        cancellations.disconnected += 1
+
+    def _forget(self, key: str, call: _Call) -> None:
+        if self._calls.get(key) is call:
+            del self._calls[key]
+
+    def stats(self) -> dict[str, int]:
+        return {"calls": self.calls, "coalesced": self.coalesced, "expired": self.expired}
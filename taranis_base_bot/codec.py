@@ -0,0 +1,296 @@
+import dataclasses
+import datetime
+import decimal
+import functools
+import json
+import uuid
+import zlib
+from collections.abc import AsyncIterator, Iterator
+from importlib import import_module
+from typing import Any, Callable
+
+from quart import current_app
+from quart.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson is an optional dependency
+    orjson = None  # type: ignore[assignment]
+
+
+def _default(o: Any) -> Any:
+    """Fallback encoder for the stdlib path, covering what orjson serializes natively"""
+    if hasattr(o, "tolist"):
+        # numpy arrays and numpy scalars
+        return o.tolist()
+    if isinstance(o, (datetime.datetime, datetime.date, datetime.time)):
+        return o.isoformat()
+    if dataclasses.is_dataclass(o) and not isinstance(o, type):
+        return dataclasses.asdict(o)
+    if isinstance(o, (decimal.Decimal, uuid.UUID)):
+        return str(o)
+    if hasattr(o, "__html__"):
+        return str(o.__html__())
+    raise TypeError(f"Object of type {type(o).__name__} is not JSON serializable")
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    """
+    JSON provider installed on the app by `setup()`, used for request bodies and responses.
+    Backed by orjson when it is installed, by the stdlib json module otherwise.
+    Both paths serialize NumPy arrays and scalars, dataclasses and datetimes (as ISO 8601).
+    """
+
+    default = staticmethod(_default)  # type: ignore[assignment]
+    sort_keys = False
+    ensure_ascii = False
+
+    _orjson_options = (orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS) if orjson else 0
+
+    def dumpb(self, obj: Any) -> bytes:
+        """Serialize `obj` to compact UTF-8 JSON bytes"""
+        if orjson is not None:
+            try:
+                options = self._orjson_options | (orjson.OPT_SORT_KEYS if self.sort_keys else 0)
+                return orjson.dumps(obj, default=self.default, option=options)
+            except TypeError:
+                # e.g. integers beyond 64 bit, which the stdlib encoder handles
+                pass
+        return self.dumps(obj, separators=(",", ":")).encode()
+
+    def dumps(self, obj: Any, **kwargs: Any) -> str:
+        if orjson is not None and not kwargs:
+            return self.dumpb(obj).decode()
+        return super().dumps(obj, **kwargs)
+
+    def loads(self, s: str | bytes, **kwargs: Any) -> Any:
+        if orjson is not None and not kwargs:
+            return orjson.loads(s)
+        return json.loads(s, **kwargs)
+
+    def response(self, *args: Any, **kwargs: Any):
+        obj = self._prepare_response_obj(args, kwargs)
+        if (self.compact is None and self._app.debug) or self.compact is False:
+            return super().response(obj)
+        return self._app.response_class(self.dumpb(obj), mimetype=self.mimetype)
+
+
+def dumpb(obj: Any, default: Callable[[Any], Any] = _default, numpy: bool = True) -> bytes:
+    """
+    Compact JSON bytes of `obj` outside of an app, for the same types as FastJSONProvider.
+    Without `numpy`, NumPy arrays are passed to `default` like other types JSON has no notation for.
+    """
+    if orjson is not None:
+        try:
+            options = orjson.OPT_NON_STR_KEYS | (orjson.OPT_SERIALIZE_NUMPY if numpy else 0)
+            return orjson.dumps(obj, default=default, option=options)
+        except TypeError:
+            pass
+    return json.dumps(obj, default=default, separators=(",", ":"), ensure_ascii=False).encode()
+
+
+def loads(data: bytes | bytearray) -> Any:
+    return orjson.loads(data) if orjson is not None else json.loads(data)
+
+
+def json_encoder() -> Callable[[Any], bytes]:
+    """Bytes encoder of the current app's JSON provider, also for apps without a FastJSONProvider"""
+    provider = current_app.json
+    dumpb = getattr(provider, "dumpb", None)
+    if dumpb is not None:
+        return dumpb
+    return lambda obj: provider.dumps(obj).encode()
+
+
+# Alternative body formats and content codings. Their packages are optional and only imported once a request uses them.
+
+JSON = "application/json"
+MSGPACK = "application/msgpack"
+CBOR = "application/cbor"
+_MEDIA_TYPE_ALIASES = {"application/x-msgpack": MSGPACK, "application/vnd.msgpack": MSGPACK}
+_MEDIA_TYPE_MODULES = {MSGPACK: "msgpack", CBOR: "cbor2"}
+_CODING_MODULES = {"zstd": "zstandard"}
+# preferred first when a client accepts several with the same quality
+_CODINGS = ("zstd", "gzip", "deflate")
+
+
+class UnsupportedEncoding(ValueError):
+    pass
+
+
+@functools.cache
+def _optional(name: str) -> Any:
+    try:
+        return import_module(name)
+    except ImportError:
+        return None
+
+
+def _available(name: str, modules: dict[str, str]) -> bool:
+    module = modules.get(name)
+    return module is None or _optional(module) is not None
+
+
+def media_types() -> list[str]:
+    """Body formats usable for requests and responses, JSON first and then those whose package is installed"""
+    return [media_type for media_type in (JSON, MSGPACK, CBOR) if _available(media_type, _MEDIA_TYPE_MODULES)]
+
+
+def content_codings() -> list[str]:
+    """Content codings usable for requests and responses, in order of preference"""
+    return [coding for coding in _CODINGS if _available(coding, _CODING_MODULES)]
+
+
+def canonical_media_type(media_type: str) -> str:
+    return _MEDIA_TYPE_ALIASES.get(media_type, media_type)
+
+
+def negotiate_media_type(accept: Any) -> str:
+    """Response body format for the Accept header `accept` (a werkzeug MIMEAccept), JSON unless the client prefers another available one"""
+    offered = media_types()
+    offered += [alias for alias, media_type in _MEDIA_TYPE_ALIASES.items() if media_type in offered]
+    return canonical_media_type(accept.best_match(offered) or JSON)
+
+
+def negotiate_coding(accept_encoding: Any) -> str | None:
+    """Content coding for the Accept-Encoding header `accept_encoding` (a werkzeug Accept), None without one the client accepts"""
+    return accept_encoding.best_match(content_codings())
+
+
+def body_encoder(media_type: str) -> Callable[[Any], bytes]:
+    """Bytes encoder for `media_type`, the app's JSON provider for JSON"""
+    if media_type == MSGPACK:
+        return functools.partial(_optional("msgpack").packb, default=_default)
+    if media_type == CBOR:
+        return functools.partial(_optional("cbor2").dumps, default=lambda encoder, value: encoder.encode(_default(value)))
+    return json_encoder()
+
+
+def body_decoder(media_type: str) -> Callable[[bytes], Any]:
+    """Decoder for request bodies of `media_type`, raises UnsupportedEncoding for formats that are not available"""
+    media_type = canonical_media_type(media_type)
+    if media_type not in media_types():
+        raise UnsupportedEncoding(f"Unsupported Content-Type {media_type!r}, use one of {', '.join(media_types())}")
+    if media_type == MSGPACK:
+        return functools.partial(_optional("msgpack").unpackb, raw=False)
+    if media_type == CBOR:
+        return _optional("cbor2").loads
+    return current_app.json.loads
+
+
+class PayloadTooLarge(ValueError):
+    def __init__(self, max_size: int) -> None:
+        super().__init__(f"Payload must not be larger than {max_size} bytes")
+        self.max_size = max_size
+
+
+class Decompressor:
+    """
+    Decodes a request body with the `Content-Encoding` `coding` chunk by chunk, raises UnsupportedEncoding for unknown codings
+    and PayloadTooLarge once the decoded body grows beyond `max_size` bytes (0 means no limit).
+    gzip and deflate are decoded as the chunks arrive and stop at the limit. zstd has no decoder that takes chunks and bounds
+    its output, so the compressed chunks are collected, bounded by the limit on received bytes, and `finish` decodes them
+    through a stream reader in reads of at most READ_SIZE bytes, which also stops at the limit.
+    """
+
+    READ_SIZE = 64 * 1024
+
+    def __init__(self, coding: str, max_size: int = 0) -> None:
+        self.coding = coding.strip().lower()
+        if self.coding not in content_codings():
+            raise UnsupportedEncoding(f"Unsupported Content-Encoding {self.coding!r}, use one of {', '.join(content_codings())}")
+        self._max_size = max_size
+        self._size = 0
+        self._pending = bytearray()
+        if self.coding != "zstd":
+            self._decompressor = zlib.decompressobj(wbits=31 if self.coding == "gzip" else 15)
+
+    def _count(self, body: bytes) -> bytes:
+        self._size += len(body)
+        if self._max_size and self._size > self._max_size:
+            raise PayloadTooLarge(self._max_size)
+        return body
+
+    def decompress(self, chunk: bytes) -> bytes:
+        if self.coding == "zstd":
+            self._pending += chunk
+            return b""
+        try:
+            if not self._max_size:
+                body = self._decompressor.decompress(chunk)
+            else:
+                # one byte more than the limit allows is enough to reject the body
+                body = self._decompressor.decompress(chunk, self._max_size - self._size + 1)
+        except Exception as e:
+            raise ValueError(f"Invalid {self.coding} body: {e}") from None
+        return self._count(body)
+
+    def finish(self) -> Iterator[bytes]:
+        """The rest of the body once every chunk is in, checking that it is complete"""
+        if self.coding != "zstd":
+            if not self._decompressor.eof:
+                raise ValueError(f"Invalid {self.coding} body: incomplete or truncated stream")
+            return
+        zstandard = _optional("zstandard")
+        try:
+            expected = zstandard.get_frame_parameters(self._pending).content_size
+            reader = zstandard.ZstdDecompressor().stream_reader(self._pending)
+        except zstandard.ZstdError as e:
+            raise ValueError(f"Invalid zstd body: {e}") from None
+        while True:
+            read_size = min(self.READ_SIZE, self._max_size - self._size + 1) if self._max_size else self.READ_SIZE
+            try:
+                body = reader.read(read_size)
+            except zstandard.ZstdError as e:
+                raise ValueError(f"Invalid zstd body: {e}") from None
+            if not body:
+                break
+            yield self._count(body)
+        # the reader ends quietly on a truncated frame, which shows against the size recorded in the frame, if there is one
+        if expected != zstandard.CONTENTSIZE_UNKNOWN and self._size != expected:
+            raise ValueError("Invalid zstd body: incomplete or truncated stream")
+        reader.close()
+        self._pending = bytearray()
+
+
+def decompressor(coding: str, max_size: int = 0) -> Decompressor | None:
+    """Decompressor for the `Content-Encoding` `coding`, None for uncompressed bodies"""
+    if coding.strip().lower() in ("", "identity"):
+        return None
+    return Decompressor(coding, max_size)
+
+
+def decompress(body: bytes, coding: str, max_size: int = 0) -> bytes:
+    """Decodes a whole request body with the `Content-Encoding` `coding`, see Decompressor"""
+    decoder = decompressor(coding, max_size)
+    if decoder is None:
+        if max_size and len(body) > max_size:
+            raise PayloadTooLarge(max_size)
+        return body
+    return decoder.decompress(body) + b"".join(decoder.finish())
+
+
+def compress(body: bytes, coding: str) -> bytes:
+    if coding == "zstd":
+        return _optional("zstandard").ZstdCompressor(level=3).compress(body)
+    compressor = zlib.compressobj(6, wbits=31 if coding == "gzip" else 15)
+    return compressor.compress(body) + compressor.flush()
+
+
+async def compress_stream(chunks: AsyncIterator[bytes], coding: str) -> AsyncIterator[bytes]:
+    """Compresses a streamed body, flushing after every chunk so that the client can decode each one as it arrives"""
+    if coding == "zstd":
+        zstandard = _optional("zstandard")
+        compressor = zstandard.ZstdCompressor(level=3).compressobj()
+        flush_mode = zstandard.COMPRESSOBJ_FLUSH_BLOCK
+    else:
+        compressor = zlib.compressobj(6, wbits=31 if coding == "gzip" else 15)
+        flush_mode = zlib.Z_SYNC_FLUSH
+    try:
+        async for chunk in chunks:
+            yield compressor.compress(chunk) + compressor.flush(flush_mode)
+    finally:
+        aclose = getattr(chunks, "aclose", None)
+        if aclose is not None:
+            await aclose()
+    yield compressor.flush()
@@ -1,5 +1,5 @@
 from datetime import datetime
-from typing import Dict, Optional
+from typing import Dict, Literal, Optional
 
 from pydantic import ValidationInfo, field_validator
 from pydantic_settings import BaseSettings, SettingsConfigDict
@@ -13,14 +13,61 @@ class CommonSettings(BaseSettings):
     API_KEY: str = ""
 
     COLORED_LOGS: bool = True
+    LOG_MAX_PAYLOAD_CHARS: int = 4096
     BUILD_DATE: datetime = datetime.now()
     GIT_INFO: Optional[Dict[str, str]] = None
-    CACHE_TYPE: str = "SimpleCache"
+    CACHE_TYPE: str = "NullCache"
     CACHE_DEFAULT_TIMEOUT: int = 300
+    CACHE_THRESHOLD: int = 500
+    CACHE_MAX_BYTES: int = 64 * 1024 * 1024
+    CACHE_DIR: str = "/tmp/taranis_bot_cache"
+    CACHE_DISK_MAX_BYTES: int = 1024 * 1024 * 1024
+    CACHE_WARM_KEYS: int = 100
 
     PACKAGE_NAME: str = "taranis_bot"
     HF_MODEL_INFO: bool = False
+    HF_MODEL_INFO_TTL: int = 3600
+    HF_MODEL_INFO_SNAPSHOT: str = ""
+    HF_MODEL_INFO_OFFLINE: bool = False
+    MODELINFO_MAX_AGE: int = 300
     PAYLOAD_SCHEMA: dict[str, dict] = {"key": {"type": "str", "required": True}}
+    CHUNK_FIELD: str = ""
+    CHUNK_SIZE: int = 2000
+    CHUNK_OVERLAP: int = 200
+    CHUNK_REDUCER: str = "mean"
+    CHUNK_CONCURRENCY: int = 8
+
+    BATCH_MAX_SIZE: int = 1
+    BATCH_MAX_WAIT_MS: float = 5.0
+    PREDICT_IN_EXECUTOR: bool = False
+    PREDICT_EXECUTOR_WORKERS: int = 1
+    MODEL_PER_THREAD: bool = False
+    MODEL_SERVER_SOCKET: str = ""
+    MODEL_SERVER_SHM_THRESHOLD: int = 65536
+    MODEL_SERVER_POOL_SIZE: int = 16
+    BULK_MAX_CONCURRENCY: int = 8
+    BULK_MAX_ITEMS: int = 1000
+    MAX_BODY_BYTES: int = 16 * 1024 * 1024
+    BULK_MAX_BODY_BYTES: int = 256 * 1024 * 1024
+    MAX_INFLIGHT: int = 0
+    MAX_QUEUE: int = 64
+    ADMISSION_REJECT_STATUS: Literal[429, 503] = 503
+    PREDICT_TIMEOUT: float = 0
+    COALESCE_REQUESTS: bool = False
+    COMPRESS_RESPONSES: bool = True
+    COMPRESS_MIN_BYTES: int = 1024
+    PROFILE_ROUTE: bool = False
+    PROFILE_MAX_SECONDS: float = 60
+    PROFILE_SAMPLE_RATE: float = 0.0
+    MODEL_BACKGROUND_LOAD: bool = False
+    WARMUP_PAYLOADS: list[dict] = []
+    MODELS: list[str] = []
+    MODEL_SELECTOR: str = "model"
+    MODELS_MAX_RESIDENT: int = 0
+    MODELS_MEMORY_BUDGET: int = 0
+    MODEL_RELOAD_ROUTE: bool = False
+    MODEL_RELOAD_WATCH: str = ""
+    MODEL_RELOAD_POLL_SECONDS: float = 2.0
 
     @field_validator("API_KEY", mode="before")
     @classmethod
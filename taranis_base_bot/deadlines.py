@@ -0,0 +1,56 @@
+import asyncio
+import math
+import time
+from typing import Mapping
+
+TIMEOUT_HEADER = "X-Request-Timeout"
+DEADLINE_HEADER = "X-Request-Deadline"
+
+
+class DeadlineExceeded(Exception):
+    pass
+
+
+def request_deadline(headers: Mapping[str, str], default_timeout: float = 0) -> float | None:
+    """
+    Event loop time by which the prediction for a request must be done, or None without a limit.
+    The earliest of `default_timeout` (seconds, 0 means none), the X-Request-Timeout header (seconds)
+    and the X-Request-Deadline header (Unix timestamp) applies.
+    Raises ValueError for headers that are not finite numbers.
+    """
+    remaining: list[float] = [default_timeout] if default_timeout > 0 else []
+    if timeout := headers.get(TIMEOUT_HEADER):
+        remaining.append(_to_float(TIMEOUT_HEADER, timeout))
+    if deadline := headers.get(DEADLINE_HEADER):
+        remaining.append(_to_float(DEADLINE_HEADER, deadline) - time.time())
+    if not remaining:
+        return None
+    return asyncio.get_running_loop().time() + min(remaining)
+
+
+def _to_float(header: str, value: str) -> float:
+    try:
+        number = float(value)
+    except ValueError:
+        raise ValueError(f"Invalid {header} header {value!r}") from None
+    # nan would compare as neither earlier nor later than any deadline, inf would never expire
+    if not math.isfinite(number):
+        raise ValueError(f"Invalid {header} header {value!r}")
+    return number
+
+
+class CancellationStats:
+    """
+    Counts predictions that were not run to completion because nobody would read the result:
+    - `expired`: the deadline passed before the prediction started, e.g. while waiting for a slot
+    - `deadline`: the prediction was cancelled when the deadline passed
+    - `disconnected`: the prediction was cancelled because the client went away
+    """
+
+    def __init__(self) -> None:
+        self.expired = 0
+        self.deadline = 0
+        self.disconnected = 0
+
+    def stats(self) -> dict[str, int]:
+        return {"expired": self.expired, "deadline": self.deadline, "disconnected": self.disconnected}
@@ -0,0 +1,81 @@
+import asyncio
+import inspect
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Any, Awaitable, Callable
+
+from taranis_base_bot.protocols import Predictor
+
+_thread_state = threading.local()
+
+
+def is_async_callable(fn: Any) -> bool:
+    """True for coroutine functions, async generator functions and objects with an async `__call__`"""
+    if inspect.iscoroutinefunction(fn) or inspect.isasyncgenfunction(fn):
+        return True
+    call = getattr(fn, "__call__", None)
+    return inspect.iscoroutinefunction(call) or inspect.isasyncgenfunction(call)
+
+
+def is_async_generator_callable(fn: Any) -> bool:
+    """True for async generator functions and objects whose `__call__` is one, i.e. streaming predictors"""
+    return inspect.isasyncgenfunction(fn) or inspect.isasyncgenfunction(getattr(fn, "__call__", None))
+
+
+def create_executor(max_workers: int) -> ThreadPoolExecutor:
+    return ThreadPoolExecutor(max_workers=max(max_workers, 1), thread_name_prefix="predict")
+
+
+def _call_blocking(fn: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+    """Runs inside an executor thread. Awaitables are driven by an event loop owned by that thread."""
+    result = fn(*args, **kwargs)
+    if inspect.isawaitable(result):
+        loop = getattr(_thread_state, "loop", None)
+        if loop is None:
+            loop = _thread_state.loop = asyncio.new_event_loop()
+        result = loop.run_until_complete(result)
+    return result
+
+
+def run_in_executor(fn: Callable[..., Any], executor: ThreadPoolExecutor) -> Callable[..., Awaitable[Any]]:
+    """
+    Wraps a (blocking) predict callable so that awaiting it runs `fn` on `executor`
+    and keeps the event loop free for other requests.
+    Async callables are run to completion on a per-thread event loop.
+    """
+
+    async def wrapper(*args: Any, **kwargs: Any) -> Any:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(executor, partial(_call_blocking, fn, *args, **kwargs))
+
+    return wrapper
+
+
+class PerThreadModel:
+    """
+    Hands out one Predictor instance per executor thread for models that are not thread-safe.
+    The instance loaded in `setup()` is reused by the first thread, the others call `factory()`.
+    """
+
+    def __init__(self, factory: Callable[[], Predictor], seed: Predictor | None = None) -> None:
+        self._factory = factory
+        self._seed = seed
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def get(self) -> Predictor:
+        model = getattr(self._local, "model", None)
+        if model is None:
+            with self._lock:
+                model, self._seed = self._seed, None
+            if model is None:
+                model = self._factory()
+            self._local.model = model
+        return model
+
+    def predict(self, **kwargs: Any) -> Any:
+        return self.get().predict(**kwargs)
+
+    def predict_batch(self, inputs: list[dict[str, Any]]) -> Any:
+        return self.get().predict_batch(inputs)  # type: ignore[attr-defined]
@@ -0,0 +1,250 @@
+import asyncio
+import inspect
+import os
+import time
+from collections.abc import AsyncIterator
+from typing import Any, Callable, Sequence
+
+from taranis_base_bot.log import logger
+
+
+class ModelNotReady(Exception):
+    pass
+
+
+async def _call(fn: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+    result = fn(*args, **kwargs)
+    if inspect.isawaitable(result):
+        result = await result
+    return result
+
+
+class _LoadedModel:
+    """predict_fn and modelinfo_fn of one loaded model, the closers releasing it and the number of its predictions in flight"""
+
+    def __init__(self, predict_fn: Callable[..., Any], modelinfo_fn: Callable[[], Any], closers: Sequence[Callable[[], Any]]) -> None:
+        self.predict_fn = predict_fn
+        self.modelinfo_fn = modelinfo_fn
+        self.closers = list(closers)
+        self.inflight = 0
+        self._drained: asyncio.Future | None = None
+
+    def release(self) -> None:
+        self.inflight -= 1
+        if not self.inflight and self._drained is not None and not self._drained.done():
+            self._drained.set_result(None)
+
+    async def release_after(self, parts: AsyncIterator[Any]) -> AsyncIterator[Any]:
+        try:
+            async for part in parts:
+                yield part
+        finally:
+            self.release()
+
+    async def close(self, drain: bool = False) -> None:
+        """Runs the closers, with `drain` only once the predictions in flight are done"""
+        if drain and self.inflight:
+            self._drained = asyncio.get_running_loop().create_future()
+            await self._drained
+        for closer in reversed(self.closers):
+            await _call(closer)
+
+
+class ModelSlot:
+    """
+    Holds the predict_fn and modelinfo_fn of the loaded model and the state reported by the "/ready" route:
+    loading -> warming -> ready, or failed.
+    `predict` and `modelinfo` forward to the loaded callables and raise ModelNotReady before the model is loaded.
+    The duration of each startup phase is kept in `phases`, `total` is measured from `started`.
+    `reload` swaps in a new model while the current one keeps serving, see there.
+    `model_version` identifies the model serving requests, e.g. for keying cached results.
+    """
+
+    def __init__(self, warmup_payloads: Sequence[dict[str, Any]] = (), request_parser: Callable[[Any], dict[str, Any]] | None = None) -> None:
+        self.state = "loading"
+        self.error: str | None = None
+        self.phases: dict[str, float] = {}
+        self.started = time.perf_counter()
+        self._warmup_payloads = list(warmup_payloads)
+        self._parse = request_parser
+        self.generation = 0
+        # set by whoever installs the model, when its weights can be identified across processes and restarts
+        self.version = ""
+        self.reload_error: str | None = None
+        self._loaded: _LoadedModel | None = None
+        self._closers: list[Callable[[], Any]] = []
+        self._task: asyncio.Task | None = None
+        self._reload_task: asyncio.Task | None = None
+
+    @property
+    def ready(self) -> bool:
+        return self.state == "ready"
+
+    @property
+    def model_version(self) -> str:
+        """`version` if the installed model has one, otherwise the generation, which only counts the reloads of this process"""
+        return self.version or str(self.generation)
+
+    @property
+    def reloading(self) -> bool:
+        return self._reload_task is not None and not self._reload_task.done()
+
+    def set(self, predict_fn: Callable[..., Any], modelinfo_fn: Callable[[], Any], closers: Sequence[Callable[[], Any]] = ()) -> None:
+        """Installs the callables of the model, `closers` release its resources when it is replaced or the app stops serving"""
+        self._loaded = _LoadedModel(predict_fn, modelinfo_fn, closers)
+        self.state = "warming"
+
+    def on_close(self, closer: Callable[[], Any]) -> None:
+        """Registers a callable (sync or async) to run when the app stops serving"""
+        self._closers.append(closer)
+
+    async def predict(self, **kwargs: Any) -> Any:
+        loaded = self._loaded
+        if loaded is None:
+            raise ModelNotReady(f"Model is {self.state}")
+        # counted until the result, or the last part of a stream, is there, so a replaced model is only released after that
+        loaded.inflight += 1
+        try:
+            result = await _call(loaded.predict_fn, **kwargs)
+        except BaseException:
+            loaded.release()
+            raise
+        if isinstance(result, AsyncIterator):
+            return loaded.release_after(result)
+        loaded.release()
+        return result
+
+    async def modelinfo(self) -> Any:
+        if self._loaded is None:
+            raise ModelNotReady(f"Model is {self.state}")
+        return await _call(self._loaded.modelinfo_fn)
+
+    async def warm_up(self) -> None:
+        """Runs the warm-up payloads through the request parser and predict_fn, then marks the slot ready"""
+        started = time.perf_counter()
+        for payload in self._warmup_payloads:
+            kwargs = self._parse(payload) if self._parse is not None else payload
+            result = await self.predict(**kwargs)
+            if hasattr(result, "__aiter__"):
+                async for _ in result:
+                    pass
+        self.phases["warmup"] = time.perf_counter() - started
+        self.phases["total"] = time.perf_counter() - self.started
+        self.state = "ready"
+        self.log_phases("Model ready")
+
+    def log_phases(self, message: str) -> None:
+        logger.info(f"{message}, startup phases in seconds: " + ", ".join(f"{name}={duration:.3f}" for name, duration in self.phases.items()))
+
+    def start(self, load: Callable[[], Any] | None = None, install: Callable[[Any], None] | None = None) -> asyncio.Task:
+        """
+        Loads and warms up the model in a background task: `load()` runs in a thread, `install(loaded)` on the event loop
+        and is expected to call `set`. Without `load`, only the warm-up runs.
+        """
+        self._task = asyncio.ensure_future(self._start(load, install))
+        return self._task
+
+    async def _start(self, load: Callable[[], Any] | None, install: Callable[[Any], None] | None) -> None:
+        try:
+            if load is not None:
+                started = time.perf_counter()
+                loaded = await asyncio.to_thread(load)
+                self.phases["load"] = time.perf_counter() - started
+                if install is not None:
+                    started = time.perf_counter()
+                    install(loaded)
+                    self.phases["setup"] = time.perf_counter() - started
+            self.state = "warming"
+            await self.warm_up()
+        except Exception as e:
+            self.state = "failed"
+            self.error = str(e)
+            logger.error(f"Loading the model failed with error: {e}")
+
+    def reload(
+        self, load: Callable[[], Any], install: Callable[["ModelSlot", Any], None], on_swap: Callable[[], Any] | None = None
+    ) -> asyncio.Task:
+        """
+        Replaces the model without downtime: `load()` runs in a thread and `install(staged_slot, loaded)` sets up the new model
+        in a separate slot, which is warmed up while the current model keeps serving. Then the new model takes over, `on_swap()` runs,
+        and the old model is closed once its predictions in flight are done. A failed reload keeps the current model.
+        While a reload is running, its task is returned instead of starting another one.
+        """
+        if not self.reloading:
+            self._reload_task = asyncio.ensure_future(self._reload(load, install, on_swap))
+        return self._reload_task
+
+    async def _reload(self, load: Callable[[], Any], install: Callable[["ModelSlot", Any], None], on_swap: Callable[[], Any] | None) -> None:
+        started = time.perf_counter()
+        staged = ModelSlot(warmup_payloads=self._warmup_payloads, request_parser=self._parse)
+        try:
+            loaded = await asyncio.to_thread(load)
+            staged.phases["load"] = time.perf_counter() - started
+            install(staged, loaded)
+            await staged.warm_up()
+        except Exception as e:
+            await staged.close()
+            self.reload_error = str(e)
+            logger.error(f"Reloading the model failed with error: {e}, keeping the current model")
+            return
+        except BaseException:
+            await staged.close()
+            raise
+
+        old, self._loaded = self._loaded, staged._loaded
+        self.version = staged.version
+        self.generation += 1
+        self.reload_error = None
+        self.state = "ready"
+        self.phases["reload"] = time.perf_counter() - started
+        logger.info(f"Swapped in model generation {self.generation} after {self.phases['reload']:.3f}s")
+        if on_swap is not None:
+            await _call(on_swap)
+        if old is not None:
+            if old.inflight:
+                logger.info(f"Releasing the previous model after its {old.inflight} predictions in flight are done")
+            await old.close(drain=True)
+
+    async def wait_ready(self) -> None:
+        if self._task is not None:
+            await asyncio.shield(self._task)
+
+    def status(self) -> dict[str, Any]:
+        status: dict[str, Any] = {"status": self.state, "phases": {name: round(duration, 6) for name, duration in self.phases.items()}}
+        if self.error:
+            status["error"] = self.error
+        if self.generation or self.reloading or self.reload_error:
+            status["reload"] = {"generation": self.generation, "reloading": self.reloading, "error": self.reload_error}
+        return status
+
+    async def close(self) -> None:
+        for task in (self._task, self._reload_task):
+            if task is not None and not task.done():
+                task.cancel()
+                await asyncio.gather(task, return_exceptions=True)
+        if self._loaded is not None:
+            await self._loaded.close()
+        for closer in reversed(self._closers):
+            await _call(closer)
+
+
+async def watch_file(path: str, interval: float, on_change: Callable[[], Any]) -> None:
+    """Calls `on_change()` whenever the modification time of `path` changes, checked every `interval` seconds, until cancelled"""
+
+    def mtime() -> float | None:
+        try:
+            return os.stat(path).st_mtime
+        except OSError:
+            return None
+
+    last = mtime()
+    while True:
+        await asyncio.sleep(interval)
+        current = mtime()
+        if current != last:
+            last = current
+            logger.info(f"{path} changed")
+            try:
+                await _call(on_change)
+            except Exception as e:
+                logger.error(f"Handling the change of {path} failed with error: {e}")
@@ -1,21 +1,40 @@
 from __future__ import annotations
 
+import atexit
 import logging
 import logging.handlers
+import os
+import queue
 import socket
 import sys
 import traceback
-
-from quart import request
+from typing import Any
 
 
 class TaranisBotLogger:
-    def __init__(self, debug: bool = False, colored: bool = False, syslog_address: tuple[str, int] | None = None):
+    """
+    Logs through a QueueHandler, so the calling thread (usually the event loop) only enqueues records.
+    A background QueueListener formats them and writes to stdout and the optional syslog server.
+    """
+
+    def __init__(
+        self,
+        debug: bool = False,
+        colored: bool = False,
+        syslog_address: tuple[str, int] | None = None,
+        max_payload_chars: int = 4096,
+    ):
         self._debug = debug
         self._colored = colored
         self._syslog_address = syslog_address
+        self._max_payload_chars = max_payload_chars
+        self._listener: logging.handlers.QueueListener | None = None
         self.logger = logging.getLogger()
         self._apply_config()
+        atexit.register(self._stop_listener)
+        if hasattr(os, "register_at_fork"):
+            # the listener thread does not survive a fork, e.g. in taranis_base_bot.preload
+            os.register_at_fork(after_in_child=self._apply_config)
 
     def _apply_config(self) -> None:
         stream_handler = logging.StreamHandler(stream=sys.stdout)
@@ -24,49 +43,79 @@ class TaranisBotLogger:
         else:
             stream_handler.setFormatter(logging.Formatter("[%(levelname)s] - %(message)s"))
 
-        sys_log_handler: logging.Handler | None = None
+        handlers: list[logging.Handler] = [stream_handler]
         if self._syslog_address:
             try:
-                sys_log_handler = logging.handlers.SysLogHandler(address=self._syslog_address, socktype=socket.SOCK_STREAM)
+                handlers.insert(0, logging.handlers.SysLogHandler(address=self._syslog_address, socktype=socket.SOCK_STREAM))
             except Exception:
                 print("Unable to connect to syslog server!")
 
+        self._stop_listener()
+        log_queue: queue.SimpleQueue[logging.LogRecord] = queue.SimpleQueue()
+        self._listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+
         self.logger.handlers.clear()
         self.logger.setLevel(logging.DEBUG if self._debug else logging.INFO)
+        self.logger.addHandler(logging.handlers.QueueHandler(log_queue))
+        self._listener.start()
 
-        if sys_log_handler:
-            self.logger.addHandler(sys_log_handler)
-        self.logger.addHandler(stream_handler)
+    def _stop_listener(self) -> None:
+        if self._listener is not None:
+            self._listener.stop()
+            self._listener = None
 
     def reconfigure_from_settings(self, settings) -> None:
         self._debug = settings.DEBUG
         self._colored = settings.COLORED_LOGS
         self._syslog_address = settings.SYSLOG_ADDRESS
+        self._max_payload_chars = settings.LOG_MAX_PAYLOAD_CHARS
         self._apply_config()
 
-    def debug(self, message):
-        self.logger.debug(message)
+    def isEnabledFor(self, level: int) -> bool:
+        return self.logger.isEnabledFor(level)
+
+    def truncate(self, value: Any) -> Truncated:
+        """Wraps a log argument so it is only converted to str, and cut to LOG_MAX_PAYLOAD_CHARS, if the record is emitted"""
+        return Truncated(value, self._max_payload_chars)
+
+    def debug(self, message, *args):
+        self.logger.debug(message, *args)
 
     def exception(self, message=None):
         if message:
             self.logger.debug(message)
         self.logger.debug(traceback.format_exc())
 
-    def info(self, message):
-        self.logger.info(message)
+    def info(self, message, *args):
+        self.logger.info(message, *args)
+
+    def critical(self, message, *args):
+        self.logger.critical(message, *args)
+
+    def warning(self, message, *args):
+        self.logger.warning(message, *args)
 
-    def critical(self, message):
-        self.logger.critical(message)
+    def error(self, message, *args):
+        self.logger.error(message, *args)
 
-    def warning(self, message):
-        self.logger.warning(message)
 
-    def error(self, message):
-        self.logger.error(message)
+class Truncated:
+    __slots__ = ("value", "limit")
+
+    def __init__(self, value: Any, limit: int):
+        self.value = value
+        self.limit = limit
+
+    def __str__(self) -> str:
+        text = str(self.value).replace("\r", "").replace("\n", "")
+        if len(text) <= self.limit:
+            return text
+        return f"{text[: self.limit]}... [{len(text) - self.limit} more characters]"
 
 
 class TaranisLogFormatter(logging.Formatter):
     def __init__(self):
+        super().__init__()
         grey = "\x1b[38;20m"
         blue = "\x1b[1;36m"
         yellow = "\x1b[33;20m"
@@ -81,26 +130,36 @@ class TaranisLogFormatter(logging.Formatter):
             logging.ERROR: red + self.format_string + reset,
             logging.CRITICAL: bold_red + self.format_string + reset,
         }
+        self._formatters = {level: logging.Formatter(fmt) for level, fmt in self.FORMATS.items()}
+        self._default_formatter = logging.Formatter(self.format_string)
 
     def format(self, record):
-        log_fmt = self.FORMATS.get(record.levelno)
-        formatter = logging.Formatter(log_fmt)
-        return formatter.format(record)
+        return self._formatters.get(record.levelno, self._default_formatter).format(record)
+
+
+def _request():
+    # imported on use, so that importing the logger does not pull in Quart
+    from quart import request
+
+    return request
 
 
 class Logger(TaranisBotLogger):
     def resolve_ip_address(self):
+        request = _request()
         headers_list = request.headers.getlist("X-Forwarded-For")
         return headers_list[0] if headers_list else request.remote_addr
 
     def resolve_method(self):
-        return request.method
+        return _request().method
 
     def resolve_resource(self):
+        request = _request()
         fp_len = len(request.full_path)
         return request.full_path[: fp_len - 1] if request.full_path and request.full_path.endswith("?") else request.full_path
 
     def resolve_data(self):
+        request = _request()
         if "application/json" not in request.headers.get("Content-Type", ""):
             return ""
         if not request.data:
@@ -0,0 +1,216 @@
+"""
+Minimal Prometheus text-format metrics, without a dependency on prometheus_client.
+Metrics are only updated from the event loop, so no locking is needed; recording is a dict lookup and a bisect.
+"""
+
+import os
+import resource
+import time
+from bisect import bisect_left
+from typing import Any, Callable, Iterator, Mapping, Sequence
+
+from taranis_base_bot.admission import AdmissionController
+from taranis_base_bot.cache import ResultCache
+from taranis_base_bot.coalesce import SingleFlight
+from taranis_base_bot.deadlines import CancellationStats
+
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+SIZE_BUCKETS = tuple(float(256 * 4**i) for i in range(9))  # 256 B .. 16 MiB
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+_INF = 'le="+Inf"'
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _escape(value: Any) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_value(value: float) -> str:
+    value = float(value)
+    return str(int(value)) if value.is_integer() else repr(value)
+
+
+class Counter:
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()) -> None:
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._values: dict[tuple[str, ...], float] = {}
+
+    def inc(self, *labels: str, amount: float = 1) -> None:
+        self._values[labels] = self._values.get(labels, 0) + amount
+
+    def value(self, *labels: str) -> float:
+        return self._values.get(labels, 0)
+
+    def collect(self) -> Iterator[str]:
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} counter"
+        for labels, value in self._values.items():
+            yield f"{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}"
+
+
+class Histogram:
+    def __init__(self, name: str, help: str, buckets: Sequence[float] = LATENCY_BUCKETS, labelnames: Sequence[str] = ()) -> None:
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._buckets = tuple(sorted(buckets))
+        # per label set: one count per bucket plus the +Inf overflow, and the sum
+        self._counts: dict[tuple[str, ...], list[int]] = {}
+        self._sums: dict[tuple[str, ...], float] = {}
+
+    def observe(self, value: float, *labels: str) -> None:
+        counts = self._counts.get(labels)
+        if counts is None:
+            counts = self._counts[labels] = [0] * (len(self._buckets) + 1)
+            self._sums[labels] = 0.0
+        counts[bisect_left(self._buckets, value)] += 1
+        self._sums[labels] += value
+
+    def count(self, *labels: str) -> int:
+        return sum(self._counts.get(labels, ()))
+
+    def collect(self) -> Iterator[str]:
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} histogram"
+        for labels, counts in self._counts.items():
+            cumulative = 0
+            for bound, count in zip(self._buckets, counts):
+                cumulative += count
+                le = f'le="{_format_value(bound)}"'
+                yield f"{self.name}_bucket{_format_labels(self.labelnames, labels, le)} {cumulative}"
+            cumulative += counts[-1]
+            yield f"{self.name}_bucket{_format_labels(self.labelnames, labels, _INF)} {cumulative}"
+            yield f"{self.name}_sum{_format_labels(self.labelnames, labels)} {_format_value(self._sums[labels])}"
+            yield f"{self.name}_count{_format_labels(self.labelnames, labels)} {cumulative}"
+
+
+class CallbackMetric:
+    """Gauge or counter whose values are read from `fn` at scrape time, as a mapping of label values to values"""
+
+    def __init__(
+        self,
+        name: str,
+        help: str,
+        fn: Callable[[], Mapping[tuple[str, ...], float]],
+        labelnames: Sequence[str] = (),
+        kind: str = "gauge",
+    ) -> None:
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._fn = fn
+        self._kind = kind
+
+    def collect(self) -> Iterator[str]:
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} {self._kind}"
+        for labels, value in self._fn().items():
+            yield f"{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}"
+
+
+class MetricsRegistry:
+    def __init__(self) -> None:
+        self._metrics: list[Counter | Histogram | CallbackMetric] = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        return "\n".join(line for metric in self._metrics for line in metric.collect()) + "\n"
+
+
+def resident_memory_bytes() -> int:
+    """Current resident set size from /proc/self/statm, the peak RSS where /proc is not available"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except OSError:
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # kilobytes on Linux, bytes on macOS
+        return peak if os.uname().sysname == "Darwin" else peak * 1024
+
+
+class BotMetrics:
+    """
+    Metrics of one service blueprint:
+    - requests by endpoint and status, with their latency
+    - latency of the request stages decode, parse, predict and serialize
+    - request and response payload sizes
+    - predictions in flight and queued, cancellations, coalesced requests, result cache usage and process memory, read at scrape time
+    """
+
+    def __init__(
+        self,
+        admission: AdmissionController | None = None,
+        cancellations: CancellationStats | None = None,
+        result_cache: ResultCache | None = None,
+        coalescer: SingleFlight | None = None,
+    ) -> None:
+        self.registry = MetricsRegistry()
+        register = self.registry.register
+        self.requests = register(Counter("taranis_bot_requests_total", "Requests by endpoint and status code", ("endpoint", "status")))
+        self.request_seconds = register(Histogram("taranis_bot_request_seconds", "Request latency by endpoint", labelnames=("endpoint",)))
+        self.stage_seconds = register(Histogram("taranis_bot_stage_seconds", "Latency of the request stages", labelnames=("stage",)))
+        self.payload_bytes = register(
+            Histogram("taranis_bot_payload_bytes", "Request and response body sizes", buckets=SIZE_BUCKETS, labelnames=("direction",))
+        )
+
+        if admission is not None:
+            register(CallbackMetric("taranis_bot_inflight", "Predictions running", lambda: {(): admission.inflight}))
+            register(CallbackMetric("taranis_bot_queued", "Predictions waiting for a slot", lambda: {(): admission.queued}))
+            register(
+                CallbackMetric(
+                    "taranis_bot_rejected_total", "Requests rejected as overloaded", lambda: {(): admission.rejected}, kind="counter"
+                )
+            )
+        if cancellations is not None:
+            register(
+                CallbackMetric(
+                    "taranis_bot_cancelled_total",
+                    "Predictions cancelled or skipped by reason",
+                    lambda: {(reason,): value for reason, value in cancellations.stats().items()},
+                    labelnames=("reason",),
+                    kind="counter",
+                )
+            )
+        if coalescer is not None:
+            register(
+                CallbackMetric(
+                    "taranis_bot_coalescing_total",
+                    "Predictions started, requests that joined an identical one in flight, and those that gave up waiting",
+                    lambda: {(key,): value for key, value in coalescer.stats().items()},
+                    labelnames=("stat",),
+                    kind="counter",
+                )
+            )
+        if result_cache is not None:
+            register(
+                CallbackMetric(
+                    "taranis_bot_cache",
+                    "Result cache hits, misses, entries and bytes",
+                    lambda: {(key,): value for key, value in result_cache.stats().items()},
+                    labelnames=("stat",),
+                )
+            )
+        register(CallbackMetric("process_resident_memory_bytes", "Resident memory size in bytes", lambda: {(): resident_memory_bytes()}))
+        self._started = time.time()
+        register(CallbackMetric("process_start_time_seconds", "Start time of the process since the epoch", lambda: {(): self._started}))
+
+    def observe_stage(self, stage: str, started: float) -> float:
+        """Records the time since `started` (a `time.perf_counter()` value) for `stage` and returns the current time"""
+        now = time.perf_counter()
+        self.stage_seconds.observe(now - started, stage)
+        return now
+
+    def render(self) -> str:
+        return self.registry.render()
@@ -1,38 +1,105 @@
+import asyncio
+import builtins
+import json
+import os
+import time
 from importlib import import_module
-from pydoc import locate
-from typing import Any, Callable
-import httpx
+from typing import TYPE_CHECKING, Any, Callable
 
 from taranis_base_bot.log import logger
 from taranis_base_bot.protocols import Predictor
 
+if TYPE_CHECKING:
+    import httpx
 
-def create_request_parser(payload_schema: dict[str, dict]) -> Callable[[dict], dict]:
-    def request_parser(data: dict) -> dict[str, Any]:
-        unexpected_keys = set(data) - set(payload_schema)
+
+def _locate(name: str) -> Any:
+    """Resolves a dotted name like `pydoc.locate`, without importing pydoc: modules and their attributes first, then builtins"""
+    parts = name.split(".")
+    for i in range(len(parts), 0, -1):
+        try:
+            obj: Any = import_module(".".join(parts[:i]))
+        except ImportError:
+            continue
+        for part in parts[i:]:
+            obj = getattr(obj, part, None)
+            if obj is None:
+                return None
+        return obj
+    obj = builtins
+    for part in parts:
+        obj = getattr(obj, part, None)
+        if obj is None:
+            return None
+    return obj
+
+
+def _compile_value(path: str, schema: dict) -> Callable[[Any], Any]:
+    data_type = schema.get("type")
+    expected_type = _locate(data_type) if data_type else None
+    if data_type and not isinstance(expected_type, type):
+        raise ValueError(f"Unknown type '{data_type}' for '{path}' in payload schema")
+
+    min_length = schema.get("min_length")
+    max_length = schema.get("max_length")
+    check_items = _compile_value(f"{path}[]", schema["items"]) if "items" in schema else None
+    parse_properties = _compile_object(schema["properties"], prefix=f"{path}.") if "properties" in schema else None
+
+    def check(val: Any) -> Any:
+        if expected_type is not None and not isinstance(val, expected_type):
+            raise ValueError(f"Data for '{path}' is not of type '{data_type}'")
+        if max_length is not None and len(val) > max_length:
+            raise ValueError(f"Data for '{path}' is longer than {max_length}")
+        if min_length is not None and len(val) < min_length:
+            raise ValueError(f"Data for '{path}' is shorter than {min_length}")
+        if check_items is not None:
+            val = [check_items(item) for item in val]
+        if parse_properties is not None:
+            val = parse_properties(val)
+        return val
+
+    return check
+
+
+def _compile_object(payload_schema: dict[str, dict], prefix: str = "") -> Callable[[dict], dict[str, Any]]:
+    known_keys = frozenset(payload_schema)
+    fields = [
+        (key, f"{prefix}{key}", key_schema.get("required", True), _compile_value(f"{prefix}{key}", key_schema))
+        for key, key_schema in payload_schema.items()
+    ]
+
+    def parse(data: dict) -> dict[str, Any]:
+        unexpected_keys = data.keys() - known_keys
         if unexpected_keys:
             logger.warning(f"The payload contains unexpected keys: {unexpected_keys}")
 
         accepted_data = {}
-        for key, key_schema in payload_schema.items():
-            if not key_schema.get("required", True) and key not in data:
-                continue
-
+        for key, path, required, check in fields:
             if key not in data:
-                raise ValueError(f"Payload does not contain '{key}' key!")
+                if not required:
+                    continue
+                raise ValueError(f"Payload does not contain '{path}' key!")
 
-            val = data.get(key)
+            val = data[key]
             if val is None or (isinstance(val, (tuple, list, str)) and not val):
-                raise ValueError(f"No data provided for '{key}' key!")
+                raise ValueError(f"No data provided for '{path}' key!")
+            accepted_data[key] = check(val)
+        return accepted_data
 
-            data_type = key_schema.get("type")
+    return parse
 
-            if data_type and not isinstance(val, locate(data_type)):  # type: ignore
-                raise ValueError(f"Data for '{key}' is not of type '{data_type}'")
-            accepted_data[key] = data[key]
-        return accepted_data
 
-    return request_parser
+def create_request_parser(payload_schema: dict[str, dict]) -> Callable[[dict], dict]:
+    """
+    Compiles `payload_schema` into a parser, so type lookups happen once at startup instead of per request.
+    Every key maps to a schema with
+    - `type`: name of the expected Python type, e.g. "str", "int", "list", "dict"
+    - `required`: defaults to True
+    - `min_length` / `max_length`: bounds for len() of str, list or dict values
+    - `items`: schema every list item must match
+    - `properties`: payload schema for a nested dict
+    """
+    return _compile_object(payload_schema)
 
 
 def get_model(config) -> Predictor:
@@ -53,16 +120,110 @@ def get_model(config) -> Predictor:
     return model_class()
 
 
-async def get_hf_modelinfo(model_name: str) -> dict:
+async def get_hf_modelinfo(model_name: str, client: "httpx.AsyncClient | None" = None) -> dict:
     """
     Fetch model metadata from Hugging Face.
     If anything fails, return a simple fallback.
     """
+    import httpx
+
     url = f"https://huggingface.co/api/models/{model_name}"
     try:
-        async with httpx.AsyncClient(timeout=10) as client:
+        if client is None:
+            async with httpx.AsyncClient(timeout=10) as client:
+                response = await client.get(url)
+        else:
             response = await client.get(url)
-            response.raise_for_status()
-            return response.json()
+        response.raise_for_status()
+        return response.json()
     except Exception as e:
         return {"model": model_name, "error": str(e)}
+
+
+class HFModelInfoCache:
+    """
+    Serves Hugging Face model metadata without a hub round trip per request:
+    - all lookups share one pooled httpx client
+    - the first value is fetched once for all callers waiting for it
+    - a fetched value is fresh for `ttl` seconds, after that the stale value is returned and refreshed in the background
+    - failed lookups are retried after `error_ttl` seconds, a previous good value is kept meanwhile
+    - `snapshot_path` is read at startup and rewritten after every successful fetch, a snapshot of another model is ignored
+    - with `offline` the hub is never contacted and only the snapshot is served
+    """
+
+    def __init__(self, model_name: str, ttl: float = 3600, error_ttl: float = 60, snapshot_path: str = "", offline: bool = False) -> None:
+        self.model_name = model_name
+        self._ttl = ttl
+        self._error_ttl = error_ttl
+        self._snapshot_path = snapshot_path
+        self._offline = offline
+        self._value: dict | None = None
+        self._expires_at = 0.0
+        self._client: "httpx.AsyncClient | None" = None
+        self._refresh_task: asyncio.Task | None = None
+        self._load_snapshot()
+
+    async def __call__(self) -> dict:
+        if self._offline:
+            return self._value or {"model": self.model_name, "error": "No model info snapshot available in offline mode"}
+
+        refreshing = self._refresh_task is not None and not self._refresh_task.done()
+        if self._value is None:
+            # concurrent first lookups wait for the same fetch
+            if not refreshing:
+                self._refresh_task = asyncio.ensure_future(self._refresh())
+            await asyncio.shield(self._refresh_task)  # type: ignore[arg-type]
+        elif time.monotonic() >= self._expires_at and not refreshing:
+            self._refresh_task = asyncio.ensure_future(self._refresh())
+        return self._value  # type: ignore[return-value]
+
+    async def close(self) -> None:
+        if self._refresh_task is not None:
+            self._refresh_task.cancel()
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    async def _refresh(self) -> None:
+        if self._client is None:
+            import httpx
+
+            self._client = httpx.AsyncClient(timeout=10)
+
+        info = await get_hf_modelinfo(self.model_name, self._client)
+        if "error" in info:
+            logger.warning(f"Fetching model info for {self.model_name} failed: {info['error']}")
+            self._expires_at = time.monotonic() + self._error_ttl
+            if self._value is None or "error" in self._value:
+                self._value = info
+            return
+
+        self._value = info
+        self._expires_at = time.monotonic() + self._ttl
+        if self._snapshot_path:
+            await asyncio.to_thread(self._write_snapshot, info)
+
+    def _load_snapshot(self) -> None:
+        if not self._snapshot_path or not os.path.exists(self._snapshot_path):
+            return
+        try:
+            with open(self._snapshot_path, encoding="utf-8") as f:
+                value = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning(f"Could not read model info snapshot {self._snapshot_path}: {e}")
+            return
+        # the hub answers with `id`, the fallback of get_hf_modelinfo has `model`
+        snapshot_id = next((value[key] for key in ("id", "modelId", "model") if key in value), None) if isinstance(value, dict) else None
+        if snapshot_id != self.model_name:
+            logger.warning(f"Ignoring model info snapshot {self._snapshot_path}, it is for {snapshot_id!r} and not {self.model_name!r}")
+            return
+        self._value = value
+
+    def _write_snapshot(self, info: dict) -> None:
+        tmp_path = f"{self._snapshot_path}.tmp"
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(info, f)
+            os.replace(tmp_path, self._snapshot_path)
+        except OSError as e:
+            logger.warning(f"Could not write model info snapshot {self._snapshot_path}: {e}")
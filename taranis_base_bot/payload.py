@@ -0,0 +1,199 @@
+import asyncio
+import re
+from collections.abc import AsyncIterator
+from typing import Any, Callable
+
+from quart import g, request
+from werkzeug.exceptions import RequestEntityTooLarge, RequestTimeout
+
+from taranis_base_bot.codec import CBOR, JSON, MSGPACK, PayloadTooLarge, body_decoder, canonical_media_type, decompressor
+
+
+async def request_chunks(max_size: int = 0) -> AsyncIterator[bytes]:
+    """
+    The request body as it arrives, decoded according to its Content-Encoding.
+    Raises PayloadTooLarge as soon as the Content-Length header, the bytes received or the decoded bytes exceed `max_size`
+    (0 means no limit), so the rest of an oversized body is never read. The bytes received are counted in `g.request_bytes`.
+    """
+    if max_size and (request.content_length or 0) > max_size:
+        raise PayloadTooLarge(max_size)
+    decoder = decompressor(request.headers.get("Content-Encoding", ""), max_size)
+    g.request_bytes = 0
+    # the same timeout as for request.get_data(), for the whole body
+    deadline = None if request.body_timeout is None else asyncio.get_running_loop().time() + request.body_timeout
+    body = aiter(request.body)
+    while True:
+        try:
+            async with asyncio.timeout_at(deadline):
+                chunk = await anext(body)
+        except StopAsyncIteration:
+            break
+        except TimeoutError:
+            raise RequestTimeout() from None
+        except RequestEntityTooLarge:
+            # the app's MAX_CONTENT_LENGTH
+            raise PayloadTooLarge(request.max_content_length or max_size) from None
+        g.request_bytes += len(chunk)
+        if max_size and g.request_bytes > max_size:
+            raise PayloadTooLarge(max_size)
+        yield chunk if decoder is None else decoder.decompress(chunk)
+    if decoder is not None:
+        for chunk in decoder.finish():
+            yield chunk
+
+
+def _is_binary(media_type: str) -> bool:
+    return media_type in (MSGPACK, CBOR)
+
+
+async def read_payload(max_size: int = 0) -> Any:
+    """
+    Request body decoded according to its Content-Encoding (gzip, deflate, zstd) and Content-Type (JSON, MessagePack, CBOR),
+    read within `max_size` bytes as described for `request_chunks`.
+    Like `request.get_json()`, returns None for bodies that are not in one of these formats.
+    Raises UnsupportedEncoding for formats whose package is not installed, PayloadTooLarge for bodies over the limit
+    and ValueError for bodies that cannot be decoded.
+    """
+    media_type = canonical_media_type(request.mimetype)
+    if not _is_binary(media_type) and not request.is_json:
+        return None
+    decode = body_decoder(media_type)
+    # the decoders take a bytearray as well, so the body is not copied once more
+    body = bytearray()
+    async for chunk in request_chunks(max_size):
+        body += chunk
+    return decode(body)
+
+
+async def read_items(max_size: int = 0, max_items: int = 0) -> list[Any] | None:
+    """
+    List payload of a bulk request, read within `max_size` bytes like `read_payload`.
+    A JSON array is decoded item by item while it arrives, so only the current item is held as bytes,
+    and reading stops once it has more than `max_items` items (0 means no limit). Other formats are decoded as a whole.
+    Returns None for payloads that are not a list.
+    """
+    media_type = canonical_media_type(request.mimetype)
+    if _is_binary(media_type) or not request.is_json:
+        data = await read_payload(max_size)
+        return data if isinstance(data, list) else None
+
+    parser = JSONArrayParser(body_decoder(JSON))
+    items: list[Any] = []
+    try:
+        async for chunk in request_chunks(max_size):
+            items += parser.feed(chunk)
+            if max_items and len(items) > max_items:
+                return items
+        parser.close()
+    except NotAJSONArray:
+        return None
+    return items
+
+
+class NotAJSONArray(ValueError):
+    pass
+
+
+# the characters changing the nesting depth or separating items, outside of strings
+_STRUCTURE = re.compile(rb'["\[\]{},]')
+_STRING_END = re.compile(rb'["\\]')
+
+
+class JSONArrayParser:
+    """
+    Splits a JSON array arriving in chunks into its items and decodes each one with `loads` once it is complete.
+    `feed` returns the items a chunk completes, `close` checks that the array has ended.
+    Raises NotAJSONArray if the document does not start with `[` and ValueError for invalid arrays or items.
+    """
+
+    def __init__(self, loads: Callable[[bytes], Any]) -> None:
+        self._loads = loads
+        # the bytes of the current item, scanned up to `_pos`
+        self._buffer = bytearray()
+        self._pos = 0
+        self._depth = 0
+        self._in_string = False
+        self._started = False
+        self._done = False
+        self._count = 0
+
+    def feed(self, chunk: bytes) -> list[Any]:
+        if self._done:
+            if chunk.strip():
+                raise ValueError("Unexpected data after the JSON array")
+            return []
+        buffer = self._buffer
+        buffer += chunk
+        if not self._started:
+            start = len(buffer) - len(buffer.lstrip())
+            if start == len(buffer):
+                buffer.clear()
+                return []
+            if buffer[start] != ord("["):
+                raise NotAJSONArray("Payload is not a JSON array")
+            del buffer[: start + 1]
+            self._started = True
+
+        items: list[Any] = []
+        pos = self._pos
+        while True:
+            if self._in_string:
+                match = _STRING_END.search(buffer, pos)
+                if match is None:
+                    pos = len(buffer)
+                    break
+                if buffer[match.start()] == ord("\\"):
+                    if match.end() == len(buffer):
+                        # the escaped character is in the next chunk, scan the backslash again then
+                        pos = match.start()
+                        break
+                    pos = match.end() + 1
+                    continue
+                self._in_string = False
+                pos = match.end()
+                continue
+
+            match = _STRUCTURE.search(buffer, pos)
+            if match is None:
+                pos = len(buffer)
+                break
+            char = buffer[match.start()]
+            pos = match.end()
+            if char == ord('"'):
+                self._in_string = True
+            elif char in b"[{":
+                self._depth += 1
+            elif self._depth:
+                if char in b"]}":
+                    self._depth -= 1
+            elif char == ord(","):
+                items.append(self._item(buffer[: match.start()]))
+                del buffer[:pos]
+                pos = 0
+            elif char == ord("]"):
+                item = buffer[: match.start()]
+                # `[]` has no items, otherwise the last one comes before the bracket
+                if self._count or item.strip():
+                    items.append(self._item(item))
+                if buffer[pos:].strip():
+                    raise ValueError("Unexpected data after the JSON array")
+                buffer.clear()
+                pos = 0
+                self._done = True
+                break
+            else:
+                raise ValueError("Invalid JSON array")
+        self._pos = pos
+        return items
+
+    def _item(self, raw: bytearray) -> Any:
+        if not raw.strip():
+            raise ValueError(f"Missing item {self._count} in the JSON array")
+        self._count += 1
+        return self._loads(bytes(raw))
+
+    def close(self) -> None:
+        if not self._started:
+            raise NotAJSONArray("Payload is empty")
+        if not self._done:
+            raise ValueError("Incomplete JSON array")
@@ -0,0 +1,151 @@
+"""
+Pre-forking entrypoint that loads the bot once in the master process.
+
+    python -m taranis_base_bot.preload my_bot.app:app --workers 2 --bind 0.0.0.0:8000
+
+The app target is imported in the master, so `create_app` (and with it `get_model`) runs only once.
+The heap is then frozen with `gc.freeze()` and the workers are forked from the master. The workers share
+the model pages copy-on-write instead of each loading their own copy.
+"""
+
+import argparse
+import asyncio
+import gc
+import os
+import signal
+import socket
+import sys
+from importlib import import_module
+
+from quart import Quart
+
+from taranis_base_bot.log import logger
+
+_SMAPS_ROLLUP = "/proc/self/smaps_rollup"
+
+
+def memory_report() -> dict[str, int]:
+    """
+    Resident memory of the current process in kB, split into shared and private pages.
+    Returns an empty dict where /proc/self/smaps_rollup is not available.
+    """
+    try:
+        with open(_SMAPS_ROLLUP) as f:
+            lines = f.readlines()
+    except OSError:
+        return {}
+
+    fields = {}
+    for line in lines:
+        key, _, value = line.partition(":")
+        parts = value.split()
+        if len(parts) == 2 and parts[1] == "kB":
+            fields[key] = int(parts[0])
+
+    return {
+        "rss_kb": fields.get("Rss", 0),
+        "pss_kb": fields.get("Pss", 0),
+        "shared_kb": fields.get("Shared_Clean", 0) + fields.get("Shared_Dirty", 0),
+        "private_kb": fields.get("Private_Clean", 0) + fields.get("Private_Dirty", 0),
+    }
+
+
+def load_app(target: str) -> Quart:
+    """Imports `module:attribute` and freezes everything allocated so far, so forked workers share it"""
+    module_name, _, attribute = target.partition(":")
+    app = getattr(import_module(module_name), attribute or "app")
+    if not isinstance(app, Quart):
+        raise TypeError(f"{target} is not a Quart app")
+
+    gc.collect()
+    gc.freeze()
+    report = memory_report()
+    if report:
+        logger.info(f"Preloaded {target} in master process {os.getpid()}, RSS is {report['rss_kb'] // 1024} MiB")
+    return app
+
+
+def log_worker_memory() -> None:
+    report = memory_report()
+    if report:
+        logger.info(
+            f"Worker {os.getpid()}: {report['shared_kb'] // 1024} MiB of {report['rss_kb'] // 1024} MiB RSS shared with the master, "
+            f"{report['private_kb'] // 1024} MiB private"
+        )
+
+
+def _bind(address: str) -> socket.socket:
+    host, _, port = address.rpartition(":")
+    host = host.strip("[]") or "0.0.0.0"
+    sock = socket.socket(socket.AF_INET6 if ":" in host else socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, int(port)))
+    sock.listen(2048)
+    sock.set_inheritable(True)
+    return sock
+
+
+def _run_worker(app: Quart, sock: socket.socket) -> None:
+    from hypercorn.asyncio import serve
+    from hypercorn.config import Config
+
+    config = Config()
+    config.bind = [f"fd://{sock.fileno()}"]
+    config.accesslog = None
+
+    @app.before_serving
+    async def report_memory():
+        log_worker_memory()
+
+    asyncio.run(serve(app, config))  # type: ignore[arg-type]
+
+
+def serve_preforked(target: str, workers: int = 2, bind: str = "0.0.0.0:8000") -> int:
+    app = load_app(target)
+    sock = _bind(bind)
+    logger.info(f"Forking {workers} workers listening on {bind}")
+
+    children: set[int] = set()
+    for _ in range(max(workers, 1)):
+        pid = os.fork()
+        if pid == 0:
+            code = 0
+            try:
+                _run_worker(app, sock)
+            except BaseException as e:
+                logger.error(f"Worker {os.getpid()} failed with error: {e}")
+                code = 1
+            finally:
+                os._exit(code)
+        children.add(pid)
+
+    def forward(signum, _frame):
+        for child in children:
+            try:
+                os.kill(child, signum)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGTERM, forward)
+    signal.signal(signal.SIGINT, forward)
+
+    exit_code = 0
+    while children:
+        pid, status = os.wait()
+        children.discard(pid)
+        if os.waitstatus_to_exitcode(status) != 0:
+            exit_code = 1
+    return exit_code
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m taranis_base_bot.preload", description=__doc__.splitlines()[1])
+    parser.add_argument("target", help="app to serve, as module:attribute")
+    parser.add_argument("--workers", type=int, default=int(os.getenv("GRANIAN_WORKERS", "2")))
+    parser.add_argument("--bind", default=f"{os.getenv('GRANIAN_HOST', '0.0.0.0')}:{os.getenv('GRANIAN_PORT', '8000')}")
+    args = parser.parse_args(argv)
+    return serve_preforked(args.target, workers=args.workers, bind=args.bind)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,143 @@
+"""
+On-demand profiling of a running bot, for containers where no profiler can be attached from the outside.
+
+- `sample_stacks` samples the stacks of all threads (event loop and executor threads) from a background thread
+  and returns them as collapsed stacks, the input format of flamegraph.pl and speedscope
+- `profile_event_loop` runs cProfile on the event loop thread and returns the pstats report
+- `allocation_diff` compares two tracemalloc snapshots taken before and after the profiling period
+- `RequestProfiler` profiles a sampled fraction of requests with cProfile and keeps the latest reports
+"""
+
+import asyncio
+import cProfile
+import io
+import pstats
+import random
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter, deque
+from functools import wraps
+from typing import Any, Awaitable, Callable
+
+from quart import request
+
+from taranis_base_bot.log import logger
+
+# cProfile cannot run twice at the same time in one process
+_cprofile_lock = threading.Lock()
+
+
+def _collapse(frame) -> str:
+    names = []
+    while frame is not None:
+        code = frame.f_code
+        names.append(f"{code.co_name} ({code.co_filename}:{frame.f_lineno})")
+        frame = frame.f_back
+    return ";".join(reversed(names))
+
+
+def _sample(seconds: float, interval: float, skip_thread: int) -> Counter:
+    stacks: Counter = Counter()
+    deadline = time.monotonic() + seconds
+    while time.monotonic() < deadline:
+        for thread_id, frame in sys._current_frames().items():
+            if thread_id != skip_thread:
+                stacks[_collapse(frame)] += 1
+        time.sleep(interval)
+    return stacks
+
+
+async def sample_stacks(seconds: float, interval: float = 0.005) -> str:
+    """
+    Collapsed stacks of all threads, sampled every `interval` seconds for `seconds`, one `stack count` line each.
+    The sampler needs the GIL, so samples of code that releases it often are biased towards those release points.
+    """
+    loop = asyncio.get_running_loop()
+    done: asyncio.Future = loop.create_future()
+
+    def run() -> None:
+        stacks = _sample(seconds, interval, threading.get_ident())
+        loop.call_soon_threadsafe(done.set_result, stacks)
+
+    threading.Thread(target=run, name="stack-sampler", daemon=True).start()
+    stacks = await done
+    return "\n".join(f"{stack} {count}" for stack, count in stacks.most_common())
+
+
+def _pstats_report(profiler: cProfile.Profile, top: int) -> str:
+    out = io.StringIO()
+    pstats.Stats(profiler, stream=out).sort_stats(pstats.SortKey.CUMULATIVE).print_stats(top)
+    return out.getvalue()
+
+
+async def profile_event_loop(seconds: float, top: int = 30) -> str:
+    """cProfile report of everything the event loop thread runs during `seconds`, sorted by cumulative time"""
+    if not _cprofile_lock.acquire(blocking=False):
+        raise RuntimeError("Another profile is already running")
+    try:
+        profiler = cProfile.Profile()
+        profiler.enable()
+        try:
+            await asyncio.sleep(seconds)
+        finally:
+            profiler.disable()
+    finally:
+        _cprofile_lock.release()
+    return _pstats_report(profiler, top)
+
+
+async def allocation_diff(seconds: float, top: int = 20) -> list[str]:
+    """The `top` source lines by memory allocated (or freed) during `seconds`, according to tracemalloc"""
+    started = not tracemalloc.is_tracing()
+    if started:
+        tracemalloc.start()
+    try:
+        before = tracemalloc.take_snapshot()
+        await asyncio.sleep(seconds)
+        after = tracemalloc.take_snapshot()
+    finally:
+        if started:
+            tracemalloc.stop()
+
+    filters = [tracemalloc.Filter(False, tracemalloc.__file__)]
+    stats = after.filter_traces(filters).compare_to(before.filter_traces(filters), "lineno")
+    return [str(stat) for stat in stats[:top]]
+
+
+class RequestProfiler:
+    """
+    Runs cProfile around `sample_rate` (0..1) of the calls to a view and keeps the latest `keep` reports.
+    As requests interleave on the event loop, a report also contains work of concurrent requests.
+    Only one request is profiled at a time.
+    """
+
+    def __init__(self, sample_rate: float, keep: int = 20, top: int = 30) -> None:
+        self.sample_rate = sample_rate
+        self._top = top
+        self.reports: deque[dict[str, Any]] = deque(maxlen=keep)
+
+    def __call__(self, view: Callable[..., Awaitable[Any]]) -> Callable[..., Awaitable[Any]]:
+        @wraps(view)
+        async def wrapper(*args: Any, **kwargs: Any) -> Any:
+            if self.sample_rate <= 0 or random.random() >= self.sample_rate or not _cprofile_lock.acquire(blocking=False):
+                return await view(*args, **kwargs)
+
+            profiler = cProfile.Profile()
+            started = time.perf_counter()
+            try:
+                profiler.enable()
+                try:
+                    return await view(*args, **kwargs)
+                finally:
+                    profiler.disable()
+            finally:
+                _cprofile_lock.release()
+                duration = time.perf_counter() - started
+                self.reports.append(
+                    {"path": request.path, "time": time.time(), "duration": duration, "profile": _pstats_report(profiler, self._top)}
+                )
+                logger.debug("Profiled request to %s in %.3fs", request.path, duration)
+
+        return wrapper
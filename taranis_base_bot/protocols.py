@@ -8,8 +8,18 @@ JSONList = Sequence[JSONObj]
 class Predictor(Protocol):
     """Interface for Predictor objects used in bots
     Need to implement predict method
+    predict may also be an async generator yielding partial results, which are streamed to the client
     """
 
     model_name: str
 
     async def predict(self, **kwargs: Any) -> JSONObj | JSONList: ...
+
+
+@runtime_checkable
+class BatchPredictor(Predictor, Protocol):
+    """Optional extension of Predictor for models that can run several inputs at once
+    `predict_batch` receives a list of kwargs dicts and returns one result per entry, in order
+    """
+
+    async def predict_batch(self, inputs: Sequence[Mapping[str, Any]]) -> Sequence[JSONObj | JSONList]: ...
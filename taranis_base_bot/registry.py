@@ -0,0 +1,182 @@
+import asyncio
+import time
+from collections import OrderedDict
+from collections.abc import AsyncIterator
+from typing import Any, Callable, Sequence
+
+from taranis_base_bot.lifecycle import ModelSlot
+from taranis_base_bot.log import logger
+from taranis_base_bot.metrics import resident_memory_bytes
+from taranis_base_bot.protocols import Predictor
+
+
+class UnknownModel(LookupError):
+    pass
+
+
+class _Resident:
+    def __init__(self, slot: ModelSlot, memory_bytes: int) -> None:
+        self.slot = slot
+        self.memory_bytes = memory_bytes
+        self.inflight = 0
+        self.last_used = time.time()
+
+
+def with_model_selector(request_parser: Callable[[Any], dict[str, Any]], selector: str) -> Callable[[Any], dict[str, Any]]:
+    """Wraps `request_parser` so that the `selector` field of the payload is passed on next to the parsed kwargs"""
+
+    def parse(data: Any) -> dict[str, Any]:
+        kwargs = request_parser({key: value for key, value in data.items() if key != selector})
+        if selector in data:
+            kwargs[selector] = data[selector]
+        return kwargs
+
+    return parse
+
+
+class ModelRegistry:
+    """
+    Serves several models of one bot from one process, each in its own ModelSlot.
+    `predict` takes the model name from its `selector` kwarg, `default` without one.
+    A model is loaded with `load(name)` in a thread on first use, set up with `install(slot, name, model)` and warmed up.
+    The least recently used models are unloaded while more than `max_resident` models are loaded (0 means no limit)
+    or their memory exceeds `memory_budget` bytes (0 means no limit). The memory of a model is its `memory_bytes` attribute
+    or the growth of the resident set size while loading it. Models serving requests are not unloaded.
+    """
+
+    def __init__(
+        self,
+        names: Sequence[str],
+        default: str,
+        load: Callable[[str], Predictor],
+        install: Callable[[ModelSlot, str, Predictor], None],
+        selector: str = "model",
+        max_resident: int = 0,
+        memory_budget: int = 0,
+        warmup_payloads: Sequence[dict[str, Any]] = (),
+        request_parser: Callable[[Any], dict[str, Any]] | None = None,
+    ) -> None:
+        self.names = list(dict.fromkeys([default, *names]))
+        self.default = default
+        self.selector = selector
+        self._load = load
+        self._install = install
+        self._max_resident = max_resident
+        self._memory_budget = memory_budget
+        self._warmup_payloads = warmup_payloads
+        self._parse = request_parser
+        # least recently used first
+        self._resident: OrderedDict[str, _Resident] = OrderedDict()
+        self._loading: dict[str, asyncio.Future] = {}
+        # loads run one at a time, so the growth of the resident set size belongs to one model
+        self._load_lock = asyncio.Lock()
+        self._memory_bytes: dict[str, int] = {}
+
+    @property
+    def resident(self) -> list[str]:
+        return list(self._resident)
+
+    async def predict(self, **kwargs: Any) -> Any:
+        name = kwargs.pop(self.selector, None) or self.default
+        entry = await self._acquire(name)
+        try:
+            result = await entry.slot.predict(**kwargs)
+        except BaseException:
+            self._release(entry)
+            raise
+        if isinstance(result, AsyncIterator):
+            return self._release_after(result, entry)
+        self._release(entry)
+        return result
+
+    async def _release_after(self, parts: AsyncIterator[Any], entry: _Resident) -> AsyncIterator[Any]:
+        try:
+            async for part in parts:
+                yield part
+        finally:
+            self._release(entry)
+
+    async def modelinfo(self) -> dict[str, Any]:
+        models: dict[str, Any] = {}
+        for name in self.names:
+            entry = self._resident.get(name)
+            if entry is None:
+                models[name] = {"resident": False}
+                continue
+            models[name] = {
+                "resident": True,
+                "memory_bytes": entry.memory_bytes,
+                "inflight": entry.inflight,
+                "last_used": entry.last_used,
+                "info": await entry.slot.modelinfo(),
+            }
+        return {"default": self.default, "resident": self.resident, "models": models}
+
+    async def _acquire(self, name: str) -> _Resident:
+        if name not in self.names:
+            raise UnknownModel(f"Unknown model {name!r}, available models: {', '.join(self.names)}")
+        # checked again after each load, another load may have unloaded the model before this request got its turn
+        while (entry := self._resident.get(name)) is None:
+            future = self._loading.get(name)
+            if future is None:
+                future = self._loading[name] = asyncio.ensure_future(self._load_model(name))
+                future.add_done_callback(lambda _: self._loading.pop(name, None))
+            # a request going away must not cancel a load other requests wait for
+            await asyncio.shield(future)
+        self._resident.move_to_end(name)
+        entry.inflight += 1
+        entry.last_used = time.time()
+        return entry
+
+    def _release(self, entry: _Resident) -> None:
+        entry.inflight -= 1
+
+    async def _load_model(self, name: str) -> _Resident:
+        async with self._load_lock:
+            # the size of a model is known once it has been loaded before
+            await self._evict(incoming=self._memory_bytes.get(name, 0))
+            logger.info(f"Loading model {name}")
+            slot = ModelSlot(warmup_payloads=self._warmup_payloads, request_parser=self._parse)
+            before = resident_memory_bytes()
+            try:
+                started = time.perf_counter()
+                model = await asyncio.to_thread(self._load, name)
+                slot.phases["load"] = time.perf_counter() - started
+                self._install(slot, name, model)
+                await slot.warm_up()
+            except BaseException:
+                await slot.close()
+                raise
+            memory_bytes = getattr(model, "memory_bytes", None) or max(resident_memory_bytes() - before, 0)
+            self._memory_bytes[name] = memory_bytes
+            entry = self._resident[name] = _Resident(slot, memory_bytes)
+            await self._evict()
+            return entry
+
+    def _over_limits(self, incoming: int | None) -> bool:
+        count = len(self._resident) + (0 if incoming is None else 1)
+        if self._max_resident and count > self._max_resident:
+            return True
+        memory_bytes = sum(entry.memory_bytes for entry in self._resident.values()) + (incoming or 0)
+        return bool(self._memory_budget) and memory_bytes > self._memory_budget
+
+    async def _evict(self, incoming: int | None = None) -> None:
+        """Unloads idle models, least recently used first, until the resident ones and an `incoming` one of that size fit the limits"""
+        while self._over_limits(incoming):
+            idle = [name for name, entry in self._resident.items() if entry.inflight == 0]
+            # after a load, the model just loaded is the most recently used one and stays
+            if not idle or (incoming is None and idle == [next(reversed(self._resident))]):
+                logger.warning(f"Models {', '.join(self._resident)} are over the residency limits but still in use")
+                return
+            name = idle[0]
+            entry = self._resident.pop(name)
+            logger.info(f"Unloading model {name}, the least recently used one, freeing about {entry.memory_bytes} bytes")
+            await entry.slot.close()
+
+    async def close(self) -> None:
+        for future in list(self._loading.values()):
+            future.cancel()
+        await asyncio.gather(*self._loading.values(), return_exceptions=True)
+        while self._resident:
+            _, entry = self._resident.popitem()
+            await entry.slot.close()
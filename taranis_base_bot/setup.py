@@ -1,11 +1,166 @@
+import asyncio
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
 from typing import Any, Callable, Awaitable
 
 from quart import Quart
 
 from taranis_base_bot import blueprint
+from taranis_base_bot.admission import AdmissionController
+from taranis_base_bot.batching import MicroBatcher
+from taranis_base_bot.cache import create_result_cache
+from taranis_base_bot.chunking import ChunkedPredictor
+from taranis_base_bot.coalesce import SingleFlight
+from taranis_base_bot.codec import FastJSONProvider
 from taranis_base_bot.decorators import api_key_required
+from taranis_base_bot.executor import PerThreadModel, create_executor, is_async_callable, is_async_generator_callable, run_in_executor
+from taranis_base_bot.lifecycle import ModelSlot, watch_file
 from taranis_base_bot.log import logger
-from taranis_base_bot.misc import create_request_parser, get_hf_modelinfo, get_model
+from taranis_base_bot.misc import HFModelInfoCache, create_request_parser, get_model
+from taranis_base_bot.protocols import Predictor
+from taranis_base_bot.registry import ModelRegistry, with_model_selector
+
+
+def create_model_executor(model: Predictor, config) -> ThreadPoolExecutor | None:
+    """
+    Returns an executor for `model` if its predict is blocking or PREDICT_IN_EXECUTOR is set.
+    Streaming predictors (async generators) always stay on the event loop.
+    """
+    if is_async_generator_callable(model.predict):
+        return None
+    if config.PREDICT_IN_EXECUTOR or not is_async_callable(model.predict):
+        return create_executor(config.PREDICT_EXECUTOR_WORKERS)
+    return None
+
+
+def build_predict_fn(model: Predictor, config, executor: ThreadPoolExecutor | None = None) -> Callable[..., Awaitable[Any]]:
+    """
+    Returns the callable InferenceView awaits for `model`.
+    - with an `executor`, predict and predict_batch run on it, with one model per thread if MODEL_PER_THREAD is set
+    - models implementing `predict_batch` are put behind a MicroBatcher if BATCH_MAX_SIZE > 1
+    """
+    target: Any = model
+    if executor is not None and config.MODEL_PER_THREAD:
+        target = PerThreadModel(lambda: get_model(config), seed=model)
+
+    predict = target.predict
+    predict_batch = target.predict_batch if hasattr(model, "predict_batch") else None
+    if executor is not None:
+        predict = run_in_executor(predict, executor)
+        if predict_batch is not None:
+            predict_batch = run_in_executor(predict_batch, executor)
+
+    if predict_batch is None or config.BATCH_MAX_SIZE <= 1:
+        return predict
+
+    logger.info(f"Micro-batching enabled with BATCH_MAX_SIZE={config.BATCH_MAX_SIZE} and BATCH_MAX_WAIT_MS={config.BATCH_MAX_WAIT_MS}")
+    return MicroBatcher(predict_batch, max_size=config.BATCH_MAX_SIZE, max_wait_ms=config.BATCH_MAX_WAIT_MS)
+
+
+def create_modelinfo_fn(model: Predictor, config) -> Callable[[], Awaitable[Any]]:
+    """Hugging Face metadata of `model.model_name` if HF_MODEL_INFO is set, otherwise the configured MODEL"""
+    if config.HF_MODEL_INFO and hasattr(model, "model_name"):
+        return HFModelInfoCache(
+            model.model_name,
+            ttl=config.HF_MODEL_INFO_TTL,
+            snapshot_path=config.HF_MODEL_INFO_SNAPSHOT,
+            offline=config.HF_MODEL_INFO_OFFLINE,
+        )
+
+    async def configured_model_fn():
+        return config.MODEL
+
+    return configured_model_fn
+
+
+def install_model(
+    slot: ModelSlot,
+    model: Predictor | None,
+    config,
+    predict_fn: Callable[..., Awaitable[Any]] | None = None,
+    modelinfo_fn: Callable[[], Any] | None = None,
+) -> None:
+    """
+    Builds the callables not given by the bot from `model` and puts them into `slot`, `model` is only needed for those.
+    The executor and modelinfo cache created here are released with the model, when it is replaced or the app stops serving.
+    With MODEL_RELOAD_WATCH, the modification time of the watched file is the version of the model, the same in every worker.
+    """
+    closers: list[Callable[[], Any]] = []
+    if predict_fn is None:
+        executor = create_model_executor(model, config)
+        if executor is not None:
+            logger.info(f"Running predictions on an executor with PREDICT_EXECUTOR_WORKERS={config.PREDICT_EXECUTOR_WORKERS}")
+            closers.append(partial(executor.shutdown, wait=False, cancel_futures=True))
+        predict_fn = build_predict_fn(model, config, executor)
+
+    if modelinfo_fn is None:
+        modelinfo_fn = create_modelinfo_fn(model, config)
+        if isinstance(modelinfo_fn, HFModelInfoCache):
+            closers.append(modelinfo_fn.close)
+    elif isinstance(modelinfo_fn, HFModelInfoCache):
+        # given by the bot, so it outlives reloads of the model
+        slot.on_close(modelinfo_fn.close)
+
+    if config.MODEL_RELOAD_WATCH:
+        try:
+            slot.version = str(os.stat(config.MODEL_RELOAD_WATCH).st_mtime_ns)
+        except OSError:
+            slot.version = ""
+    slot.set(predict_fn, modelinfo_fn, closers)
+
+
+def create_model_registry(config, request_parser: Callable[[Any], dict[str, Any]]) -> ModelRegistry:
+    """
+    ModelRegistry for MODEL and MODELS, every model is loaded and set up with a copy of `config` with its name as MODEL.
+    The models besides MODEL get their own HF_MODEL_INFO_SNAPSHOT file, suffixed with the model name.
+    """
+
+    def model_config(name: str):
+        snapshot = config.HF_MODEL_INFO_SNAPSHOT
+        if snapshot and name != config.MODEL:
+            snapshot = f"{snapshot}.{name}"
+        return config.model_copy(update={"MODEL": name, "HF_MODEL_INFO_SNAPSHOT": snapshot})
+
+    return ModelRegistry(
+        config.MODELS,
+        default=config.MODEL,
+        load=lambda name: get_model(model_config(name)),
+        install=lambda slot, name, model: install_model(slot, model, model_config(name)),
+        selector=config.MODEL_SELECTOR,
+        max_resident=config.MODELS_MAX_RESIDENT,
+        memory_budget=config.MODELS_MEMORY_BUDGET,
+        warmup_payloads=config.WARMUP_PAYLOADS,
+        request_parser=request_parser,
+    )
+
+
+def create_chunked_predict_fn(config, predict_fn: Callable[..., Awaitable[Any]]) -> Callable[..., Awaitable[Any]]:
+    """`predict_fn` splitting the CHUNK_FIELD kwarg into chunks if that is set, see ChunkedPredictor"""
+    if not config.CHUNK_FIELD:
+        return predict_fn
+    logger.info(
+        f"Splitting {config.CHUNK_FIELD!r} into chunks of CHUNK_SIZE={config.CHUNK_SIZE} characters, "
+        f"merged with the {config.CHUNK_REDUCER!r} reducer"
+    )
+    return ChunkedPredictor(
+        predict_fn,
+        field=config.CHUNK_FIELD,
+        size=config.CHUNK_SIZE,
+        overlap=config.CHUNK_OVERLAP,
+        reducer=config.CHUNK_REDUCER,
+        concurrency=config.CHUNK_CONCURRENCY,
+    )
+
+
+def create_request_profiler(config):
+    """RequestProfiler for PROFILE_SAMPLE_RATE > 0, imported only then as it pulls in cProfile and tracemalloc"""
+    if config.PROFILE_SAMPLE_RATE <= 0:
+        return None
+    from taranis_base_bot.profiling import RequestProfiler
+
+    return RequestProfiler(config.PROFILE_SAMPLE_RATE)
 
 
 def setup(
@@ -18,30 +173,99 @@ def setup(
     method_decorators: list[Callable] | None = None,
 ) -> Quart:
     logger.info(f"Creating app for Bot {config.PACKAGE_NAME} with MODEL {config.MODEL}")
+    started = time.perf_counter()
     app = Quart(__name__)
+    app.json = FastJSONProvider(app)
     app.config.from_object(config)
+    # bounds what Quart buffers of a body no route reads, e.g. the rest of one rejected with 413,
+    # and replaces Quart's default of 16 MiB, which would cap the routes' own limits
+    if config.MAX_BODY_BYTES and config.BULK_MAX_BODY_BYTES:
+        app.config["MAX_CONTENT_LENGTH"] = max(config.MAX_BODY_BYTES, config.BULK_MAX_BODY_BYTES)
+    else:
+        app.config["MAX_CONTENT_LENGTH"] = None
     app.url_map.strict_slashes = False
     logger.reconfigure_from_settings(config)
 
-    if predict_fn is None or modelinfo_fn is None:
-        model = get_model(config)
+    if request_parser is None:
+        request_parser = create_request_parser(config.PAYLOAD_SCHEMA)
 
-        if predict_fn is None:
-            predict_fn = model.predict
+    # with several models, each one is warmed up when it is loaded on first use
+    multi_model = predict_fn is None and not config.MODEL_SERVER_SOCKET and bool(config.MODELS)
+    slot = ModelSlot(warmup_payloads=[] if multi_model else config.WARMUP_PAYLOADS, request_parser=request_parser)
+    slot.phases["config"] = time.perf_counter() - started
+    app.extensions["model_slot"] = slot
+    app.after_serving(slot.close)
 
+    if multi_model:
+        logger.info(f"Serving models {', '.join([config.MODEL, *config.MODELS])}, selected by the {config.MODEL_SELECTOR!r} field")
+        registry = create_model_registry(config, request_parser)
+        slot.on_close(registry.close)
+        request_parser = with_model_selector(request_parser, config.MODEL_SELECTOR)
+        predict_fn = registry.predict
         if modelinfo_fn is None:
+            modelinfo_fn = registry.modelinfo
 
-            async def default_modelinfo_fn():
-                if hasattr(model, "model_name") and config.HF_MODEL_INFO:
-                    return await get_hf_modelinfo(model.model_name)
-                else:
-                    return config.MODEL
+    elif predict_fn is None and config.MODEL_SERVER_SOCKET:
+        logger.info(f"Forwarding predictions to the model server on {config.MODEL_SERVER_SOCKET}")
+        from taranis_base_bot.sidecar import SidecarClient
 
-            modelinfo_fn = default_modelinfo_fn
+        sidecar = SidecarClient(
+            config.MODEL_SERVER_SOCKET, shm_threshold=config.MODEL_SERVER_SHM_THRESHOLD, pool_size=config.MODEL_SERVER_POOL_SIZE
+        )
+        predict_fn = sidecar
+        slot.on_close(sidecar.close)
+        if modelinfo_fn is None:
+            modelinfo_fn = sidecar.modelinfo
 
-    if request_parser is None:
-        request_parser = create_request_parser(config.PAYLOAD_SCHEMA)
+    elif (
+        predict_fn is not None
+        and not is_async_generator_callable(predict_fn)
+        and (config.PREDICT_IN_EXECUTOR or not is_async_callable(predict_fn))
+    ):
+        logger.info(f"Running predictions on an executor with PREDICT_EXECUTOR_WORKERS={config.PREDICT_EXECUTOR_WORKERS}")
+        executor = create_executor(config.PREDICT_EXECUTOR_WORKERS)
+        slot.on_close(partial(executor.shutdown, wait=False, cancel_futures=True))
+        predict_fn = run_in_executor(predict_fn, executor)
+
+    result_cache = create_result_cache(config)
+    reload_model: Callable[[], asyncio.Task] | None = None
+    if predict_fn is None:
+        # results are cached per model version, so nothing has to be cleared when the new model takes over
+        reload_model = partial(slot.reload, partial(get_model, config), partial(install_model, config=config, modelinfo_fn=modelinfo_fn))
+    elif config.MODEL_RELOAD_ROUTE or config.MODEL_RELOAD_WATCH:
+        logger.warning(
+            "Model reloading is only supported for models loaded with get_model, ignoring MODEL_RELOAD_ROUTE and MODEL_RELOAD_WATCH"
+        )
+
+    install = partial(install_model, slot, config=config, predict_fn=predict_fn, modelinfo_fn=modelinfo_fn)
+    load: Callable[[], Predictor] | None = None
+    if predict_fn is not None and modelinfo_fn is not None:
+        install(None)
+    elif config.MODEL_BACKGROUND_LOAD:
+        logger.info("Loading the model in the background, /ready reports when it is done")
+        load = partial(get_model, config)
+    else:
+        started = time.perf_counter()
+        model = get_model(config)
+        slot.phases["load"] = time.perf_counter() - started
+        install(model)
+
+    @app.before_serving
+    async def start_model():
+        slot.start(load=load, install=install)
+        if reload_model is not None and config.MODEL_RELOAD_WATCH:
+            logger.info(f"Reloading the model when {config.MODEL_RELOAD_WATCH} changes")
+            watcher = asyncio.ensure_future(watch_file(config.MODEL_RELOAD_WATCH, config.MODEL_RELOAD_POLL_SECONDS, reload_model))
+            slot.on_close(watcher.cancel)
+
+    profile_route = config.PROFILE_ROUTE
+    reload_route = config.MODEL_RELOAD_ROUTE
+    if (profile_route or reload_route) and not config.API_KEY.strip():
+        # api_key_required lets every request through without a key
+        logger.error("PROFILE_ROUTE and MODEL_RELOAD_ROUTE require API_KEY to be set, not adding /debug/profile and /admin/reload")
+        profile_route = reload_route = False
 
+    started = time.perf_counter()
     if method_decorators is None:
         method_decorators = [api_key_required]
     else:
@@ -50,10 +274,28 @@ def setup(
     bp = blueprint.create_service_blueprint(
         name=name,
         url_prefix=url_prefix,
-        predict_fn=predict_fn,
-        modelinfo_fn=modelinfo_fn,
+        predict_fn=create_chunked_predict_fn(config, slot.predict),
+        modelinfo_fn=slot.modelinfo,
         request_parser=request_parser,
         method_decorators=method_decorators,
+        result_cache=result_cache,
+        modelinfo_max_age=config.MODELINFO_MAX_AGE,
+        bulk_max_concurrency=config.BULK_MAX_CONCURRENCY,
+        bulk_max_items=config.BULK_MAX_ITEMS,
+        admission=AdmissionController(config.MAX_INFLIGHT, config.MAX_QUEUE),
+        admission_reject_status=config.ADMISSION_REJECT_STATUS,
+        predict_timeout=config.PREDICT_TIMEOUT,
+        profile_route=profile_route,
+        profile_max_seconds=config.PROFILE_MAX_SECONDS,
+        request_profiler=create_request_profiler(config),
+        model_slot=slot,
+        model_selector=config.MODEL_SELECTOR if multi_model else None,
+        reload_fn=reload_model if reload_route else None,
+        coalescer=SingleFlight() if config.COALESCE_REQUESTS else None,
+        compress_min_bytes=config.COMPRESS_MIN_BYTES if config.COMPRESS_RESPONSES else None,
+        max_body_bytes=config.MAX_BODY_BYTES,
+        bulk_max_body_bytes=config.BULK_MAX_BODY_BYTES,
     )
     app.register_blueprint(bp)
+    slot.phases["blueprint"] = time.perf_counter() - started
     return app
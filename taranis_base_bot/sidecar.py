@@ -0,0 +1,322 @@
+"""
+Model-server sidecar: one process owns the Predictor, HTTP workers forward parsed kwargs to it.
+
+    python -m taranis_base_bot.sidecar my_bot.config:Config
+
+Workers and server talk over a Unix socket (MODEL_SERVER_SOCKET). A message is JSON, with NumPy arrays taken out
+as raw buffers placed after the JSON, so they are copied rather than serialized. Each frame has a header of kind (1 byte),
+length of the JSON (8 bytes), length of the buffers (8 bytes) and length of a shared-memory block name (2 bytes).
+Messages up to MODEL_SERVER_SHM_THRESHOLD bytes follow inline; larger ones are placed in a shared-memory block and only its name is sent.
+The receiver unlinks the block after reading it, the sender when the frame could not be sent.
+"""
+
+import asyncio
+import inspect
+import struct
+import sys
+from importlib import import_module
+from multiprocessing import resource_tracker
+from multiprocessing.shared_memory import SharedMemory
+from typing import Any, Awaitable, Callable
+
+from taranis_base_bot.codec import _default, dumpb, loads
+from taranis_base_bot.log import logger
+from taranis_base_bot.misc import HFModelInfoCache
+
+_HEADER = struct.Struct(">cQQH")
+_INLINE = b"I"
+_SHARED = b"S"
+# placeholder key of an array passed as a raw buffer
+_BUFFER = "__buffer__"
+
+
+class SidecarError(Exception):
+    pass
+
+
+def _create_shm(size: int) -> SharedMemory:
+    try:
+        return SharedMemory(create=True, size=size, track=False)  # type: ignore[call-arg]
+    except TypeError:
+        # Python < 3.13 always tracks the block, the receiver unlinks it
+        shm = SharedMemory(create=True, size=size)
+        resource_tracker.unregister(shm._name, "shared_memory")  # type: ignore[attr-defined]
+        return shm
+
+
+def _is_array(o: Any) -> bool:
+    return type(o).__module__ == "numpy" and getattr(o, "ndim", 0) > 0 and not o.dtype.hasobject
+
+
+def encode_message(message: Any) -> tuple[bytes, list[memoryview]]:
+    """JSON of `message` and the buffers of the NumPy arrays in it, which the JSON refers to by offset"""
+    buffers: list[memoryview] = []
+    placeholders: dict[int, dict[str, Any]] = {}
+    offset = 0
+
+    def default(o: Any) -> Any:
+        nonlocal offset
+        if not _is_array(o):
+            return _default(o)
+        # the stdlib fallback of dumpb encodes again, an array already taken out keeps its buffer
+        if id(o) not in placeholders:
+            buffer = memoryview(o if o.flags.c_contiguous else o.copy()).cast("B")
+            placeholders[id(o)] = {_BUFFER: [offset, buffer.nbytes], "dtype": o.dtype.str, "shape": list(o.shape)}
+            buffers.append(buffer)
+            offset += buffer.nbytes
+        return placeholders[id(o)]
+
+    return dumpb(message, default=default, numpy=False), buffers
+
+
+def decode_message(data: bytes | bytearray, body: bytearray) -> Any:
+    message = loads(data)
+    if not body:
+        return message
+    numpy = import_module("numpy")
+
+    def restore(value: Any) -> Any:
+        if isinstance(value, dict):
+            if _BUFFER in value:
+                offset, nbytes = value[_BUFFER]
+                dtype = numpy.dtype(value["dtype"])
+                return numpy.frombuffer(body, dtype=dtype, count=nbytes // dtype.itemsize, offset=offset).reshape(value["shape"])
+            return {key: restore(item) for key, item in value.items()}
+        if isinstance(value, list):
+            return [restore(item) for item in value]
+        return value
+
+    return restore(message)
+
+
+async def send_message(writer: asyncio.StreamWriter, encoded: tuple[bytes, list[memoryview]], shm_threshold: int) -> None:
+    data, buffers = encoded
+    body_size = sum(buffer.nbytes for buffer in buffers)
+    if writer.is_closing():
+        raise ConnectionResetError("Connection closed before sending")
+    shm = None
+    try:
+        if len(data) + body_size > shm_threshold:
+            shm = _create_shm(len(data) + body_size)
+            shm.buf[: len(data)] = data
+            position = len(data)
+            for buffer in buffers:
+                shm.buf[position : position + buffer.nbytes] = buffer
+                position += buffer.nbytes
+            name = shm.name.encode()
+            shm.close()
+            writer.write(_HEADER.pack(_SHARED, len(data), body_size, len(name)) + name)
+        else:
+            writer.writelines([_HEADER.pack(_INLINE, len(data), body_size, 0), data, *buffers])
+        await writer.drain()
+    except ConnectionError:
+        # the receiver never sees the name of the block
+        if shm is not None:
+            shm.unlink()
+        raise
+
+
+async def write_message(writer: asyncio.StreamWriter, message: Any, shm_threshold: int) -> None:
+    await send_message(writer, encode_message(message), shm_threshold)
+
+
+async def read_message(reader: asyncio.StreamReader) -> Any:
+    kind, data_size, body_size, name_size = _HEADER.unpack(await reader.readexactly(_HEADER.size))
+    if kind == _SHARED:
+        shm = SharedMemory(name=(await reader.readexactly(name_size)).decode())
+        try:
+            data = bytes(shm.buf[:data_size])
+            body = bytearray(shm.buf[data_size : data_size + body_size])
+        finally:
+            shm.close()
+            shm.unlink()
+    else:
+        data = await reader.readexactly(data_size)
+        body = bytearray(await reader.readexactly(body_size))
+    return decode_message(data, body)
+
+
+class ModelServer:
+    """Serves `predict_fn` to SidecarClients connecting on the Unix socket at `path`"""
+
+    def __init__(
+        self,
+        predict_fn: Callable[..., Awaitable[Any]],
+        modelinfo_fn: Callable[[], Any],
+        path: str,
+        shm_threshold: int = 65536,
+    ) -> None:
+        self._predict_fn = predict_fn
+        self._modelinfo = modelinfo_fn
+        self._path = path
+        self._shm_threshold = shm_threshold
+        self._server: asyncio.AbstractServer | None = None
+        self._connections: dict[asyncio.Task, asyncio.StreamWriter] = {}
+
+    async def start(self) -> None:
+        self._server = await asyncio.start_unix_server(self._handle, path=self._path)
+        logger.info(f"Model server listening on {self._path}")
+
+    async def serve_forever(self) -> None:
+        if self._server is None:
+            await self.start()
+        await self._server.serve_forever()  # type: ignore[union-attr]
+
+    async def close(self) -> None:
+        if self._server is not None:
+            self._server.close()
+            # closing the transports lets the handlers see EOF and return
+            for writer in self._connections.values():
+                writer.close()
+            await asyncio.gather(*self._connections, return_exceptions=True)
+            await self._server.wait_closed()
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        task = asyncio.current_task()
+        self._connections[task] = writer  # type: ignore[index]
+        try:
+            while True:
+                reply = await self._dispatch(await read_message(reader))
+                try:
+                    encoded = encode_message(reply)
+                except Exception as e:
+                    logger.error(f"Serializing the bot output failed with error: {e}")
+                    encoded = encode_message({"error": f"Bot output could not be serialized: {e}"})
+                await send_message(writer, encoded, self._shm_threshold)
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            self._connections.pop(task, None)  # type: ignore[arg-type]
+            writer.close()
+
+    async def _dispatch(self, message: dict[str, Any]) -> dict[str, Any]:
+        op = message.get("op")
+        if op not in ("predict", "modelinfo"):
+            return {"error": f"Unknown operation {op}"}
+        try:
+            if op == "modelinfo":
+                result = self._modelinfo()
+                return {"result": await result if inspect.isawaitable(result) else result}
+            result = self._predict_fn(**message["kwargs"])
+            if inspect.isasyncgen(result):
+                # partial results are not streamed over the socket, the worker receives them all at once
+                return {"result": [part async for part in result]}
+            return {"result": await result}
+        except Exception as e:
+            logger.error(f"Bot failed with error: {e}")
+            return {"error": str(e)}
+
+
+class SidecarClient:
+    """
+    predict_fn for HTTP workers that forwards kwargs to the ModelServer at `path`.
+    Keeps up to `pool_size` connections open, each carrying one request at a time.
+    """
+
+    def __init__(self, path: str, shm_threshold: int = 65536, pool_size: int = 16) -> None:
+        self._path = path
+        self._shm_threshold = shm_threshold
+        self._pool_size = pool_size
+        self._idle: list[tuple[asyncio.StreamReader, asyncio.StreamWriter]] = []
+        self._slots: asyncio.Semaphore | None = None
+        # reads of replies whose request went away, they unlink the reply's shared-memory block
+        self._abandoned: set[asyncio.Task] = set()
+
+    async def __call__(self, **kwargs: Any) -> Any:
+        return await self._request({"op": "predict", "kwargs": kwargs})
+
+    async def modelinfo(self) -> Any:
+        return await self._request({"op": "modelinfo"})
+
+    async def _request(self, message: dict[str, Any]) -> Any:
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self._pool_size)
+
+        encoded = encode_message(message)
+        async with self._slots:
+            reader, writer = self._idle.pop() if self._idle else await asyncio.open_unix_connection(self._path)
+            read: asyncio.Task | None = None
+            try:
+                await send_message(writer, encoded, self._shm_threshold)
+                # read in a task of its own, so that a cancelled request does not stop in the middle of a reply
+                read = asyncio.ensure_future(read_message(reader))
+                reply = await asyncio.shield(read)
+            except BaseException as e:
+                if read is None and not isinstance(e, ConnectionError):
+                    # cancelled while sending, the request may still reach the server
+                    read = asyncio.ensure_future(read_message(reader))
+                if read is None or read.done():
+                    writer.close()
+                else:
+                    self._abandon(read, writer)
+                raise
+            self._idle.append((reader, writer))
+
+        if "error" in reply:
+            raise SidecarError(reply["error"])
+        return reply["result"]
+
+    def _abandon(self, read: asyncio.Task, writer: asyncio.StreamWriter) -> None:
+        """Lets `read` take in the reply nobody waits for, then closes its connection"""
+
+        def done(task: asyncio.Task) -> None:
+            self._abandoned.discard(task)
+            writer.close()
+            if not task.cancelled() and task.exception() is not None:
+                logger.debug(f"Discarding an abandoned reply failed with error: {task.exception()}")
+
+        self._abandoned.add(read)
+        read.add_done_callback(done)
+
+    async def close(self) -> None:
+        while self._idle:
+            _, writer = self._idle.pop()
+            writer.close()
+        if self._abandoned:
+            # give replies on their way a moment to arrive, a block of one arriving later is left behind
+            _, pending = await asyncio.wait(self._abandoned, timeout=1)
+            for task in pending:
+                task.cancel()
+
+
+async def run_model_server(config) -> None:
+    from taranis_base_bot.misc import get_model
+    from taranis_base_bot.setup import build_predict_fn, create_model_executor, create_modelinfo_fn
+
+    model = get_model(config)
+    executor = create_model_executor(model, config)
+    modelinfo_fn = create_modelinfo_fn(model, config)
+    server = ModelServer(
+        build_predict_fn(model, config, executor),
+        modelinfo_fn=modelinfo_fn,
+        path=config.MODEL_SERVER_SOCKET,
+        shm_threshold=config.MODEL_SERVER_SHM_THRESHOLD,
+    )
+    try:
+        await server.serve_forever()
+    finally:
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+        if isinstance(modelinfo_fn, HFModelInfoCache):
+            await modelinfo_fn.close()
+
+
+def main(argv: list[str] | None = None) -> int:
+    argv = sys.argv[1:] if argv is None else argv
+    if len(argv) != 1:
+        print("Usage: python -m taranis_base_bot.sidecar module:SettingsClass")
+        return 2
+
+    module_name, _, class_name = argv[0].partition(":")
+    config = getattr(import_module(module_name), class_name)()
+    if not config.MODEL_SERVER_SOCKET:
+        print("MODEL_SERVER_SOCKET must be set to run the model server")
+        return 2
+
+    logger.reconfigure_from_settings(config)
+    asyncio.run(run_model_server(config))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
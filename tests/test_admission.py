@@ -0,0 +1,96 @@
+import asyncio
+
+import pytest
+
+from taranis_base_bot import create_app
+from taranis_base_bot.admission import AdmissionController, Overloaded
+
+
+@pytest.mark.asyncio
+async def test_unlimited_controller_only_counts():
+    admission = AdmissionController()
+    started = [await admission.acquire() for _ in range(100)]
+    assert admission.inflight == 100
+    for s in started:
+        admission.release(s)
+    assert admission.stats() == {"inflight": 0, "queued": 0, "rejected": 0}
+
+
+@pytest.mark.asyncio
+async def test_queue_is_fifo_and_bounded():
+    admission = AdmissionController(max_inflight=1, max_queue=2)
+    first = await admission.acquire()
+    order = []
+
+    async def waiter(name):
+        async with admission.slot():
+            order.append(name)
+
+    tasks = [asyncio.create_task(waiter(name)) for name in ("a", "b")]
+    await asyncio.sleep(0)
+    assert admission.queued == 2
+    assert admission.saturated
+
+    with pytest.raises(Overloaded) as exc_info:
+        await admission.acquire()
+    assert exc_info.value.retry_after >= 1
+    assert admission.rejected == 1
+
+    admission.release(first)
+    await asyncio.gather(*tasks)
+    assert order == ["a", "b"]
+    assert admission.stats() == {"inflight": 0, "queued": 0, "rejected": 1}
+
+
+@pytest.mark.asyncio
+async def test_cancelled_waiter_gives_up_its_place():
+    admission = AdmissionController(max_inflight=1, max_queue=2)
+    first = await admission.acquire()
+    task = asyncio.create_task(admission.acquire())
+    await asyncio.sleep(0)
+    task.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await task
+    assert admission.queued == 0
+    admission.release(first)
+    assert admission.inflight == 0
+
+
+def test_retry_after_follows_service_time():
+    admission = AdmissionController(max_inflight=2, max_queue=10)
+    admission._service_time = 3.0
+    assert admission.retry_after() == 2
+    admission._waiters.extend([None] * 3)
+    assert admission.retry_after() == 6
+
+
+@pytest.mark.asyncio
+async def test_inference_view_rejects_when_queue_is_full(custom_settings):
+    custom_settings.MAX_INFLIGHT = 1
+    custom_settings.MAX_QUEUE = 0
+    custom_settings.ADMISSION_REJECT_STATUS = 429
+    custom_settings.CACHE_TYPE = "NullCache"
+    release = asyncio.Event()
+
+    async def predict_fn(**kwargs):
+        await release.wait()
+        return kwargs
+
+    app = create_app(
+        name="svc-admission", config=custom_settings, predict_fn=predict_fn, modelinfo_fn=lambda: "m", request_parser=lambda x: x
+    )
+    async with app.test_client() as c:
+        busy = asyncio.create_task(c.post("/", json={"text": "a"}))
+        await asyncio.sleep(0.05)
+
+        health = await (await c.get("/health")).get_json()
+        assert (health["inflight"], health["queued"]) == (1, 0)
+
+        r = await c.post("/", json={"text": "b"})
+        assert r.status_code == 429
+        assert int(r.headers["Retry-After"]) >= 1
+
+        release.set()
+        assert (await busy).status_code == 200
+        health = await (await c.get("/health")).get_json()
+        assert (health["inflight"], health["queued"]) == (0, 0)
@@ -1,13 +1,17 @@
+import json
+
 import pytest
 import respx
 
+from taranis_base_bot import create_app
+
 
 @pytest.mark.asyncio
 async def test_health_check(client):
     response = await client.get("/health")
     assert response.status_code == 200
     data = await response.get_json()
-    assert data == {"status": "ok"}
+    assert data == {"status": "ok", "inflight": 0, "queued": 0, "cancelled": {"expired": 0, "deadline": 0, "disconnected": 0}}
 
 
 @pytest.mark.asyncio
@@ -159,3 +163,109 @@ async def test_modelinfo_func_error(client_with_modelinfo_fn, custom_settings):
             "model": custom_settings.MODEL,
             "error": "Connection failed",
         }
+
+
+@pytest.mark.asyncio
+async def test_bulk_predict_streams_ndjson(client_with_predict):
+    response = await client_with_predict.post("/batch", json=[{"text": "a"}, {"text": "abc"}])
+    assert response.status_code == 200
+    assert response.mimetype == "application/x-ndjson"
+    lines = [json.loads(line) for line in (await response.get_data(as_text=True)).splitlines()]
+    assert sorted(lines, key=lambda line: line["index"]) == [{"index": 0, "result": {"len": 1}}, {"index": 1, "result": {"len": 3}}]
+
+
+@pytest.mark.asyncio
+async def test_bulk_predict_per_item_errors(client_with_request_parser):
+    response = await client_with_request_parser.post("/batch", json=[{"text": "ok"}, {"other": "x"}, "notadict"])
+    assert response.status_code == 200
+    lines = {line["index"]: line for line in map(json.loads, (await response.get_data(as_text=True)).splitlines())}
+    assert lines[0] == {"index": 0, "result": {"text": "ok"}}
+    assert lines[1]["error"] == "Could not parse payload. Check bot logs for more details."
+    assert lines[2]["error"] == "Payload must be a dict!"
+
+
+@pytest.mark.asyncio
+async def test_bulk_predict_requires_list(client):
+    response = await client.post("/batch", json={"text": "not a list"})
+    assert response.status_code == 400
+    data = await response.get_json()
+    assert data["error"] == "Payload must be a list!"
+
+
+@pytest.mark.asyncio
+async def test_bulk_predict_requires_api_key(client_with_api_key):
+    response = await client_with_api_key.post("/batch", json=[{"text": "test"}])
+    assert response.status_code == 401
+
+
+@pytest.mark.asyncio
+async def test_modelinfo_etag(client_with_modelinfo_fn, custom_settings):
+    with respx.mock(base_url="https://huggingface.co") as mock:
+        mock.get(f"/api/models/{custom_settings.MODEL}").respond(status_code=200, json={"model": custom_settings.MODEL})
+
+        response = await client_with_modelinfo_fn.get("/modelinfo")
+        etag = response.headers["ETag"]
+        assert response.status_code == 200
+        assert "max-age" in response.headers["Cache-Control"]
+
+        response = await client_with_modelinfo_fn.get("/modelinfo", headers={"If-None-Match": etag})
+        assert response.status_code == 304
+
+
+async def streaming_predict(text: str):
+    for token in text.split():
+        yield {"token": token}
+
+
+async def failing_stream(text: str):
+    yield {"token": "first"}
+    raise RuntimeError("boom")
+
+
+@pytest.mark.asyncio
+async def test_streaming_predictor_ndjson(custom_settings):
+    app = create_app(
+        name="svc-stream", config=custom_settings, predict_fn=streaming_predict, modelinfo_fn=lambda: "m", request_parser=lambda x: x
+    )
+    async with app.test_client() as c:
+        r = await c.post("/", json={"text": "hello streaming world"})
+        assert r.status_code == 200
+        assert r.mimetype == "application/x-ndjson"
+        assert "X-Cache" not in r.headers
+        lines = (await r.get_data()).splitlines()
+        assert [json.loads(line) for line in lines] == [{"token": "hello"}, {"token": "streaming"}, {"token": "world"}]
+
+
+@pytest.mark.asyncio
+async def test_streaming_predictor_sse_and_errors(custom_settings):
+    app = create_app(name="svc-sse", config=custom_settings, predict_fn=failing_stream, modelinfo_fn=lambda: "m", request_parser=lambda x: x)
+    async with app.test_client() as c:
+        r = await c.post("/", json={"text": "x"}, headers={"Accept": "text/event-stream"})
+        assert r.status_code == 200
+        assert r.mimetype == "text/event-stream"
+        body = (await r.get_data()).decode()
+        assert body.startswith('data: {"token":"first"}\n\n')
+        assert "event: error\ndata: " in body
+
+
+@pytest.mark.asyncio
+async def test_streaming_predictor_failing_before_first_part(custom_settings):
+    async def broken(text: str):
+        raise RuntimeError("boom")
+        yield
+
+    app = create_app(name="svc-stream-err", config=custom_settings, predict_fn=broken, modelinfo_fn=lambda: "m", request_parser=lambda x: x)
+    async with app.test_client() as c:
+        r = await c.post("/", json={"text": "x"})
+        assert r.status_code == 400
+
+
+@pytest.mark.asyncio
+async def test_bulk_collects_streamed_parts(custom_settings):
+    app = create_app(
+        name="svc-stream-bulk", config=custom_settings, predict_fn=streaming_predict, modelinfo_fn=lambda: "m", request_parser=lambda x: x
+    )
+    async with app.test_client() as c:
+        r = await c.post("/batch", json=[{"text": "a b"}])
+        lines = [json.loads(line) for line in (await r.get_data()).splitlines()]
+        assert lines == [{"index": 0, "result": [{"token": "a"}, {"token": "b"}]}]
@@ -0,0 +1,88 @@
+import asyncio
+
+import pytest
+
+from taranis_base_bot import create_app
+from taranis_base_bot.batching import MicroBatcher
+
+
+@pytest.mark.asyncio
+async def test_micro_batcher_flushes_on_max_size():
+    calls = []
+
+    async def predict_batch(inputs):
+        calls.append(inputs)
+        return [{"len": len(i["text"])} for i in inputs]
+
+    batcher = MicroBatcher(predict_batch, max_size=3, max_wait_ms=10_000)
+    results = await asyncio.gather(*(batcher(text="a" * n) for n in range(1, 4)))
+
+    assert results == [{"len": 1}, {"len": 2}, {"len": 3}]
+    assert len(calls) == 1
+
+
+@pytest.mark.asyncio
+async def test_micro_batcher_flushes_on_max_wait():
+    calls = []
+
+    async def predict_batch(inputs):
+        calls.append(inputs)
+        return inputs
+
+    batcher = MicroBatcher(predict_batch, max_size=100, max_wait_ms=1)
+    results = await asyncio.gather(batcher(text="a"), batcher(text="b"))
+
+    assert results == [{"text": "a"}, {"text": "b"}]
+    assert calls == [[{"text": "a"}, {"text": "b"}]]
+
+
+@pytest.mark.asyncio
+async def test_micro_batcher_per_item_error():
+    async def predict_batch(inputs):
+        return [ValueError("bad item") if i["text"] == "bad" else i for i in inputs]
+
+    batcher = MicroBatcher(predict_batch, max_size=2, max_wait_ms=10_000)
+    good, bad = await asyncio.gather(batcher(text="good"), batcher(text="bad"), return_exceptions=True)
+
+    assert good == {"text": "good"}
+    assert isinstance(bad, ValueError)
+
+
+@pytest.mark.asyncio
+async def test_micro_batcher_result_count_mismatch():
+    async def predict_batch(inputs):
+        return []
+
+    batcher = MicroBatcher(predict_batch, max_size=1, max_wait_ms=0)
+    with pytest.raises(ValueError, match="returned 0 results for 1 inputs"):
+        await batcher(text="a")
+
+
+@pytest.mark.asyncio
+async def test_create_app_uses_predict_batch(custom_settings, fake_pkg, fake_model):
+    calls = []
+
+    async def predict_batch(self, inputs):
+        calls.append(len(inputs))
+        return [{"batched": i["test"]} for i in inputs]
+
+    fake_model.predict_batch = predict_batch
+    custom_settings.BATCH_MAX_SIZE = 4
+    custom_settings.BATCH_MAX_WAIT_MS = 1
+
+    app = create_app(name="svc-batch", config=custom_settings, method_decorators=[])
+    async with app.test_client() as c:
+        responses = await asyncio.gather(*(c.post("/", json={"test": str(n)}) for n in range(4)))
+        assert [await r.get_json() for r in responses] == [{"batched": str(n)} for n in range(4)]
+    assert sum(calls) == 4
+
+
+@pytest.mark.asyncio
+async def test_create_app_without_predict_batch_falls_back(custom_settings, fake_pkg):
+    custom_settings.BATCH_MAX_SIZE = 4
+
+    app = create_app(name="svc-no-batch", config=custom_settings, method_decorators=[])
+    async with app.test_client() as c:
+        r = await c.post("/", json={"test": "val"})
+        assert r.status_code == 200
+        assert await r.get_json() == {"test": "val"}
@@ -0,0 +1,19 @@
+import pytest
+
+from benchmarks.hot_path import percentile, run
+
+
+def test_percentile_nearest_rank():
+    values = [float(i) for i in range(1, 101)]
+    assert percentile(values, 50) == 50
+    assert percentile(values, 99) == 99
+    assert percentile([1.0], 95) == 1
+
+
+@pytest.mark.asyncio
+async def test_hot_path_benchmark_smoke():
+    report = await run(["inprocess"], concurrency=[2], payload_sizes=[10], requests=20, latency_ms=0, output_size=10)
+    (result,) = report["results"]
+    assert result["errors"] == 0
+    assert result["requests"] == 20
+    assert result["p50_ms"] <= result["p95_ms"] <= result["p99_ms"]
@@ -0,0 +1,240 @@
+import json
+
+import pytest
+
+from taranis_base_bot import create_app
+from taranis_base_bot.cache import SimpleCache, SQLiteCache, cache_key, create_result_cache
+
+
+def test_cache_key_is_canonical():
+    assert cache_key({"a": 1, "b": [1, 2]}) == cache_key({"b": [1, 2], "a": 1})
+    assert cache_key({"a": 1}) != cache_key({"a": 2})
+    assert cache_key({"a": 1}, namespace="one") != cache_key({"a": 1}, namespace="two")
+
+
+def test_cache_key_tells_apart_values_json_cannot_encode():
+    np = pytest.importorskip("numpy")
+    array = np.arange(2000)
+    changed = array.copy()
+    changed[500] = -1
+    assert cache_key({"x": array}) != cache_key({"x": changed})
+    assert cache_key({"x": array}) == cache_key({"x": np.arange(2000)})
+    assert cache_key({"x": array}) != cache_key({"x": array.astype(np.int32)})
+    assert cache_key({"x": [1, 2]}) != cache_key({"x": np.array([1, 2])})
+    # values without a lossless encoding are not cached
+    assert cache_key({"x": object()}) is None
+    assert cache_key({"x": {1, 2}}) is None
+
+
+@pytest.mark.asyncio
+async def test_simple_cache_hit_and_miss():
+    cache = SimpleCache()
+    assert await cache.get("k") is None
+    await cache.set("k", b"value")
+    assert await cache.get("k") == b"value"
+    assert cache.stats() == {"hits": 1, "misses": 1, "entries": 1, "bytes": 5}
+
+
+@pytest.mark.asyncio
+async def test_simple_cache_ttl(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr("taranis_base_bot.cache.time.monotonic", lambda: now[0])
+    cache = SimpleCache(default_timeout=10)
+    await cache.set("k", b"value")
+    now[0] += 11
+    assert await cache.get("k") is None
+    assert cache.stats()["entries"] == 0
+
+
+@pytest.mark.asyncio
+async def test_simple_cache_lru_eviction_by_entries():
+    cache = SimpleCache(threshold=2)
+    await cache.set("a", b"1")
+    await cache.set("b", b"2")
+    await cache.get("a")
+    await cache.set("c", b"3")
+    assert await cache.get("b") is None
+    assert await cache.get("a") == b"1"
+    assert await cache.get("c") == b"3"
+
+
+@pytest.mark.asyncio
+async def test_simple_cache_lru_eviction_by_bytes():
+    cache = SimpleCache(max_bytes=10)
+    await cache.set("a", b"12345")
+    await cache.set("b", b"12345")
+    await cache.set("c", b"123")
+    assert await cache.get("a") is None
+    assert cache.stats()["bytes"] == 8
+    await cache.set("huge", b"x" * 11)
+    assert await cache.get("huge") is None
+
+
+@pytest.mark.asyncio
+async def test_sqlite_cache_shared_and_persistent(tmp_path):
+    first = SQLiteCache(str(tmp_path))
+    second = SQLiteCache(str(tmp_path))
+    await first.set("k", b"value")
+    assert await second.get("k") == b"value"
+    assert await second.get("missing") is None
+    assert second.stats() == {"hits": 1, "misses": 1, "entries": 1, "bytes": 5}
+
+    restarted = SQLiteCache(str(tmp_path), warm_keys=0)
+    assert await restarted.get("k") == b"value"
+
+
+@pytest.mark.asyncio
+async def test_sqlite_cache_expiry(tmp_path, monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr("taranis_base_bot.cache.time.time", lambda: now[0])
+    cache = SQLiteCache(str(tmp_path), default_timeout=10, threshold=0)
+    await cache.set("k", b"value")
+    now[0] += 11
+    assert await cache.get("k") is None
+
+
+@pytest.mark.asyncio
+async def test_sqlite_cache_evicts_least_recently_used(tmp_path, monkeypatch):
+    monkeypatch.setattr(SQLiteCache, "_EVICT_EVERY", 1)
+    cache = SQLiteCache(str(tmp_path), disk_max_bytes=10, threshold=0)
+    await cache.set("a", b"12345")
+    await cache.set("b", b"12345")
+    await cache.get("a")
+    await cache.set("c", b"12345")
+    assert cache.stats()["bytes"] == 10
+    assert await cache.get("b") is None
+    assert await cache.get("a") == b"12345"
+
+
+@pytest.mark.asyncio
+async def test_sqlite_cache_warm_loads_hot_keys(tmp_path):
+    cache = SQLiteCache(str(tmp_path))
+    await cache.set("hot", b"1")
+    await cache.set("cold", b"2")
+    for _ in range(3):
+        cache._get("hot")
+
+    restarted = SQLiteCache(str(tmp_path), warm_keys=1)
+    # the file is opened, and the hot keys loaded, on first use rather than when the app is created
+    assert restarted._db is None
+    assert await restarted.get("missing") is None
+    assert restarted._front.stats()["entries"] == 1
+    assert await restarted._front.get("hot") == b"1"
+
+
+@pytest.mark.asyncio
+async def test_sqlite_cache_connects_once_per_process(tmp_path, monkeypatch):
+    cache = SQLiteCache(str(tmp_path))
+    await cache.set("a", b"123")
+    await cache.set("a", b"12345")
+    await cache.set("b", b"1")
+    assert cache.stats() == {"hits": 0, "misses": 0, "entries": 2, "bytes": 6}
+    parent = cache._db
+
+    # a forked worker opens its own connection and leaves the inherited one alone
+    monkeypatch.setattr("taranis_base_bot.cache.os.getpid", lambda: -1)
+    assert await cache.get("a") == b"12345"
+    assert cache._db is not parent and cache._inherited == [parent]
+
+    await cache.clear()
+    assert cache.stats()["entries"] == 0
+    assert await cache.get("a") is None
+
+
+def test_create_result_cache(custom_settings, tmp_path):
+    # off unless configured
+    assert create_result_cache(custom_settings) is None
+    custom_settings.CACHE_TYPE = "SimpleCache"
+    assert isinstance(create_result_cache(custom_settings), SimpleCache)
+    custom_settings.CACHE_TYPE = "SQLiteCache"
+    custom_settings.CACHE_DIR = str(tmp_path)
+    assert isinstance(create_result_cache(custom_settings), SQLiteCache)
+    custom_settings.CACHE_TYPE = "NullCache"
+    assert create_result_cache(custom_settings) is None
+    custom_settings.CACHE_TYPE = "RedisCache"
+    with pytest.raises(ValueError, match="Unknown CACHE_TYPE RedisCache"):
+        create_result_cache(custom_settings)
+
+
+@pytest.mark.asyncio
+async def test_inference_view_uses_result_cache(custom_settings):
+    custom_settings.CACHE_TYPE = "SimpleCache"
+    calls = []
+
+    async def predict_fn(**kwargs):
+        calls.append(kwargs)
+        return {"calls": len(calls)}
+
+    app = create_app(name="svc-cache", config=custom_settings, predict_fn=predict_fn, modelinfo_fn=lambda: "m", request_parser=lambda x: x)
+    async with app.test_client() as c:
+        r1 = await c.post("/", json={"text": "same", "n": 1})
+        r2 = await c.post("/", json={"n": 1, "text": "same"})
+        assert r1.headers["X-Cache"] == "MISS"
+        assert r2.headers["X-Cache"] == "HIT"
+        assert await r1.get_json() == await r2.get_json() == {"calls": 1}
+
+        r3 = await c.post("/", json={"text": "same", "n": 1}, headers={"Cache-Control": "no-cache"})
+        assert r3.headers["X-Cache"] == "BYPASS"
+        assert await r3.get_json() == {"calls": 2}
+
+
+@pytest.mark.asyncio
+async def test_bulk_items_share_the_result_cache(custom_settings):
+    custom_settings.CACHE_TYPE = "SimpleCache"
+    calls = []
+
+    async def predict_fn(**kwargs):
+        calls.append(kwargs)
+        return {"calls": len(calls)}
+
+    app = create_app(name="svc-bulk", config=custom_settings, predict_fn=predict_fn, modelinfo_fn=lambda: "m", request_parser=lambda x: x)
+    async with app.test_client() as c:
+        await c.post("/", json={"text": "a"})
+        r = await c.post("/batch", json=[{"text": "a"}, {"text": "b"}])
+        lines = sorted((json.loads(line) for line in (await r.get_data()).splitlines()), key=lambda line: line["index"])
+        assert lines == [{"index": 0, "result": {"calls": 1}}, {"index": 1, "result": {"calls": 2}}]
+
+        r = await c.post("/", json={"text": "b"})
+        assert r.headers["X-Cache"] == "HIT"
+        assert await r.get_json() == {"calls": 2}
+
+        r = await c.post("/batch", json=[{"text": "a"}], headers={"Cache-Control": "no-cache"})
+        assert json.loads(await r.get_data()) == {"index": 0, "result": {"calls": 3}}
+    assert len(calls) == 3
+
+
+@pytest.mark.asyncio
+async def test_payloads_without_a_key_are_not_cached(custom_settings):
+    custom_settings.CACHE_TYPE = "SimpleCache"
+    calls = []
+
+    async def predict_fn(**kwargs):
+        calls.append(kwargs)
+        return {"calls": len(calls)}
+
+    def request_parser(data):
+        return {"text": data["text"], "tokens": {data["text"]}}
+
+    app = create_app(name="svc-nokey", config=custom_settings, predict_fn=predict_fn, modelinfo_fn=lambda: "m", request_parser=request_parser)
+    async with app.test_client() as c:
+        await c.post("/", json={"text": "same"})
+        r = await c.post("/", json={"text": "same"})
+        assert "X-Cache" not in r.headers
+        assert await r.get_json() == {"calls": 2}
+
+
+@pytest.mark.asyncio
+async def test_inference_view_without_cache(custom_settings):
+    custom_settings.CACHE_TYPE = "NullCache"
+    calls = []
+
+    async def predict_fn(**kwargs):
+        calls.append(kwargs)
+        return {"calls": len(calls)}
+
+    app = create_app(name="svc-no-cache", config=custom_settings, predict_fn=predict_fn, modelinfo_fn=lambda: "m", request_parser=lambda x: x)
+    async with app.test_client() as c:
+        await c.post("/", json={"text": "same"})
+        r = await c.post("/", json={"text": "same"})
+        assert "X-Cache" not in r.headers
+        assert await r.get_json() == {"calls": 2}
@@ -0,0 +1,110 @@
+import asyncio
+import json
+
+import pytest
+
+from taranis_base_bot import create_app
+from taranis_base_bot.chunking import ChunkedPredictor, ConcatReducer, MaxReducer, MeanReducer, split_text
+
+TEXT = " ".join(f"word{i}" for i in range(200))
+
+
+def test_split_text_overlaps_at_word_boundaries():
+    chunks = list(split_text(TEXT, size=100, overlap=20))
+    assert len(chunks) > 1
+    assert all(len(chunk) <= 100 for chunk in chunks)
+    # no word is cut, and every chunk starts with words the previous one ended with
+    assert all(chunk.split() == [w for w in chunk.split() if w in TEXT.split()] for chunk in chunks)
+    for previous, chunk in zip(chunks, chunks[1:]):
+        assert chunk.split()[0] in previous.split()[-4:]
+    assert chunks[0].startswith("word0 ") and chunks[-1].endswith("word199")
+
+
+def test_split_text_without_whitespace_or_overlap():
+    assert list(split_text("abcdefghij", size=4)) == ["abcd", "efgh", "ij"]
+    assert list(split_text("abcdefghij", size=4, overlap=2)) == ["abcd", "cdef", "efgh", "ghij"]
+    assert list(split_text("short", size=10, overlap=2)) == ["short"]
+
+
+def test_reducers():
+    results = [{"scores": [0.2, 0.4], "label": "news"}, {"scores": [0.6, 0.0], "label": "news"}]
+    mean = MeanReducer()
+    maximum = MaxReducer()
+    for index, result in enumerate(results):
+        mean.add(index, result)
+        maximum.add(index, result)
+    assert mean.result() == {"scores": pytest.approx([0.4, 0.2]), "label": "news"}
+    assert maximum.result() == {"scores": [0.6, 0.4], "label": "news"}
+
+    concat = ConcatReducer()
+    concat.add(1, ["b"])
+    concat.add(0, ["a"])
+    assert concat.result() == ["a", "b"]
+
+    mean = MeanReducer()
+    mean.add(0, {"a": 1})
+    with pytest.raises(ValueError, match="different keys"):
+        mean.add(1, {"b": 1})
+
+
+def test_reducers_take_numpy_arrays():
+    np = pytest.importorskip("numpy")
+    maximum = MaxReducer()
+    maximum.add(0, np.array([0.1, 0.5]))
+    maximum.add(1, np.array([0.3, 0.2]))
+    assert maximum.result().tolist() == [0.3, 0.5]
+
+
+@pytest.mark.asyncio
+async def test_chunked_predictor_bounds_concurrency():
+    running = 0
+    peak = 0
+
+    async def predict_fn(text: str, lang: str):
+        nonlocal running, peak
+        running += 1
+        peak = max(peak, running)
+        await asyncio.sleep(0.001)
+        running -= 1
+        return {"length": len(text), "lang": lang}
+
+    predictor = ChunkedPredictor(predict_fn, field="text", size=100, overlap=20, reducer="max", concurrency=3)
+    result = await predictor(text=TEXT, lang="en")
+    assert 90 < result["length"] <= 100 and result["lang"] == "en"
+    assert peak == 3
+    assert await predictor(text="short", lang="en") == {"length": 5, "lang": "en"}
+
+    with pytest.raises(ValueError, match="Unknown chunk reducer"):
+        ChunkedPredictor(predict_fn, field="text", size=100, reducer="median")
+
+
+@pytest.mark.asyncio
+async def test_chunked_predictor_fails_with_a_chunk():
+    async def predict_fn(text: str):
+        if "word150" in text:
+            raise RuntimeError("chunk failed")
+        await asyncio.sleep(0.01)
+        return [text]
+
+    predictor = ChunkedPredictor(predict_fn, field="text", size=100, reducer="concat")
+    with pytest.raises(RuntimeError, match="chunk failed"):
+        await predictor(text=TEXT)
+
+
+@pytest.mark.asyncio
+async def test_app_chunks_long_texts(custom_settings):
+    async def predict_fn(text: str):
+        return {"chunks": 1, "longest": len(text)}
+
+    custom_settings.CHUNK_FIELD = "text"
+    custom_settings.CHUNK_SIZE = 100
+    custom_settings.CHUNK_OVERLAP = 0
+    custom_settings.CHUNK_REDUCER = "max"
+    app = create_app(name="svc-chunking", config=custom_settings, predict_fn=predict_fn, modelinfo_fn=lambda: "m", request_parser=lambda x: x)
+    async with app.test_client() as c:
+        r = await c.post("/", json={"text": TEXT})
+        result = await r.get_json()
+        assert 90 < result["longest"] <= 100
+
+        r = await c.post("/batch", json=[{"text": TEXT}])
+        assert json.loads(await r.get_data())["result"] == result
@@ -0,0 +1,170 @@
+import asyncio
+
+import pytest
+
+from taranis_base_bot import create_app
+from taranis_base_bot.coalesce import SingleFlight
+from taranis_base_bot.deadlines import CancellationStats, DeadlineExceeded
+
+
+@pytest.mark.asyncio
+async def test_single_flight_shares_one_call():
+    flight = SingleFlight()
+    release = asyncio.Event()
+    calls = []
+
+    async def fn():
+        calls.append(1)
+        await release.wait()
+        return "result"
+
+    waiters = [asyncio.ensure_future(flight.run("k", fn)) for _ in range(3)]
+    await asyncio.sleep(0)
+    assert flight.inflight == 1
+    release.set()
+    assert await asyncio.gather(*waiters) == [("result", True), ("result", False), ("result", False)]
+    assert calls == [1]
+    assert flight.stats() == {"calls": 1, "coalesced": 2, "expired": 0}
+
+    # the next call for the key runs again
+    assert await flight.run("k", fn) == ("result", True)
+    assert calls == [1, 1]
+    assert flight.inflight == 0
+
+
+@pytest.mark.asyncio
+async def test_single_flight_shares_errors():
+    flight = SingleFlight()
+
+    async def fn():
+        await asyncio.sleep(0.01)
+        raise ValueError("bad input")
+
+    results = await asyncio.gather(flight.run("k", fn), flight.run("k", fn), return_exceptions=True)
+    assert [str(r) for r in results] == ["bad input", "bad input"]
+
+
+@pytest.mark.asyncio
+async def test_single_flight_cancels_once_every_caller_is_gone():
+    flight = SingleFlight()
+    cancelled = asyncio.Event()
+
+    async def fn():
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            cancelled.set()
+            raise
+
+    first = asyncio.ensure_future(flight.run("k", fn))
+    second = asyncio.ensure_future(flight.run("k", fn))
+    await asyncio.sleep(0)
+    first.cancel()
+    await asyncio.sleep(0.01)
+    assert not cancelled.is_set()
+
+    second.cancel()
+    await asyncio.wait_for(cancelled.wait(), 1)
+
+
+@pytest.mark.asyncio
+async def test_single_flight_follower_deadline():
+    flight = SingleFlight()
+    release = asyncio.Event()
+
+    async def fn():
+        await release.wait()
+        return "late"
+
+    leader = asyncio.ensure_future(flight.run("k", fn))
+    await asyncio.sleep(0)
+    with pytest.raises(DeadlineExceeded):
+        await flight.run("k", fn, deadline=asyncio.get_running_loop().time() + 0.01)
+    assert flight.stats()["expired"] == 1
+
+    release.set()
+    assert await leader == ("late", True)
+
+
+@pytest.mark.asyncio
+async def test_single_flight_leader_deadline_does_not_fail_the_others():
+    flight = SingleFlight()
+    cancellations = CancellationStats()
+    release = asyncio.Event()
+
+    async def fn():
+        await release.wait()
+        return "late"
+
+    now = asyncio.get_running_loop().time()
+    leader = asyncio.ensure_future(flight.run("k", fn, deadline=now + 0.01, cancellations=cancellations))
+    follower = asyncio.ensure_future(flight.run("k", fn, cancellations=cancellations))
+    with pytest.raises(DeadlineExceeded):
+        await leader
+    assert not follower.done()
+
+    release.set()
+    assert await follower == ("late", False)
+    assert flight.stats()["expired"] == 1
+    assert cancellations.stats() == {"expired": 0, "deadline": 0, "disconnected": 0}
+
+    # the last caller to give up cancels the call and counts it
+    lone = asyncio.ensure_future(flight.run("k", asyncio.Event().wait, deadline=now, cancellations=cancellations))
+    with pytest.raises(DeadlineExceeded):
+        await lone
+    assert cancellations.stats() == {"expired": 0, "deadline": 1, "disconnected": 0}
+
+
+@pytest.mark.asyncio
+async def test_identical_requests_share_a_prediction(custom_settings):
+    release = asyncio.Event()
+    calls = []
+
+    async def predict_fn(text: str):
+        calls.append(text)
+        await release.wait()
+        return {"text": text}
+
+    custom_settings.COALESCE_REQUESTS = True
+    app = create_app(name="svc-coalesce", config=custom_settings, predict_fn=predict_fn, modelinfo_fn=lambda: "m", request_parser=lambda x: x)
+    c = app.test_client()
+
+    requests = [asyncio.ensure_future(c.post("/", json={"text": "same"})) for _ in range(3)]
+    requests.append(asyncio.ensure_future(c.post("/", json={"text": "other"})))
+    for _ in range(100):
+        if len(calls) == 2:
+            break
+        await asyncio.sleep(0.01)
+    release.set()
+    responses = await asyncio.gather(*requests)
+
+    assert sorted(calls) == ["other", "same"]
+    assert [await r.get_json() for r in responses] == [{"text": "same"}] * 3 + [{"text": "other"}]
+    assert sorted(r.headers.get("X-Coalesced", "0") for r in responses[:3]) == ["0", "1", "1"]
+
+    metrics = await (await c.get("/metrics")).get_data(as_text=True)
+    assert 'taranis_bot_coalescing_total{stat="calls"} 2' in metrics
+    assert 'taranis_bot_coalescing_total{stat="coalesced"} 2' in metrics
+
+
+@pytest.mark.asyncio
+async def test_impatient_request_does_not_fail_identical_ones(custom_settings):
+    async def predict_fn(text: str):
+        await asyncio.sleep(0.3)
+        return {"text": text}
+
+    custom_settings.COALESCE_REQUESTS = True
+    app = create_app(name="svc-patience", config=custom_settings, predict_fn=predict_fn, modelinfo_fn=lambda: "m", request_parser=lambda x: x)
+    c = app.test_client()
+
+    impatient = asyncio.ensure_future(c.post("/", json={"text": "same"}, headers={"X-Request-Timeout": "0.1"}))
+    await asyncio.sleep(0.02)
+    patient = asyncio.ensure_future(c.post("/", json={"text": "same"}))
+    impatient, patient = await asyncio.gather(impatient, patient)
+
+    assert impatient.status_code == 504
+    assert patient.status_code == 200
+    assert await patient.get_json() == {"text": "same"}
+    assert patient.headers["X-Coalesced"] == "1"
+    health = await (await c.get("/health")).get_json()
+    assert health["cancelled"] == {"expired": 0, "deadline": 0, "disconnected": 0}
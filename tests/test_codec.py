@@ -0,0 +1,152 @@
+import dataclasses
+import decimal
+import gzip
+import datetime
+import json
+import uuid
+
+import pytest
+from quart import Quart
+
+from taranis_base_bot import codec, create_app
+from taranis_base_bot.codec import FastJSONProvider
+
+
+@dataclasses.dataclass
+class Label:
+    name: str
+    score: float
+
+
+@pytest.fixture(params=["orjson", "stdlib"])
+def provider(request, monkeypatch):
+    if request.param == "stdlib":
+        monkeypatch.setattr(codec, "orjson", None)
+    elif codec.orjson is None:
+        pytest.skip("orjson is not installed")
+    yield FastJSONProvider(Quart(__name__))
+
+
+def test_provider_serializes_dataclasses_and_datetimes(provider):
+    obj = {"label": Label("news", 0.5), "at": datetime.datetime(2024, 1, 2, 3, 4, 5), 1: "int key"}
+    assert json.loads(provider.dumpb(obj)) == {"label": {"name": "news", "score": 0.5}, "at": "2024-01-02T03:04:05", "1": "int key"}
+    assert provider.loads(provider.dumps(obj)) == json.loads(provider.dumpb(obj))
+
+
+def test_provider_serializes_numpy(provider):
+    np = pytest.importorskip("numpy")
+    obj = {"embedding": np.arange(3, dtype=np.float32), "score": np.float64(0.25), "count": np.int64(2)}
+    assert json.loads(provider.dumpb(obj)) == {"embedding": [0.0, 1.0, 2.0], "score": 0.25, "count": 2}
+
+
+def test_provider_handles_big_integers(provider):
+    assert provider.dumpb({"n": 2**70}) == b'{"n":1180591620717411303424}'
+
+
+def test_provider_serializes_decimals_and_uuids(provider):
+    obj = {"price": decimal.Decimal("1.10"), "id": uuid.UUID(int=1)}
+    assert json.loads(provider.dumpb(obj)) == {"price": "1.10", "id": "00000000-0000-0000-0000-000000000001"}
+    with pytest.raises(TypeError, match="not JSON serializable"):
+        provider.dumpb({"value": object()})
+
+
+@pytest.mark.asyncio
+async def test_app_returns_numpy_results(custom_settings):
+    np = pytest.importorskip("numpy")
+
+    async def predict_fn(**kwargs):
+        return {"scores": np.array([0.5, 0.25])}
+
+    app = create_app(name="svc-numpy", config=custom_settings, predict_fn=predict_fn, modelinfo_fn=lambda: "m", request_parser=lambda x: x)
+    async with app.test_client() as c:
+        r = await c.post("/", json={"text": "numpy"})
+        assert r.status_code == 200
+        assert await r.get_json() == {"scores": [0.5, 0.25]}
+
+
+@pytest.fixture
+def echo_app(custom_settings):
+    async def predict_fn(**kwargs):
+        return kwargs
+
+    return create_app(
+        name="svc-encodings", config=custom_settings, predict_fn=predict_fn, modelinfo_fn=lambda: "m", request_parser=lambda x: x
+    )
+
+
+@pytest.mark.parametrize("coding", ["gzip", "deflate", "zstd"])
+@pytest.mark.asyncio
+async def test_compressed_request_bodies(echo_app, coding):
+    if coding == "zstd":
+        pytest.importorskip("zstandard")
+    body = codec.compress(json.dumps({"text": "compressed"}).encode(), coding)
+    async with echo_app.test_client() as c:
+        r = await c.post("/", data=body, headers={"Content-Type": "application/json", "Content-Encoding": coding})
+        assert await r.get_json() == {"text": "compressed"}
+
+        body = codec.compress(json.dumps([{"text": "a"}]).encode(), coding)
+        r = await c.post("/batch", data=body, headers={"Content-Type": "application/json", "Content-Encoding": coding})
+        assert await r.get_data() == b'{"index":0,"result":{"text":"a"}}\n'
+
+
+@pytest.mark.asyncio
+async def test_undecodable_request_bodies(echo_app):
+    async with echo_app.test_client() as c:
+        r = await c.post("/", data=b"{}", headers={"Content-Type": "application/json", "Content-Encoding": "br"})
+        assert r.status_code == 415
+        assert "Unsupported Content-Encoding 'br'" in (await r.get_json())["error"]
+
+        r = await c.post("/", data=b"not gzip", headers={"Content-Type": "application/json", "Content-Encoding": "gzip"})
+        assert r.status_code == 400
+        assert (await r.get_json())["error"].startswith("Could not decode payload: Invalid gzip body")
+
+
+@pytest.mark.asyncio
+async def test_responses_are_compressed_when_accepted(echo_app):
+    text = "long article " * 200
+    async with echo_app.test_client() as c:
+        r = await c.post("/", json={"text": text}, headers={"Accept-Encoding": "gzip"})
+        assert r.headers["Content-Encoding"] == "gzip"
+        assert "Accept-Encoding" in r.headers["Vary"]
+        assert json.loads(gzip.decompress(await r.get_data())) == {"text": text}
+
+        r = await c.post("/", json={"text": "short"}, headers={"Accept-Encoding": "gzip"})
+        assert "Content-Encoding" not in r.headers
+        r = await c.post("/", json={"text": text})
+        assert "Content-Encoding" not in r.headers
+
+        r = await c.post("/batch", json=[{"text": "a"}, {"text": "b"}], headers={"Accept-Encoding": "gzip"})
+        assert r.headers["Content-Encoding"] == "gzip"
+        lines = sorted(gzip.decompress(await r.get_data()).splitlines())
+        assert lines == [b'{"index":0,"result":{"text":"a"}}', b'{"index":1,"result":{"text":"b"}}']
+
+
+@pytest.mark.asyncio
+async def test_binary_formats_fall_back_without_their_package(echo_app, monkeypatch):
+    monkeypatch.setattr(codec, "_optional", lambda name: None)
+    assert codec.media_types() == [codec.JSON]
+    assert codec.content_codings() == ["gzip", "deflate"]
+    async with echo_app.test_client() as c:
+        r = await c.post("/", data=b"\x81\xa4text\xa1x", headers={"Content-Type": "application/msgpack"})
+        assert r.status_code == 415
+        r = await c.post("/", json={"text": "x"}, headers={"Accept": "application/msgpack"})
+        assert r.mimetype == "application/json"
+
+
+@pytest.mark.parametrize("media_type,module", [("application/msgpack", "msgpack"), ("application/cbor", "cbor2")])
+@pytest.mark.asyncio
+async def test_binary_formats(echo_app, media_type, module):
+    pytest.importorskip(module)
+    encode = codec.body_encoder(media_type)
+    decode = codec.body_decoder(media_type)
+    async with echo_app.test_client() as c:
+        r = await c.post("/", data=encode({"text": "binary"}), headers={"Content-Type": media_type, "Accept": media_type})
+        assert r.mimetype == media_type
+        assert decode(await r.get_data()) == {"text": "binary"}
+
+        r = await c.post("/batch", data=encode([{"text": "a"}]), headers={"Content-Type": media_type, "Accept": media_type})
+        assert decode(await r.get_data()) == {"index": 0, "result": {"text": "a"}}
+
+        # cached per format
+        r = await c.post("/", json={"text": "binary"})
+        assert await r.get_json() == {"text": "binary"}
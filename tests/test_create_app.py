@@ -57,7 +57,7 @@ async def test_url_prefix_routes(custom_settings, fake_pkg, hf_modelinfo_mock):
         r1 = await c.get("/v1/health")
         assert r1.status_code == 200
         data = await r1.get_json()
-        assert data == {"status": "ok"}
+        assert data == {"status": "ok", "inflight": 0, "queued": 0, "cancelled": {"expired": 0, "deadline": 0, "disconnected": 0}}
 
         r2 = await c.get("/v1/modelinfo")
         assert r2.status_code == 200
@@ -0,0 +1,116 @@
+import asyncio
+import time
+
+import pytest
+
+from taranis_base_bot import create_app
+from taranis_base_bot.deadlines import request_deadline
+
+
+@pytest.mark.asyncio
+async def test_request_deadline_takes_the_earliest_limit():
+    now = asyncio.get_running_loop().time()
+    assert request_deadline({}) is None
+    assert request_deadline({}, default_timeout=10) == pytest.approx(now + 10, abs=0.5)
+    assert request_deadline({"X-Request-Timeout": "2"}, default_timeout=10) == pytest.approx(now + 2, abs=0.5)
+    assert request_deadline({"X-Request-Deadline": str(time.time() + 1)}, default_timeout=10) == pytest.approx(now + 1, abs=0.5)
+    with pytest.raises(ValueError, match="Invalid X-Request-Timeout header 'soon'"):
+        request_deadline({"X-Request-Timeout": "soon"})
+    for value in ("nan", "inf", "-inf"):
+        with pytest.raises(ValueError, match="Invalid X-Request-Deadline header"):
+            request_deadline({"X-Request-Deadline": value})
+
+
+def create_slow_app(custom_settings, started: asyncio.Event, cancelled: list):
+    custom_settings.CACHE_TYPE = "NullCache"
+
+    async def predict_fn(**kwargs):
+        started.set()
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            cancelled.append(kwargs)
+            raise
+        return kwargs
+
+    return create_app(
+        name="svc-deadline", config=custom_settings, predict_fn=predict_fn, modelinfo_fn=lambda: "m", request_parser=lambda x: x
+    )
+
+
+async def cancellation_stats(c) -> dict:
+    return (await (await c.get("/health")).get_json())["cancelled"]
+
+
+@pytest.mark.asyncio
+async def test_prediction_is_cancelled_at_the_deadline(custom_settings):
+    cancelled = []
+    app = create_slow_app(custom_settings, asyncio.Event(), cancelled)
+    async with app.test_client() as c:
+        r = await c.post("/", json={"text": "slow"}, headers={"X-Request-Timeout": "0.05"})
+        assert r.status_code == 504
+        assert cancelled == [{"text": "slow"}]
+        assert await cancellation_stats(c) == {"expired": 0, "deadline": 1, "disconnected": 0}
+
+        r = await c.post("/", json={"text": "late"}, headers={"X-Request-Deadline": str(time.time() - 1)})
+        assert r.status_code == 504
+        assert await cancellation_stats(c) == {"expired": 1, "deadline": 1, "disconnected": 0}
+
+        r = await c.post("/", json={"text": "x"}, headers={"X-Request-Timeout": "soon"})
+        assert r.status_code == 400
+        r = await c.post("/", json={"text": "x"}, headers={"X-Request-Timeout": "nan"})
+        assert r.status_code == 400
+
+
+@pytest.mark.asyncio
+async def test_queued_request_expires_without_running(custom_settings):
+    custom_settings.MAX_INFLIGHT = 1
+    started = asyncio.Event()
+    cancelled = []
+    app = create_slow_app(custom_settings, started, cancelled)
+    async with app.test_client() as c:
+        busy = asyncio.create_task(c.post("/", json={"text": "busy"}))
+        await started.wait()
+        r = await c.post("/", json={"text": "queued"}, headers={"X-Request-Timeout": "0.05"})
+        assert r.status_code == 504
+        assert await cancellation_stats(c) == {"expired": 1, "deadline": 0, "disconnected": 0}
+        busy.cancel()
+
+
+@pytest.mark.asyncio
+async def test_prediction_is_cancelled_on_disconnect(custom_settings):
+    started = asyncio.Event()
+    cancelled = []
+    app = create_slow_app(custom_settings, started, cancelled)
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "POST",
+        "scheme": "http",
+        "path": "/",
+        "raw_path": b"/",
+        "query_string": b"",
+        "root_path": "",
+        "headers": [(b"host", b"localhost"), (b"content-type", b"application/json")],
+        "client": ("127.0.0.1", 1234),
+        "server": ("localhost", 80),
+        "extensions": {},
+    }
+    messages = [{"type": "http.request", "body": b'{"text": "gone"}', "more_body": False}]
+
+    async def receive():
+        if messages:
+            return messages.pop(0)
+        # the client goes away while the prediction runs
+        await started.wait()
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        pass
+
+    async with app.test_app():
+        await app(scope, receive, send)
+        assert cancelled == [{"text": "gone"}]
+        async with app.test_client() as c:
+            assert await cancellation_stats(c) == {"expired": 0, "deadline": 0, "disconnected": 1}
@@ -0,0 +1,103 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from taranis_base_bot import create_app
+from taranis_base_bot.executor import PerThreadModel, create_executor, is_async_callable, run_in_executor
+
+
+def test_is_async_callable():
+    class AsyncCall:
+        async def __call__(self, **kwargs):
+            return kwargs
+
+    async def async_fn():
+        return None
+
+    def sync_fn():
+        return None
+
+    assert is_async_callable(async_fn)
+    assert is_async_callable(AsyncCall())
+    assert not is_async_callable(sync_fn)
+
+
+@pytest.mark.asyncio
+async def test_run_in_executor_runs_off_event_loop():
+    loop_thread = threading.get_ident()
+
+    def predict(text):
+        return {"thread": threading.get_ident(), "text": text}
+
+    async def async_predict(text):
+        return {"thread": threading.get_ident(), "text": text}
+
+    executor = create_executor(1)
+    try:
+        assert (await run_in_executor(predict, executor)(text="a"))["thread"] != loop_thread
+        assert (await run_in_executor(async_predict, executor)(text="b"))["thread"] != loop_thread
+    finally:
+        executor.shutdown()
+
+
+@pytest.mark.asyncio
+async def test_per_thread_model_instances():
+    created = []
+
+    class Model:
+        def __init__(self):
+            created.append(self)
+
+        def predict(self, **kwargs):
+            time.sleep(0.05)
+            return id(self)
+
+    seed = Model()
+    per_thread = PerThreadModel(Model, seed=seed)
+    executor = create_executor(2)
+    try:
+        predict = run_in_executor(per_thread.predict, executor)
+        ids = await asyncio.gather(predict(), predict())
+    finally:
+        executor.shutdown()
+
+    assert len(set(ids)) == 2
+    assert id(seed) in ids
+    assert len(created) == 2
+
+
+@pytest.mark.asyncio
+async def test_sync_predict_fn_does_not_block_health(custom_settings):
+    def predict_fn(**kwargs):
+        time.sleep(0.3)
+        return kwargs
+
+    app = create_app(name="svc-sync", config=custom_settings, predict_fn=predict_fn, modelinfo_fn=lambda: "m", request_parser=lambda x: x)
+    async with app.test_client() as c:
+        predict = asyncio.ensure_future(c.post("/", json={"text": "slow"}))
+        await asyncio.sleep(0.05)
+
+        start = time.perf_counter()
+        health = await c.get("/health")
+        assert health.status_code == 200
+        assert time.perf_counter() - start < 0.2
+
+        r = await predict
+        assert await r.get_json() == {"text": "slow"}
+
+
+@pytest.mark.asyncio
+async def test_create_app_offloads_sync_model(custom_settings, fake_pkg, fake_model):
+    def predict(self, **kwargs):
+        return {"thread": threading.current_thread().name}
+
+    fake_model.predict = predict
+    custom_settings.MODEL_PER_THREAD = True
+
+    app = create_app(name="svc-sync-model", config=custom_settings, method_decorators=[])
+    async with app.test_client() as c:
+        r = await c.post("/", json={"test": "val"})
+        assert r.status_code == 200
+        assert (await r.get_json())["thread"].startswith("predict")
@@ -0,0 +1,244 @@
+import asyncio
+import os
+import threading
+
+import pytest
+
+from taranis_base_bot import create_app
+from taranis_base_bot.lifecycle import ModelNotReady, ModelSlot, watch_file
+
+
+@pytest.mark.asyncio
+async def test_model_slot_warm_up():
+    calls = []
+
+    async def predict_fn(**kwargs):
+        calls.append(kwargs)
+        return kwargs
+
+    slot = ModelSlot(warmup_payloads=[{"text": "warm"}], request_parser=lambda data: {"text": data["text"].upper()})
+    with pytest.raises(ModelNotReady, match="Model is loading"):
+        await slot.predict(text="early")
+
+    slot.set(predict_fn, lambda: "model")
+    assert slot.state == "warming"
+    await slot.start()
+    assert slot.ready
+    assert calls == [{"text": "WARM"}]
+    assert set(slot.status()["phases"]) == {"warmup", "total"}
+    assert await slot.modelinfo() == "model"
+
+
+@pytest.mark.asyncio
+async def test_model_slot_reports_load_failure():
+    def load():
+        raise RuntimeError("weights missing")
+
+    slot = ModelSlot()
+    await slot.start(load=load)
+    assert slot.status() == {"status": "failed", "phases": {}, "error": "weights missing"}
+
+
+@pytest.mark.asyncio
+async def test_background_loading(custom_settings, fake_pkg, monkeypatch):
+    from taranis_base_bot import setup as setup_module
+
+    custom_settings.MODEL_BACKGROUND_LOAD = True
+    custom_settings.HF_MODEL_INFO = False
+    custom_settings.WARMUP_PAYLOADS = [{"text": "warm up"}]
+    release = threading.Event()
+    get_model = setup_module.get_model
+
+    def slow_get_model(config):
+        release.wait(5)
+        return get_model(config)
+
+    monkeypatch.setattr(setup_module, "get_model", slow_get_model)
+    app = create_app(name="svc-background", config=custom_settings, request_parser=lambda x: x, method_decorators=[])
+
+    async with app.test_app() as test_app:
+        c = test_app.test_client()
+        assert (await c.get("/health")).status_code == 200
+        r = await c.get("/ready")
+        assert r.status_code == 503
+        assert (await r.get_json())["status"] == "loading"
+        r = await c.post("/", json={"text": "early"})
+        assert r.status_code == 503
+        assert r.headers["Retry-After"] == "5"
+        assert (await c.get("/modelinfo")).status_code == 503
+
+        release.set()
+        for _ in range(100):
+            r = await c.get("/ready")
+            if r.status_code == 200:
+                break
+            await asyncio.sleep(0.01)
+        data = await r.get_json()
+        assert data["status"] == "ready"
+        assert set(data["phases"]) == {"imports", "config", "blueprint", "load", "setup", "warmup", "total"}
+
+        r = await c.post("/", json={"text": "later"})
+        assert await r.get_json() == {"text": "later"}
+        assert await (await c.get("/modelinfo")).get_json() == custom_settings.MODEL
+
+
+@pytest.mark.asyncio
+async def test_reload_drains_the_previous_model():
+    release = asyncio.Event()
+    closed = []
+
+    async def old_predict(**kwargs):
+        await release.wait()
+        return "old"
+
+    async def new_predict(**kwargs):
+        return "new"
+
+    def install(staged, predict_fn):
+        staged.set(predict_fn, lambda: "new model", closers=[lambda: closed.append("new")])
+
+    slot = ModelSlot(warmup_payloads=[{"text": "warm"}])
+    slot.set(old_predict, lambda: "old model", closers=[lambda: closed.append("old")])
+    slot.state = "ready"
+
+    in_flight = asyncio.ensure_future(slot.predict(text="before"))
+    await asyncio.sleep(0)
+    reload = slot.reload(load=lambda: new_predict, install=install)
+    assert slot.reload(load=lambda: new_predict, install=install) is reload
+    for _ in range(100):
+        if slot.generation:
+            break
+        await asyncio.sleep(0.01)
+
+    assert slot.generation == 1
+    assert await slot.predict(text="after") == "new"
+    assert await slot.modelinfo() == "new model"
+    assert not reload.done()
+    assert closed == []
+
+    release.set()
+    assert await in_flight == "old"
+    await reload
+    assert closed == ["old"]
+    assert slot.status()["reload"] == {"generation": 1, "reloading": False, "error": None}
+
+    await slot.close()
+    assert closed == ["old", "new"]
+
+
+@pytest.mark.asyncio
+async def test_failed_reload_keeps_the_current_model():
+    def load():
+        raise RuntimeError("weights missing")
+
+    slot = ModelSlot()
+    slot.set(lambda **kwargs: "current", lambda: "model")
+    await slot.reload(load=load, install=lambda staged, loaded: None)
+    assert await slot.predict() == "current"
+    assert slot.status()["reload"] == {"generation": 0, "reloading": False, "error": "weights missing"}
+
+
+@pytest.mark.asyncio
+async def test_watch_file(tmp_path):
+    path = tmp_path / "weights.bin"
+    changes = []
+    watcher = asyncio.ensure_future(watch_file(str(path), 0.01, lambda: changes.append(path.exists())))
+    await asyncio.sleep(0.03)
+    path.write_bytes(b"v1")
+    for _ in range(100):
+        if changes:
+            break
+        await asyncio.sleep(0.01)
+    watcher.cancel()
+    assert changes == [True]
+
+
+@pytest.mark.asyncio
+async def test_reload_route(custom_settings, fake_pkg):
+    _, mod = fake_pkg
+    custom_settings.HF_MODEL_INFO = False
+    custom_settings.MODEL_RELOAD_ROUTE = True
+    custom_settings.API_KEY = "secret"
+    custom_settings.CACHE_TYPE = "SimpleCache"
+    app = create_app(name="svc-reload", config=custom_settings, request_parser=lambda x: x, method_decorators=[])
+    auth = {"Authorization": "Bearer secret"}
+
+    async with app.test_app() as test_app:
+        c = test_app.test_client()
+        await app.extensions["model_slot"].wait_ready()
+        assert await (await c.post("/", json={"text": "a"}, headers=auth)).get_json() == {"text": "a"}
+        assert (await c.post("/", json={"text": "a"}, headers=auth)).headers["X-Cache"] == "HIT"
+
+        class FakeModel:
+            model_name = custom_settings.MODEL
+
+            async def predict(self, **kwargs):
+                return {"reloaded": True, **kwargs}
+
+        mod.FakeModel = FakeModel
+        r = await c.post("/admin/reload?wait=true", headers=auth)
+        assert r.status_code == 200
+        assert (await r.get_json())["reload"]["generation"] == 1
+
+        r = await c.post("/", json={"text": "a"}, headers=auth)
+        assert r.headers["X-Cache"] == "MISS"
+        assert await r.get_json() == {"reloaded": True, "text": "a"}
+
+        del mod.FakeModel
+        r = await c.post("/admin/reload?wait=true", headers=auth)
+        assert r.status_code == 500
+        assert "has no class named FakeModel" in (await r.get_json())["reload"]["error"]
+        assert await (await c.post("/", json={"text": "b"}, headers=auth)).get_json() == {"reloaded": True, "text": "b"}
+
+
+@pytest.mark.asyncio
+async def test_results_of_a_replaced_model_are_not_served(custom_settings, fake_pkg, tmp_path):
+    _, mod = fake_pkg
+    weights = tmp_path / "weights.bin"
+    weights.write_bytes(b"v0")
+    release = asyncio.Event()
+
+    class SlowModel:
+        model_name = custom_settings.MODEL
+
+        async def predict(self, **kwargs):
+            await release.wait()
+            return {"model": "old", **kwargs}
+
+    mod.FakeModel = SlowModel
+    custom_settings.HF_MODEL_INFO = False
+    custom_settings.MODEL_RELOAD_ROUTE = True
+    custom_settings.MODEL_RELOAD_WATCH = str(weights)
+    custom_settings.MODEL_RELOAD_POLL_SECONDS = 3600
+    custom_settings.API_KEY = "secret"
+    custom_settings.CACHE_TYPE = "SimpleCache"
+    app = create_app(name="svc-reload-cache", config=custom_settings, request_parser=lambda x: x, method_decorators=[])
+    slot = app.extensions["model_slot"]
+    assert slot.model_version == str(weights.stat().st_mtime_ns)
+
+    async with app.test_app() as test_app:
+        c = test_app.test_client()
+        await slot.wait_ready()
+        inflight = asyncio.ensure_future(c.post("/", json={"text": "a"}, headers={"Authorization": "Bearer secret"}))
+        await asyncio.sleep(0.01)
+
+        class NewModel:
+            model_name = custom_settings.MODEL
+
+            async def predict(self, **kwargs):
+                return {"model": "new", **kwargs}
+
+        mod.FakeModel = NewModel
+        weights.write_bytes(b"v1")
+        os.utime(weights, ns=(0, weights.stat().st_mtime_ns + 1_000_000))
+        assert (await c.post("/admin/reload", headers={"Authorization": "Bearer secret"})).status_code == 202
+        while not slot.generation:
+            await asyncio.sleep(0.01)
+        assert slot.model_version == str(weights.stat().st_mtime_ns)
+
+        # the old model finishes after the swap, its result is cached for its own version only
+        release.set()
+        assert await (await inflight).get_json() == {"model": "old", "text": "a"}
+        r = await c.post("/", json={"text": "a"}, headers={"Authorization": "Bearer secret"})
+        assert r.headers["X-Cache"] == "MISS"
+        assert await r.get_json() == {"model": "new", "text": "a"}
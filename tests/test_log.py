@@ -0,0 +1,44 @@
+import logging
+import logging.handlers
+
+from taranis_base_bot.log import TaranisBotLogger, TaranisLogFormatter, Truncated
+
+
+class CountingStr:
+    def __init__(self):
+        self.calls = 0
+
+    def __str__(self):
+        self.calls += 1
+        return "value"
+
+
+def test_logger_uses_queue_handler():
+    bot_logger = TaranisBotLogger()
+    assert [type(h) for h in bot_logger.logger.handlers] == [logging.handlers.QueueHandler]
+    assert bot_logger._listener is not None
+
+
+def test_debug_arguments_are_not_formatted_when_disabled():
+    bot_logger = TaranisBotLogger(debug=False)
+    value = CountingStr()
+    bot_logger.debug("Payload: %s", bot_logger.truncate(value))
+    assert value.calls == 0
+
+    bot_logger = TaranisBotLogger(debug=True)
+    bot_logger.debug("Payload: %s", bot_logger.truncate(value))
+    assert value.calls == 1
+
+
+def test_truncated():
+    assert str(Truncated("short", 10)) == "short"
+    assert str(Truncated("line\r\nbreak", 20)) == "linebreak"
+    assert str(Truncated("x" * 15, 10)) == "xxxxxxxxxx... [5 more characters]"
+
+
+def test_formatter_reuses_formatters():
+    formatter = TaranisLogFormatter()
+    cached = dict(formatter._formatters)
+    record = logging.LogRecord("test", logging.WARNING, __file__, 1, "hello %s", ("world",), None)
+    assert "hello world" in formatter.format(record)
+    assert formatter._formatters == cached
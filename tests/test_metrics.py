@@ -0,0 +1,56 @@
+import pytest
+
+from taranis_base_bot import create_app
+from taranis_base_bot.metrics import BotMetrics, Counter, Histogram, MetricsRegistry
+
+
+def test_counter_and_histogram_exposition():
+    registry = MetricsRegistry()
+    counter = registry.register(Counter("requests_total", "Requests", ("status",)))
+    histogram = registry.register(Histogram("latency_seconds", "Latency", buckets=(0.1, 1.0), labelnames=("stage",)))
+    counter.inc("200")
+    counter.inc("200")
+    histogram.observe(0.05, "predict")
+    histogram.observe(0.5, "predict")
+    histogram.observe(5, "predict")
+
+    lines = registry.render().splitlines()
+    assert "# TYPE requests_total counter" in lines
+    assert 'requests_total{status="200"} 2' in lines
+    assert 'latency_seconds_bucket{stage="predict",le="0.1"} 1' in lines
+    assert 'latency_seconds_bucket{stage="predict",le="1"} 2' in lines
+    assert 'latency_seconds_bucket{stage="predict",le="+Inf"} 3' in lines
+    assert 'latency_seconds_sum{stage="predict"} 5.55' in lines
+    assert 'latency_seconds_count{stage="predict"} 3' in lines
+
+
+def test_bot_metrics_reads_gauges_at_scrape_time():
+    metrics = BotMetrics()
+    assert "process_resident_memory_bytes" in metrics.render()
+
+
+@pytest.mark.asyncio
+async def test_metrics_route(custom_settings):
+    async def predict_fn(**kwargs):
+        return kwargs
+
+    custom_settings.CACHE_TYPE = "SimpleCache"
+    app = create_app(
+        name="taranis_base_bot", config=custom_settings, predict_fn=predict_fn, modelinfo_fn=lambda: "m", request_parser=lambda x: x
+    )
+    client = app.test_client()
+    await client.post("/", json={"text": "hello"})
+    await client.post("/", json="not a dict")
+
+    response = await client.get("/metrics")
+    assert response.status_code == 200
+    assert response.content_type.startswith("text/plain; version=0.0.4")
+    body = (await response.get_data()).decode()
+    assert 'taranis_bot_requests_total{endpoint="taranis_base_bot.taranis_base_bot_predict",status="200"} 1' in body
+    assert 'taranis_bot_requests_total{endpoint="taranis_base_bot.taranis_base_bot_predict",status="400"} 1' in body
+    for stage in ("decode", "parse", "predict", "serialize"):
+        assert f'taranis_bot_stage_seconds_count{{stage="{stage}"}}' in body
+    assert 'taranis_bot_payload_bytes_count{direction="request"} 2' in body
+    assert "taranis_bot_inflight 0" in body
+    assert 'taranis_bot_cancelled_total{reason="deadline"} 0' in body
+    assert 'taranis_bot_cache{stat="misses"} 1' in body
@@ -1,6 +1,10 @@
+import asyncio
+import json
+
+import httpx
 import pytest
 import respx
-from taranis_base_bot.misc import create_request_parser, get_hf_modelinfo
+from taranis_base_bot.misc import HFModelInfoCache, create_request_parser, get_hf_modelinfo
 
 
 def test_create_request_parser_success():
@@ -79,6 +83,47 @@ def test_create_request_parser_empty_list_also_rejected():
     assert str(ei.value) == "No data provided for 'items' key!"
 
 
+def test_create_request_parser_nested_object():
+    parser = create_request_parser(
+        {"article": {"type": "dict", "properties": {"title": {"type": "str"}, "lang": {"type": "str", "required": False}}}}
+    )
+    assert parser({"article": {"title": "t", "extra": 1}}) == {"article": {"title": "t"}}
+    with pytest.raises(ValueError) as ei:
+        parser({"article": {"title": 1}})
+    assert str(ei.value) == "Data for 'article.title' is not of type 'str'"
+    with pytest.raises(ValueError) as ei:
+        parser({"article": {"lang": "en"}})
+    assert str(ei.value) == "Payload does not contain 'article.title' key!"
+
+
+def test_create_request_parser_list_items():
+    parser = create_request_parser({"texts": {"type": "list", "items": {"type": "str", "max_length": 5}}})
+    assert parser({"texts": ["a", "b"]}) == {"texts": ["a", "b"]}
+    with pytest.raises(ValueError) as ei:
+        parser({"texts": ["a", 2]})
+    assert str(ei.value) == "Data for 'texts[]' is not of type 'str'"
+    with pytest.raises(ValueError) as ei:
+        parser({"texts": ["too long"]})
+    assert str(ei.value) == "Data for 'texts[]' is longer than 5"
+
+
+def test_create_request_parser_length_limits():
+    parser = create_request_parser({"text": {"type": "str", "min_length": 2, "max_length": 4}, "items": {"type": "list", "max_length": 1}})
+    assert parser({"text": "abc", "items": [1]}) == {"text": "abc", "items": [1]}
+    with pytest.raises(ValueError, match="'text' is longer than 4"):
+        parser({"text": "abcde", "items": [1]})
+    with pytest.raises(ValueError, match="'text' is shorter than 2"):
+        parser({"text": "a", "items": [1]})
+    with pytest.raises(ValueError, match="'items' is longer than 1"):
+        parser({"text": "abc", "items": [1, 2]})
+
+
+def test_create_request_parser_unknown_type():
+    with pytest.raises(ValueError) as ei:
+        create_request_parser({"text": {"type": "strng"}})
+    assert str(ei.value) == "Unknown type 'strng' for 'text' in payload schema"
+
+
 @pytest.mark.asyncio
 async def test_get_hf_modelinfo_http_error():
     model_name = "missing-model"
@@ -106,3 +151,74 @@ async def test_get_hf_modelinfo_exception_returns_fallback():
 
     assert out["model"] == model_name
     assert out["error"] == "Fail!"
+
+
+@pytest.mark.asyncio
+async def test_hf_modelinfo_cache_serves_stale_and_refreshes(monkeypatch):
+    model_name = "cached-model"
+    now = [1000.0]
+    monkeypatch.setattr("taranis_base_bot.misc.time.monotonic", lambda: now[0])
+    cache = HFModelInfoCache(model_name, ttl=10)
+
+    with respx.mock(base_url="https://huggingface.co") as mock:
+        route = mock.get(f"/api/models/{model_name}")
+        route.respond(status_code=200, json={"version": 1})
+        assert await cache() == {"version": 1}
+        assert await cache() == {"version": 1}
+        assert route.call_count == 1
+
+        route.respond(status_code=200, json={"version": 2})
+        now[0] += 11
+        assert await cache() == {"version": 1}
+        await asyncio.sleep(0)
+        await cache._refresh_task
+        assert await cache() == {"version": 2}
+        assert route.call_count == 2
+
+        route.mock(side_effect=RuntimeError("hub down"))
+        now[0] += 11
+        await cache()
+        await cache._refresh_task
+        assert await cache() == {"version": 2}
+    await cache.close()
+
+
+@pytest.mark.asyncio
+async def test_hf_modelinfo_cache_fetches_once_on_a_cold_start():
+    model_name = "cold-model"
+    cache = HFModelInfoCache(model_name)
+
+    with respx.mock(base_url="https://huggingface.co") as mock:
+        route = mock.get(f"/api/models/{model_name}")
+
+        async def slow_response(request):
+            await asyncio.sleep(0.01)
+            return httpx.Response(200, json={"version": 1})
+
+        route.side_effect = slow_response
+        assert await asyncio.gather(*(cache() for _ in range(5))) == [{"version": 1}] * 5
+        assert route.call_count == 1
+    await cache.close()
+
+
+@pytest.mark.asyncio
+async def test_hf_modelinfo_cache_snapshot(tmp_path):
+    model_name = "snapshot-model"
+    snapshot = tmp_path / "modelinfo.json"
+
+    with respx.mock(base_url="https://huggingface.co") as mock:
+        mock.get(f"/api/models/{model_name}").respond(status_code=200, json={"model": model_name})
+        cache = HFModelInfoCache(model_name, snapshot_path=str(snapshot))
+        await cache()
+        await cache.close()
+    assert json.loads(snapshot.read_text()) == {"model": model_name}
+
+    offline = HFModelInfoCache(model_name, snapshot_path=str(snapshot), offline=True)
+    assert await offline() == {"model": model_name}
+
+    missing = HFModelInfoCache(model_name, snapshot_path=str(tmp_path / "missing.json"), offline=True)
+    assert "error" in await missing()
+
+    # the snapshot of another model is not served
+    other = HFModelInfoCache("other-model", snapshot_path=str(snapshot), offline=True)
+    assert "error" in await other()
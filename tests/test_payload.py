@@ -0,0 +1,129 @@
+import json
+import random
+
+import pytest
+
+from taranis_base_bot import codec, create_app
+from taranis_base_bot.payload import JSONArrayParser, NotAJSONArray
+
+
+@pytest.mark.parametrize(
+    "items",
+    [[], [1], [{"text": 'a, "quoted" ] {bracket}\\'}, [1, [2, {"b": []}]], None, True, 1.5, "é"], [[]], [{}], ["\\"]],
+)
+def test_json_array_parser_splits_items_across_chunks(items):
+    raw = json.dumps(items, ensure_ascii=False).encode()
+    rng = random.Random(0)
+    for _ in range(50):
+        cuts = sorted(rng.sample(range(len(raw) + 1), min(len(raw) + 1, 5)))
+        parser = JSONArrayParser(json.loads)
+        parsed = []
+        for start, end in zip([0, *cuts], [*cuts, len(raw)]):
+            parsed += parser.feed(raw[start:end])
+        parser.close()
+        assert parsed == items
+
+
+@pytest.mark.parametrize("raw", [b"[1,]", b"[,1]", b"[1 2]", b"[1}", b"[1] x", b"[1"])
+def test_json_array_parser_rejects_invalid_arrays(raw):
+    parser = JSONArrayParser(json.loads)
+    with pytest.raises(ValueError):
+        parser.feed(raw)
+        parser.close()
+
+
+def test_json_array_parser_rejects_other_documents():
+    with pytest.raises(NotAJSONArray):
+        JSONArrayParser(json.loads).feed(b' {"text": "a"}')
+
+
+@pytest.fixture
+def limited_app(custom_settings):
+    calls = []
+
+    async def predict_fn(**kwargs):
+        calls.append(kwargs)
+        return kwargs
+
+    custom_settings.MAX_BODY_BYTES = 100
+    custom_settings.BULK_MAX_BODY_BYTES = 1000
+    custom_settings.BULK_MAX_ITEMS = 5
+    app = create_app(name="svc-limits", config=custom_settings, predict_fn=predict_fn, modelinfo_fn=lambda: "m", request_parser=lambda x: x)
+    app.extensions["calls"] = calls
+    return app
+
+
+@pytest.mark.asyncio
+async def test_oversized_bodies_are_rejected_before_predicting(limited_app):
+    async with limited_app.test_client() as c:
+        r = await c.post("/", json={"text": "x" * 200})
+        assert r.status_code == 413
+        assert (await r.get_json())["error"] == "Payload must not be larger than 100 bytes"
+
+        # the limit applies to the decoded body as well
+        body = codec.compress(json.dumps({"text": "x" * 200}).encode(), "gzip")
+        assert len(body) < 100
+        r = await c.post("/", data=body, headers={"Content-Type": "application/json", "Content-Encoding": "gzip"})
+        assert r.status_code == 413
+
+        r = await c.post("/", json={"text": "small"})
+        assert await r.get_json() == {"text": "small"}
+
+        # "/batch" has its own limit
+        r = await c.post("/batch", json=[{"text": "x" * 50}, {"text": "y" * 50}])
+        assert r.status_code == 200
+        r = await c.post("/batch", json=[{"text": "x" * 500}, {"text": "y" * 500}])
+        assert r.status_code == 413
+
+    assert [call["text"] for call in limited_app.extensions["calls"]] == ["small", "x" * 50, "y" * 50]
+
+
+@pytest.mark.asyncio
+async def test_bulk_payload_errors(limited_app):
+    async with limited_app.test_client() as c:
+        r = await c.post("/batch", json=[{"text": str(i)} for i in range(10)])
+        assert r.status_code == 400
+        assert (await r.get_json())["error"] == "Payload must not contain more than 5 items!"
+
+        r = await c.post("/batch", json={"text": "a"})
+        assert (await r.get_json())["error"] == "Payload must be a list!"
+
+        r = await c.post("/batch", data=b'[{"text": "a"}, {"text": ', headers={"Content-Type": "application/json"})
+        assert r.status_code == 400
+        assert (await r.get_json())["error"] == "Could not decode payload: Incomplete JSON array"
+
+    assert limited_app.extensions["calls"] == []
+
+
+@pytest.mark.parametrize("coding", ["gzip", "deflate", "zstd"])
+def test_decompression_stops_at_the_limit(coding):
+    if coding == "zstd":
+        zstandard = pytest.importorskip("zstandard")
+        compressor = zstandard.ZstdCompressor().compressobj()
+        # streamed, so the frame does not record its size: 64 MiB of zeros
+        bomb = b"".join(compressor.compress(bytes(1 << 24)) for _ in range(4)) + compressor.flush()
+    else:
+        bomb = codec.compress(bytes(1 << 26), coding)
+    decoder = codec.Decompressor(coding, max_size=1 << 20)
+    with pytest.raises(codec.PayloadTooLarge):
+        for start in range(0, len(bomb), 65536):
+            decoder.decompress(bomb[start : start + 65536])
+        for _ in decoder.finish():
+            pass
+    assert decoder._size <= (1 << 20) + codec.Decompressor.READ_SIZE
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("max_body_bytes, bulk_max_body_bytes", [(32 << 20, 0), (0, 1000), (32 << 20, 64 << 20)])
+async def test_body_limits_above_the_quart_default(custom_settings, max_body_bytes, bulk_max_body_bytes):
+    async def predict_fn(**kwargs):
+        return {"length": len(kwargs["text"])}
+
+    custom_settings.MAX_BODY_BYTES = max_body_bytes
+    custom_settings.BULK_MAX_BODY_BYTES = bulk_max_body_bytes
+    app = create_app(name="svc-big", config=custom_settings, predict_fn=predict_fn, modelinfo_fn=lambda: "m", request_parser=lambda x: x)
+    async with app.test_client() as c:
+        # larger than Quart's default MAX_CONTENT_LENGTH of 16 MiB
+        r = await c.post("/", json={"text": "x" * (20 << 20)})
+        assert r.status_code == 200
+        assert await r.get_json() == {"length": 20 << 20}
@@ -0,0 +1,91 @@
+import gc
+import os
+import signal
+import socket
+import subprocess
+import sys
+import textwrap
+import time
+
+import httpx
+import pytest
+
+from taranis_base_bot.preload import load_app, memory_report
+
+APP_MODULE = textwrap.dedent(
+    """
+    from taranis_base_bot import create_app
+    from taranis_base_bot.config import CommonSettings
+
+
+    class Settings(CommonSettings):
+        MODEL: str = "preloaded"
+
+
+    async def predict_fn(**kwargs):
+        return kwargs
+
+
+    app = create_app(
+        name="preloaded_bot", config=Settings(), predict_fn=predict_fn, modelinfo_fn=lambda: "preloaded", request_parser=lambda x: x
+    )
+    """
+)
+
+
+@pytest.fixture
+def app_module(tmp_path, monkeypatch):
+    (tmp_path / "preloaded_bot.py").write_text(APP_MODULE)
+    monkeypatch.syspath_prepend(str(tmp_path))
+    yield tmp_path
+    sys.modules.pop("preloaded_bot", None)
+
+
+@pytest.mark.skipif(not os.path.exists("/proc/self/smaps_rollup"), reason="needs /proc/self/smaps_rollup")
+def test_memory_report():
+    report = memory_report()
+    assert report["rss_kb"] > 0
+    assert report["shared_kb"] + report["private_kb"] == report["rss_kb"]
+
+
+def test_load_app_freezes_heap(app_module):
+    try:
+        app = load_app("preloaded_bot:app")
+        assert app.name
+        assert gc.get_freeze_count() > 0
+    finally:
+        gc.unfreeze()
+
+
+def test_load_app_rejects_non_quart_target(app_module):
+    with pytest.raises(TypeError, match="is not a Quart app"):
+        load_app("preloaded_bot:predict_fn")
+    gc.unfreeze()
+
+
+@pytest.mark.skipif(not hasattr(os, "fork"), reason="needs os.fork")
+def test_serve_preforked_workers_answer(app_module):
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        port = s.getsockname()[1]
+
+    env = {**os.environ, "PYTHONPATH": os.pathsep.join([str(app_module), os.getcwd()])}
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "taranis_base_bot.preload", "preloaded_bot:app", "--workers", "2", "--bind", f"127.0.0.1:{port}"],
+        env=env,
+    )
+    try:
+        deadline = time.monotonic() + 20
+        while True:
+            try:
+                response = httpx.post(f"http://127.0.0.1:{port}/", json={"text": "hello"})
+                break
+            except httpx.TransportError:
+                if time.monotonic() > deadline:
+                    raise
+                time.sleep(0.1)
+        assert response.status_code == 200
+        assert response.json() == {"text": "hello"}
+    finally:
+        proc.send_signal(signal.SIGTERM)
+        assert proc.wait(timeout=20) == 0
@@ -0,0 +1,101 @@
+import asyncio
+import time
+
+import pytest
+
+from taranis_base_bot import create_app
+from taranis_base_bot.profiling import RequestProfiler, allocation_diff, profile_event_loop, sample_stacks
+
+
+def busy_work():
+    return sum(i * i for i in range(500000))
+
+
+@pytest.mark.asyncio
+async def test_sample_stacks_sees_the_event_loop():
+    async def spin():
+        deadline = time.monotonic() + 0.1
+        while time.monotonic() < deadline:
+            busy_work()
+            await asyncio.sleep(0)
+
+    stacks, _ = await asyncio.gather(sample_stacks(0.1, interval=0.001), spin())
+    lines = stacks.splitlines()
+    assert lines
+    assert all(line.rsplit(" ", 1)[1].isdigit() for line in lines)
+    assert any("busy_work" in line for line in lines)
+
+
+@pytest.mark.asyncio
+async def test_profile_event_loop_and_allocations():
+    async def allocate():
+        await asyncio.sleep(0.01)
+        return [bytearray(1024) for _ in range(100)]
+
+    report, allocations, kept = await asyncio.gather(profile_event_loop(0.05), allocation_diff(0.05), allocate())
+    assert "function calls" in report
+    assert any("test_profiling.py" in line for line in allocations)
+
+    with pytest.raises(RuntimeError, match="already running"):
+        await asyncio.gather(profile_event_loop(0.01), profile_event_loop(0.01))
+
+
+@pytest.mark.asyncio
+async def test_profile_routes_require_api_key(custom_settings):
+    custom_settings.API_KEY = "secret"
+    custom_settings.PROFILE_ROUTE = True
+    custom_settings.PROFILE_SAMPLE_RATE = 1.0
+
+    async def predict_fn(**kwargs):
+        return kwargs
+
+    app = create_app(name="svc-profile", config=custom_settings, predict_fn=predict_fn, modelinfo_fn=lambda: "m", request_parser=lambda x: x)
+    auth = {"Authorization": "Bearer secret"}
+    async with app.test_client() as c:
+        assert (await c.get("/debug/profile?seconds=0.01")).status_code == 401
+        assert (await c.get("/debug/profile?seconds=1000", headers=auth)).status_code == 400
+
+        r = await c.get("/debug/profile?seconds=0.05&format=pstats", headers=auth)
+        assert r.status_code == 200
+        data = await r.get_json()
+        assert data["format"] == "pstats"
+        assert "function calls" in data["cpu"]
+        assert isinstance(data["allocations"], list)
+
+        await c.post("/", json={"text": "profiled"}, headers=auth)
+        r = await c.get("/debug/profile/requests", headers=auth)
+        profiles = (await r.get_json())["profiles"]
+        assert len(profiles) == 1
+        assert profiles[0]["path"] == "/"
+
+
+@pytest.mark.asyncio
+async def test_admin_routes_are_not_added_without_api_key(custom_settings):
+    custom_settings.API_KEY = ""
+    custom_settings.PROFILE_ROUTE = True
+    custom_settings.MODEL_RELOAD_ROUTE = True
+
+    async def predict_fn(**kwargs):
+        return kwargs
+
+    app = create_app(name="svc-no-key", config=custom_settings, predict_fn=predict_fn, modelinfo_fn=lambda: "m", request_parser=lambda x: x)
+    async with app.test_client() as c:
+        assert (await c.get("/debug/profile?seconds=0.01")).status_code == 404
+        assert (await c.get("/debug/profile/requests")).status_code == 404
+        assert (await c.post("/admin/reload")).status_code == 404
+        assert (await c.post("/", json={"text": "open"})).status_code == 200
+
+
+def test_request_profiler_without_sampling_is_a_passthrough():
+    profiler = RequestProfiler(sample_rate=0)
+
+    async def view():
+        return "ok"
+
+    assert asyncio.run(profiler(view)()) == "ok"
+    assert not profiler.reports
+
+
+@pytest.mark.asyncio
+async def test_profile_route_is_disabled_by_default(client):
+    assert (await client.get("/debug/profile")).status_code == 404
@@ -0,0 +1,187 @@
+import asyncio
+import sys
+import types
+
+import pytest
+
+from taranis_base_bot import create_app
+from taranis_base_bot.registry import ModelRegistry, UnknownModel
+
+
+class SizedModel:
+    def __init__(self, name: str, memory_bytes: int = 100) -> None:
+        self.model_name = name
+        self.memory_bytes = memory_bytes
+
+    async def predict(self, **kwargs):
+        return {"model": self.model_name, **kwargs}
+
+
+def make_registry(names=("a", "b", "c"), sizes=None, **kwargs) -> tuple[ModelRegistry, list[str], list[str]]:
+    loads: list[str] = []
+    closed: list[str] = []
+
+    def load(name: str) -> SizedModel:
+        loads.append(name)
+        return SizedModel(name, (sizes or {}).get(name, 100))
+
+    def install(slot, name, model):
+        slot.on_close(lambda: closed.append(name))
+        slot.set(model.predict, lambda: model.model_name)
+
+    registry = ModelRegistry(names, default=names[0], load=load, install=install, **kwargs)
+    return registry, loads, closed
+
+
+@pytest.mark.asyncio
+async def test_registry_loads_models_on_first_use():
+    registry, loads, _ = make_registry()
+    assert registry.resident == []
+
+    assert await registry.predict(text="x") == {"model": "a", "text": "x"}
+    assert await registry.predict(model="b", text="y") == {"model": "b", "text": "y"}
+    assert await registry.predict(model="b", text="z") == {"model": "b", "text": "z"}
+    assert loads == ["a", "b"]
+    assert registry.resident == ["a", "b"]
+
+    with pytest.raises(UnknownModel, match="Unknown model 'd'"):
+        await registry.predict(model="d", text="x")
+
+
+@pytest.mark.asyncio
+async def test_registry_loads_once_for_concurrent_requests():
+    registry, loads, _ = make_registry()
+    results = await asyncio.gather(*(registry.predict(model="c", i=i) for i in range(5)))
+    assert [r["i"] for r in results] == list(range(5))
+    assert loads == ["c"]
+
+
+@pytest.mark.asyncio
+async def test_registry_evicts_least_recently_used():
+    registry, loads, closed = make_registry(max_resident=2)
+    await registry.predict(model="a")
+    await registry.predict(model="b")
+    await registry.predict(model="a")
+    await registry.predict(model="c")
+    assert registry.resident == ["a", "c"]
+    assert closed == ["b"]
+
+    await registry.predict(model="b")
+    assert registry.resident == ["c", "b"]
+    assert loads == ["a", "b", "c", "b"]
+
+
+@pytest.mark.asyncio
+async def test_registry_memory_budget():
+    registry, _, closed = make_registry(sizes={"a": 60, "b": 30, "c": 50}, memory_budget=100)
+    await registry.predict(model="a")
+    await registry.predict(model="b")
+    assert registry.resident == ["a", "b"]
+
+    await registry.predict(model="c")
+    assert registry.resident == ["b", "c"]
+    assert closed == ["a"]
+
+    # the size of "a" is known now, so room is made before loading it again
+    await registry.predict(model="a")
+    assert registry.resident == ["a"]
+    assert closed == ["a", "b", "c"]
+
+
+@pytest.mark.asyncio
+async def test_registry_keeps_models_in_use():
+    release = asyncio.Event()
+
+    async def slow_predict(**kwargs):
+        await release.wait()
+        return kwargs
+
+    registry, _, closed = make_registry(max_resident=1)
+    await registry.predict(model="a")
+    registry._resident["a"].slot.set(slow_predict, lambda: "a")
+
+    busy = asyncio.ensure_future(registry.predict(model="a", text="slow"))
+    await asyncio.sleep(0)
+    await registry.predict(model="b")
+    assert registry.resident == ["a", "b"]
+    assert closed == []
+
+    release.set()
+    assert await busy == {"text": "slow"}
+    await registry.predict(model="c")
+    assert registry.resident == ["c"]
+    assert closed == ["a", "b"]
+
+    await registry.close()
+    assert registry.resident == []
+    assert closed == ["a", "b", "c"]
+
+
+@pytest.fixture
+def multi_model_pkg(monkeypatch, custom_settings):
+    pkg = types.ModuleType(custom_settings.PACKAGE_NAME)
+    pkg.__path__ = []
+    monkeypatch.setitem(sys.modules, custom_settings.PACKAGE_NAME, pkg)
+    for name in ("fake_model", "super", "good"):
+        mod = types.ModuleType(f"{custom_settings.PACKAGE_NAME}.{name}")
+        model_class = type(
+            "".join(part.capitalize() for part in name.split("_")),
+            (SizedModel,),
+            {"__init__": lambda self, n=name: SizedModel.__init__(self, n)},
+        )
+        setattr(mod, model_class.__name__, model_class)
+        monkeypatch.setitem(sys.modules, mod.__name__, mod)
+
+
+@pytest.mark.asyncio
+async def test_multi_model_app(custom_settings, multi_model_pkg):
+    custom_settings.HF_MODEL_INFO = False
+    custom_settings.MODELS = ["super", "good"]
+    custom_settings.MODELS_MAX_RESIDENT = 2
+    app = create_app(name="svc-multi", config=custom_settings, request_parser=lambda data: {"text": data["text"]}, method_decorators=[])
+
+    async with app.test_app() as test_app:
+        c = test_app.test_client()
+        r = await c.get("/modelinfo")
+        data = await r.get_json()
+        assert data["default"] == "fake_model"
+        assert data["resident"] == []
+
+        r = await c.post("/", json={"text": "hi"})
+        assert await r.get_json() == {"model": "fake_model", "text": "hi"}
+        r = await c.post("/", json={"text": "hi", "model": "super"})
+        assert await r.get_json() == {"model": "super", "text": "hi"}
+        r = await c.post("/models/good", json={"text": "hi"})
+        assert await r.get_json() == {"model": "good", "text": "hi"}
+
+        r = await c.post("/models/good/batch", json=[{"text": "a"}])
+        assert await r.get_data() == b'{"index":0,"result":{"model":"good","text":"a"}}\n'
+
+        r = await c.post("/models/bad", json={"text": "hi"})
+        assert r.status_code == 404
+        assert "Unknown model 'bad'" in (await r.get_json())["error"]
+
+        data = await (await c.get("/modelinfo")).get_json()
+        assert data["resident"] == ["super", "good"]
+        assert data["models"]["fake_model"] == {"resident": False}
+        assert data["models"]["good"]["info"] == "good"
+
+
+@pytest.mark.asyncio
+async def test_multi_model_app_keeps_a_snapshot_per_model(custom_settings, multi_model_pkg, tmp_path):
+    snapshot = tmp_path / "modelinfo.json"
+    snapshot.write_text('{"id": "fake_model"}')
+    (tmp_path / "modelinfo.json.super").write_text('{"id": "super"}')
+    custom_settings.HF_MODEL_INFO_SNAPSHOT = str(snapshot)
+    custom_settings.HF_MODEL_INFO_OFFLINE = True
+    custom_settings.MODELS = ["super", "good"]
+    app = create_app(name="svc-snapshots", config=custom_settings, request_parser=lambda data: {"text": data["text"]}, method_decorators=[])
+
+    async with app.test_app() as test_app:
+        c = test_app.test_client()
+        for model in ("fake_model", "super", "good"):
+            await c.post(f"/models/{model}", json={"text": "hi"})
+        models = (await (await c.get("/modelinfo")).get_json())["models"]
+        assert models["fake_model"]["info"] == {"id": "fake_model"}
+        assert models["super"]["info"] == {"id": "super"}
+        assert "error" in models["good"]["info"]
@@ -0,0 +1,125 @@
+import asyncio
+import os
+
+import pytest
+import pytest_asyncio
+
+from taranis_base_bot import create_app
+from taranis_base_bot.sidecar import ModelServer, SidecarClient, SidecarError
+
+
+def shm_blocks() -> set[str]:
+    return set(os.listdir("/dev/shm")) if os.path.isdir("/dev/shm") else set()
+
+
+@pytest_asyncio.fixture
+async def model_server(tmp_path, fake_model):
+    class FailingFakeModel(fake_model):
+        async def predict(self, **kwargs):
+            if kwargs.get("fail"):
+                raise ValueError("fake model failed")
+            return await super().predict(**kwargs)
+
+    path = str(tmp_path / "model.sock")
+    server = ModelServer(FailingFakeModel().predict, modelinfo_fn=lambda: "fake_model", path=path, shm_threshold=128)
+    await server.start()
+    yield path
+    await server.close()
+
+
+@pytest.mark.asyncio
+async def test_sidecar_roundtrip(model_server):
+    client = SidecarClient(model_server, shm_threshold=128)
+    try:
+        assert await client(text="hello") == {"text": "hello"}
+        assert await client.modelinfo() == "fake_model"
+    finally:
+        await client.close()
+
+
+@pytest.mark.asyncio
+async def test_sidecar_large_payload_uses_shared_memory(model_server):
+    before = shm_blocks()
+    client = SidecarClient(model_server, shm_threshold=128)
+    try:
+        text = "x" * 100_000
+        results = await asyncio.gather(*(client(text=text, n=n) for n in range(4)))
+        assert results == [{"text": text, "n": n} for n in range(4)]
+    finally:
+        await client.close()
+    assert shm_blocks() == before
+
+
+@pytest.mark.asyncio
+async def test_sidecar_propagates_errors(model_server):
+    client = SidecarClient(model_server)
+    try:
+        with pytest.raises(SidecarError, match="fake model failed"):
+            await client(fail=True)
+        assert await client(text="still works") == {"text": "still works"}
+    finally:
+        await client.close()
+
+
+@pytest.mark.asyncio
+async def test_create_app_forwards_to_model_server(custom_settings, model_server):
+    custom_settings.MODEL_SERVER_SOCKET = model_server
+    custom_settings.HF_MODEL_INFO = False
+
+    app = create_app(name="svc-sidecar", config=custom_settings, method_decorators=[])
+    async with app.test_client() as c:
+        r = await c.post("/", json={"test": "val"})
+        assert r.status_code == 200
+        assert await r.get_json() == {"test": "val"}
+
+        r = await c.get("/modelinfo")
+        assert await r.get_json() == custom_settings.MODEL
+
+
+@pytest.mark.asyncio
+async def test_sidecar_passes_arrays_as_buffers_and_reports_unserializable_results(tmp_path):
+    np = pytest.importorskip("numpy")
+
+    async def predict_fn(**kwargs):
+        if kwargs.get("opaque"):
+            return {"value": object()}
+        return {"embedding": kwargs["vector"] * 2, "matrix": np.arange(6, dtype=np.int64).reshape(2, 3).T}
+
+    path = str(tmp_path / "model.sock")
+    server = ModelServer(predict_fn, modelinfo_fn=lambda: "m", path=path, shm_threshold=128)
+    await server.start()
+    client = SidecarClient(path, shm_threshold=128)
+    try:
+        for size in (4, 10_000):
+            result = await client(vector=np.ones(size, dtype=np.float32))
+            assert result["embedding"].dtype == np.float32 and result["embedding"].tolist() == [2.0] * size
+            assert result["matrix"].tolist() == [[0, 3], [1, 4], [2, 5]]
+
+        with pytest.raises(SidecarError, match="could not be serialized"):
+            await client(opaque=True)
+        assert (await client(vector=np.zeros(1)))["embedding"].tolist() == [0.0]
+    finally:
+        await client.close()
+        await server.close()
+
+
+@pytest.mark.asyncio
+async def test_sidecar_cancelled_request_leaves_no_shared_memory(tmp_path):
+    async def predict_fn(**kwargs):
+        await asyncio.sleep(0.1)
+        return {"text": "x" * 100_000}
+
+    path = str(tmp_path / "model.sock")
+    server = ModelServer(predict_fn, modelinfo_fn=lambda: "m", path=path, shm_threshold=128)
+    await server.start()
+    before = shm_blocks()
+    client = SidecarClient(path, shm_threshold=128)
+    try:
+        with pytest.raises(TimeoutError):
+            async with asyncio.timeout(0.05):
+                await client(text="slow")
+        await asyncio.sleep(0.2)
+        assert shm_blocks() == before
+    finally:
+        await client.close()
+        await server.close()
@@ -0,0 +1,38 @@
+import subprocess
+import sys
+
+import pytest
+
+# seconds, best of three fresh interpreters; generous enough for slow CI runners
+IMPORT_BUDGETS = {
+    "taranis_base_bot": 0.1,
+    "taranis_base_bot.misc": 0.3,
+    "taranis_base_bot.setup": 1.5,
+}
+LAZY_MODULES = ["httpx", "pydoc", "sqlite3", "cProfile", "tracemalloc", "multiprocessing.shared_memory", "msgpack", "cbor2", "zstandard"]
+
+
+def run_python(code: str) -> str:
+    return subprocess.run([sys.executable, "-c", code], check=True, capture_output=True, text=True).stdout
+
+
+@pytest.mark.parametrize("module,budget", IMPORT_BUDGETS.items())
+def test_import_time_budget(module, budget):
+    code = f"import time; started = time.perf_counter(); import {module}; print(time.perf_counter() - started)"
+    seconds = min(float(run_python(code)) for _ in range(3))
+    assert seconds < budget, f"importing {module} took {seconds:.3f}s, budget is {budget}s"
+
+
+def test_optional_dependencies_are_imported_lazily():
+    code = f"import sys, taranis_base_bot.setup; print(' '.join(m for m in {LAZY_MODULES!r} if m in sys.modules))"
+    assert run_python(code).split() == []
+
+
+def test_create_app_reports_startup_phases(custom_settings):
+    from taranis_base_bot import create_app
+
+    async def predict_fn(**kwargs):
+        return kwargs
+
+    app = create_app(name="svc-startup", config=custom_settings, predict_fn=predict_fn, modelinfo_fn=lambda: "m")
+    assert list(app.extensions["model_slot"].phases) == ["imports", "config", "blueprint"]